@@ -5,6 +5,7 @@ export const CohereRerankerConfigSchema = z.object({
   use_reranker: z.boolean().optional(),
   rerank_provider: z.string().trim().optional(),
   cohere_api_key: z.string().trim().optional(),
+  local_rerank_model: z.string().trim().optional(),
 });
 
 export type CohereRerankerConfigFormType = z.TypeOf<
@@ -13,7 +13,15 @@ import {
   FormLabel,
   FormMessage,
 } from "@/components/ui/form";
+import { Input } from "@/components/ui/input";
 import { PasswordInput } from "@/components/ui/password-input";
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from "@/components/ui/select";
 import { toast } from "@/components/ui/use-toast";
 import { zodResolver } from "@hookform/resolvers/zod";
 import { useEffect } from "react";
@@ -89,6 +97,67 @@ export const RerankerConfig = () => {
 
           {form.watch("use_reranker") && (
             <>
+              <FormField
+                control={form.control}
+                name="rerank_provider"
+                render={({ field }) => (
+                  <FormItem className="ml-6">
+                    <FormLabel>Provider</FormLabel>
+                    <FormControl>
+                      <Select
+                        value={field.value ?? "cohere"}
+                        onValueChange={(value) => {
+                          field.onChange(value);
+                          submitRerankerForm(form.getValues());
+                        }}
+                      >
+                        <SelectTrigger>
+                          <SelectValue placeholder="Cohere" />
+                        </SelectTrigger>
+                        <SelectContent>
+                          <SelectItem value="cohere">Cohere</SelectItem>
+                          <SelectItem value="local">Local</SelectItem>
+                        </SelectContent>
+                      </Select>
+                    </FormControl>
+                    <FormDescription>
+                      The local reranker runs a cross-encoder model on the CPU
+                      of the server, without sending the documents to a
+                      reranking service
+                    </FormDescription>
+                    <FormMessage />
+                  </FormItem>
+                )}
+              />
+            </>
+          )}
+
+          {form.watch("use_reranker") &&
+            form.watch("rerank_provider") === "local" && (
+              <FormField
+                control={form.control}
+                name="local_rerank_model"
+                render={({ field }) => (
+                  <FormItem className="ml-6">
+                    <FormLabel>Model</FormLabel>
+                    <FormControl>
+                      <Input
+                        placeholder="Xenova/ms-marco-MiniLM-L-6-v2"
+                        {...field}
+                      />
+                    </FormControl>
+                    <FormDescription>
+                      A reranking model supported by fastembed, it's
+                      downloaded when it's used for the first time
+                    </FormDescription>
+                    <FormMessage />
+                  </FormItem>
+                )}
+              />
+            )}
+
+          {form.watch("use_reranker") &&
+            form.watch("rerank_provider") !== "local" && (
               <FormField
                 control={form.control}
                 name="cohere_api_key"
@@ -112,8 +181,7 @@ export const RerankerConfig = () => {
                   </FormItem>
                 )}
               />
-            </>
-          )}
+            )}
         </form>
       </Form>
     </>
@@ -49,6 +49,8 @@ class AgentManager:
                 "QueryEngine": QueryEngineTool,
             }
             self.config = self.load_config_file()
+            # Increased on every config change, so caches depending on the agents can detect it
+            self.version = 0
             self._ensure_all_tools_exist()
             self.initialized = True
 
@@ -84,6 +86,7 @@ class AgentManager:
             try:
                 with open(AGENT_CONFIG_FILE, "w") as file:
                     yaml.dump(self.config, file)
+                self.version += 1
             except IOError as e:
                 raise IOError(f"Failed to write to config file: {str(e)}")
 
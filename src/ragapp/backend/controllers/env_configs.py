@@ -1,7 +1,9 @@
 import logging
 
+from backend.engine.index_registry import IndexRegistry
+from backend.engine.settings import init_settings
+from backend.engine.vectordb import clear_clients
 from backend.models.base_env import BaseEnvConfig
-from create_llama.backend.app.settings import init_settings
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +15,7 @@ class EnvConfigManager:
         current_config: BaseEnvConfig,
         new_config: BaseEnvConfig,
         rollback_on_failure: bool = True,
+        keep_pinned_index: bool = False,
     ):
         """
         Update the environment configuration with the provided config.
@@ -20,6 +23,7 @@ class EnvConfigManager:
         Args:
             env_config (BaseEnvConfig): The new environment configuration.
             rollback_on_failure (bool): Whether to rollback the changes if the update fails.
+            keep_pinned_index (bool): Whether to keep serving the pinned index (see `IndexRegistry.pin`).
         """
         # Backup the current config
         backup_config = current_config.copy()
@@ -29,6 +33,9 @@ class EnvConfigManager:
             new_config.to_runtime_env()
             new_config.to_env_file()
             init_settings()
+            # The cached index and the vector store clients are bound to the previous settings
+            IndexRegistry.invalidate(keep_pinned=keep_pinned_index)
+            clear_clients()
         except Exception as e:
             logger.error(
                 f"Failed to update the environment config: {str(e)}", exc_info=True
@@ -38,4 +45,6 @@ class EnvConfigManager:
                 backup_config.to_runtime_env()
                 backup_config.to_env_file()
                 init_settings()
+                IndexRegistry.invalidate(keep_pinned=keep_pinned_index)
+                clear_clients()
             raise e
@@ -1,9 +1,19 @@
+import hashlib
 import os
+import uuid
+
+from starlette.concurrency import run_in_threadpool
 
 from backend.controllers.loader import LoaderManager
 from backend.models.file import File, FileStatus
 from backend.models.loader import FileLoader
-from backend.tasks.indexing import index_all
+from backend.tasks.jobs import IndexingJobManager
+from backend.tasks.manifest import IngestionManifest
+
+# Maximum size of an uploaded file in MB
+MAX_UPLOAD_FILE_SIZE_MB = int(os.getenv("MAX_UPLOAD_FILE_SIZE_MB", "1024"))
+# Size of the chunks an upload is copied in, so a file is never held in memory at once
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 class UnsupportedFileExtensionError(Exception):
@@ -14,6 +24,10 @@ class FileNotFoundError(Exception):
     pass
 
 
+class FileTooLargeError(Exception):
+    pass
+
+
 class FileHandler:
     @classmethod
     def get_current_files(cls):
@@ -23,10 +37,19 @@ class FileHandler:
         if not os.path.exists("data"):
             return []
         # Get all files in the data folder
-        file_names = os.listdir("data")
+        file_names = [
+            file_name
+            for file_name in os.listdir("data")
+            # Skip the temporary files of ongoing uploads
+            if not file_name.startswith(".")
+        ]
         # Construct list[File]
         return [
-            File(name=file_name, status=FileStatus.UPLOADED) for file_name in file_names
+            File(
+                name=file_name,
+                status=IndexingJobManager.get_file_status(file_name),
+            )
+            for file_name in file_names
         ]
 
     @classmethod
@@ -39,17 +62,70 @@ class FileHandler:
         # Check if the file extension is supported
         cls.validate_file_extension(file_name)
 
+        max_size = MAX_UPLOAD_FILE_SIZE_MB * 1024 * 1024
+        if file.size is not None and file.size > max_size:
+            raise FileTooLargeError(
+                f"File {file_name} exceeds the maximum upload size of {MAX_UPLOAD_FILE_SIZE_MB} MB"
+            )
+
         # Create data folder if it does not exist
         if not os.path.exists("data"):
             os.makedirs("data")
 
-        with open(f"data/{file_name}", "wb") as f:
-            f.write(await file.read())
-        # Index the data
-        # Index the data only when it is the last file to upload
-        if fileIndex == totalFiles:
-            index_all()
-        return File(name=file_name, status=FileStatus.UPLOADED)
+        # Copy the upload in chunks to a hidden temporary file (ignored by the file list and the indexing),
+        # then rename it so a partially written file is never indexed
+        file_path = f"data/{file_name}"
+        tmp_path = f"data/.{file_name}.{uuid.uuid4().hex}.upload"
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            # The file operations run in the thread pool, so they don't stall the other requests
+            f = await run_in_threadpool(open, tmp_path, "wb")
+            try:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(
+                            f"File {file_name} exceeds the maximum upload size of {MAX_UPLOAD_FILE_SIZE_MB} MB"
+                        )
+                    sha256.update(chunk)
+                    await run_in_threadpool(f.write, chunk)
+            finally:
+                await run_in_threadpool(f.close)
+
+            if await run_in_threadpool(
+                cls._is_indexed, file_name, file_path, sha256.hexdigest()
+            ):
+                # The same content is already indexed, keep the existing file
+                await run_in_threadpool(os.remove, tmp_path)
+                return File(
+                    name=file_name,
+                    status=IndexingJobManager.get_file_status(file_name),
+                )
+            await run_in_threadpool(os.replace, tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Index the file in the background,
+        # files uploaded while the job is queued are indexed by the same job
+        job = IndexingJobManager.submit(files_to_index=[file_name])
+        return File(name=file_name, status=FileStatus.INDEXING, job_id=job.id)
+
+    @classmethod
+    def _is_indexed(cls, file_name: str, file_path: str, file_hash: str) -> bool:
+        """
+        Check whether the file in the data folder is indexed with the given content.
+        """
+        if not os.path.exists(file_path):
+            return False
+        record = IngestionManifest().get(file_name)
+        return (
+            record is not None
+            and record.hash == file_hash
+            and IngestionManifest.is_unchanged(record, file_path)
+        )
 
     @classmethod
     def remove_file(cls, file_name: str) -> None:
@@ -57,8 +133,8 @@ class FileHandler:
         Remove a file from the data folder.
         """
         os.remove(f"data/{file_name}")
-        # Re-index the data
-        index_all()
+        # Remove the nodes of the file from the index in the background
+        IndexingJobManager.submit(files_to_remove=[file_name])
 
     @classmethod
     def validate_file_extension(cls, file_name: str):
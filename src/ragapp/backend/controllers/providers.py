@@ -1,6 +1,8 @@
 import os
 from typing import List
 
+from backend.services.http_clients import HttpClientRegistry
+
 
 class AIProvider:
     @staticmethod
@@ -10,7 +12,10 @@ class AIProvider:
         """
         from ollama import Client
 
-        client = Client(host=provider_url or os.getenv("OLLAMA_BASE_URL"))
+        host = provider_url or os.getenv("OLLAMA_BASE_URL")
+        client = Client(
+            host=host, transport=HttpClientRegistry.get_transport("ollama", host)
+        )
         res = client.list()
         models = res.get("models", [])
 
@@ -1,26 +1,198 @@
 import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
 
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.engine import Engine, make_url
 from sqlmodel import Session as SQLSession
 from sqlmodel import SQLModel, create_engine
 
 from backend.models.orm import *  # noqa
+from backend.models.orm import UserChatRequest
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Milliseconds a SQLite connection waits for the lock of another writer
+DB_SQLITE_BUSY_TIMEOUT = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT", "5000"))
+
+# Async drivers of the supported databases, installed with the optional `async-db` extra
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
 
 class DB:
     _engine = None
+    _async_engine = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_db_uri() -> str:
+        return os.environ.get("DB_URI", "sqlite:///ragapp_db.sqlite")
 
     @classmethod
-    def get_engine(cls):
+    def get_engine(cls) -> Engine:
         if cls._engine is None:
-            db_uri = os.environ.get("DB_URI", "sqlite:///ragapp_db.sqlite")
-            cls._engine = create_engine(db_uri)
-            SQLModel.metadata.create_all(cls._engine)
+            with cls._lock:
+                if cls._engine is None:
+                    engine = _configure_engine(
+                        create_engine(
+                            cls.get_db_uri(), **_get_engine_options(cls.get_db_uri())
+                        )
+                    )
+                    SQLModel.metadata.create_all(engine)
+                    _create_chat_request_index(engine)
+                    cls._engine = engine
         return cls._engine
 
     @classmethod
-    def get_session(cls):
-        try:
-            db = SQLSession(cls.get_engine())
+    def get_async_engine(cls):
+        """
+        The async engine of the same database, e.g. `sqlite+aiosqlite` for `sqlite` URIs.
+        Set DB_ASYNC_URI to use another driver.
+        """
+        if cls._async_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            # Create the tables with the sync engine
+            cls.get_engine()
+            with cls._lock:
+                if cls._async_engine is None:
+                    db_uri = os.environ.get("DB_ASYNC_URI") or _get_async_uri(
+                        cls.get_db_uri()
+                    )
+                    async_engine = create_async_engine(
+                        db_uri, **_get_engine_options(db_uri)
+                    )
+                    _configure_engine(async_engine.sync_engine)
+                    cls._async_engine = async_engine
+        return cls._async_engine
+
+    @classmethod
+    @contextmanager
+    def session(cls) -> Iterator[SQLSession]:
+        """
+        Open a session which is closed (and its connection returned to the pool) on exit.
+        """
+        with SQLSession(cls.get_engine()) as db:
+            yield db
+
+    @classmethod
+    @asynccontextmanager
+    async def async_session(cls) -> AsyncIterator:
+        from sqlmodel.ext.asyncio.session import AsyncSession
+
+        async with AsyncSession(cls.get_async_engine()) as db:
+            yield db
+
+    @classmethod
+    def get_session(cls) -> Iterator[SQLSession]:
+        """
+        FastAPI dependency providing a session for the request.
+        """
+        with cls.session() as db:
             yield db
-        finally:
-            db.close()
+
+    @classmethod
+    async def dispose(cls):
+        """
+        Close the pooled connections, e.g. on shutdown.
+        """
+        with cls._lock:
+            engine, async_engine = cls._engine, cls._async_engine
+            cls._engine = cls._async_engine = None
+        if engine is not None:
+            engine.dispose()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def _get_engine_options(db_uri: str) -> dict:
+    url = make_url(db_uri)
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        # The sessions are used from the thread pool, not only from the thread creating the connection
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases use a single connection per thread
+            return options
+    else:
+        options["pool_pre_ping"] = True
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def _create_chat_request_index(engine: Engine):
+    """
+    The unique index of the chat request counters is only created with the table:
+    merge the duplicate counters of an existing table, then add the index.
+    """
+    table = UserChatRequest.__table__
+    index = next(
+        index for index in table.indexes if index.name == "idx_user_id_time_frame"
+    )
+    existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+    if index.name in existing:
+        return
+    with engine.begin() as connection:
+        duplicates = connection.execute(
+            select(
+                table.c.user_id,
+                table.c.time_frame,
+                func.min(table.c.id),
+                func.sum(table.c.count),
+            )
+            .group_by(table.c.user_id, table.c.time_frame)
+            .having(func.count() > 1)
+        ).all()
+        for user_id, time_frame, first_id, count in duplicates:
+            # Each duplicate counted some of the requests of the time frame
+            connection.execute(
+                update(table).where(table.c.id == first_id).values(count=count)
+            )
+            connection.execute(
+                delete(table).where(
+                    table.c.user_id == user_id,
+                    table.c.time_frame == time_frame,
+                    table.c.id != first_id,
+                )
+            )
+        # Another worker may have created it in the meantime
+        index.create(connection, checkfirst=True)
+
+
+def _get_async_uri(db_uri: str) -> str:
+    url = make_url(db_uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No async driver known for {backend} databases, please set DB_ASYNC_URI"
+        )
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False
+    )
+
+
+def _configure_engine(engine: Engine) -> Engine:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets the readers continue while a request count is written
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# The active and the retained collections, one file for all of them (unlike the per-collection files in STORAGE_DIR)
+COLLECTION_STATE_PATH = os.getenv("COLLECTION_STATE_PATH", "storage/collections.json")
+# Number of previous collections kept after a rebuild for an instant rollback
+INDEX_RETAINED_GENERATIONS = int(os.getenv("INDEX_RETAINED_GENERATIONS", "1"))
+
+
+class RetainedCollection(BaseModel):
+    name: str
+    fingerprint: Optional[str] = None
+
+
+class CollectionState(BaseModel):
+    active: Optional[str] = Field(
+        default=None,
+        description="The name of the collection serving the index, the configured name if not set.",
+    )
+    fingerprint: Optional[str] = Field(
+        default=None,
+        description="The embedding configuration the active collection was built with.",
+    )
+    generation: int = Field(default=0)
+    previous: List[RetainedCollection] = Field(
+        default_factory=list,
+        description="The previously active collections, the most recent first.",
+    )
+
+
+def get_embedding_fingerprint() -> str:
+    """
+    Identify the embedding configuration, embeddings of different fingerprints can't be mixed.
+    """
+    return ":".join(
+        os.getenv(env_name, "")
+        for env_name in ("MODEL_PROVIDER", "EMBEDDING_MODEL", "EMBEDDING_DIM")
+    )
+
+
+class CollectionManager:
+    """
+    Keep track of the physical collection serving each configured vector store collection.
+    Rebuilds are written into a new collection which is activated once it's complete,
+    so the configured collection is never empty while re-indexing.
+    """
+
+    _lock = threading.RLock()
+
+    @staticmethod
+    def get_collection_name() -> str:
+        """
+        The configured collection name of the current vector store provider.
+        """
+        provider = os.getenv("VECTOR_STORE_PROVIDER", "chroma")
+        if provider == "qdrant":
+            return os.getenv("QDRANT_COLLECTION")
+        return os.getenv("CHROMA_COLLECTION", "default")
+
+    @classmethod
+    def get_state(cls, collection_name: Optional[str] = None) -> CollectionState:
+        collection_name = collection_name or cls.get_collection_name()
+        with cls._lock:
+            return cls._load().get(cls._get_key(collection_name), CollectionState())
+
+    @classmethod
+    def get_active_collection(cls, collection_name: Optional[str] = None) -> str:
+        collection_name = collection_name or cls.get_collection_name()
+        return cls.get_state(collection_name).active or collection_name
+
+    @classmethod
+    def get_next_collection(cls, collection_name: Optional[str] = None) -> str:
+        collection_name = collection_name or cls.get_collection_name()
+        generation = cls.get_state(collection_name).generation + 1
+        return f"{collection_name}__g{generation}"
+
+    @classmethod
+    def needs_rebuild(cls, collection_name: Optional[str] = None) -> bool:
+        """
+        Check whether the active collection was built with another embedding configuration.
+        """
+        return cls.get_state(collection_name).fingerprint != get_embedding_fingerprint()
+
+    @classmethod
+    def adopt(cls, fingerprint: str, collection_name: Optional[str] = None):
+        """
+        Record the fingerprint of a collection created before the fingerprints were tracked.
+        """
+        collection_name = collection_name or cls.get_collection_name()
+        with cls._lock:
+            states = cls._load()
+            state = states.get(cls._get_key(collection_name), CollectionState())
+            if state.fingerprint is None:
+                state.fingerprint = fingerprint
+                states[cls._get_key(collection_name)] = state
+                cls._save(states)
+
+    @classmethod
+    def find_retained(
+        cls, fingerprint: str, collection_name: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Find a retained previous collection built with the given embedding configuration.
+        """
+        for retained in cls.get_state(collection_name).previous:
+            if retained.fingerprint == fingerprint:
+                return retained.name
+        return None
+
+    @classmethod
+    def activate(
+        cls,
+        collection: str,
+        fingerprint: Optional[str],
+        collection_name: Optional[str] = None,
+    ) -> Tuple[str, List[str]]:
+        """
+        Serve the index from the given collection, a new generation or a retained one (rollback).
+        The previously active collection is retained, up to INDEX_RETAINED_GENERATIONS collections.
+        Returns the previously active collection and the collections which are no longer retained.
+        """
+        collection_name = collection_name or cls.get_collection_name()
+        with cls._lock:
+            states = cls._load()
+            state = states.get(cls._get_key(collection_name), CollectionState())
+            previous = state.active or collection_name
+            retained = [
+                RetainedCollection(name=previous, fingerprint=state.fingerprint),
+                *state.previous,
+            ]
+            retained = [item for item in retained if item.name != collection]
+            generation = state.generation
+            if collection == f"{collection_name}__g{generation + 1}":
+                generation += 1
+            states[cls._get_key(collection_name)] = CollectionState(
+                active=collection,
+                fingerprint=fingerprint,
+                generation=generation,
+                previous=retained[:INDEX_RETAINED_GENERATIONS],
+            )
+            cls._save(states)
+        dropped = [item.name for item in retained[INDEX_RETAINED_GENERATIONS:]]
+        return previous, dropped
+
+    @staticmethod
+    def _get_key(collection_name: str) -> str:
+        return f"{os.getenv('VECTOR_STORE_PROVIDER', 'chroma')}:{collection_name}"
+
+    @staticmethod
+    def _load() -> Dict[str, CollectionState]:
+        if not os.path.exists(COLLECTION_STATE_PATH):
+            return {}
+        with open(COLLECTION_STATE_PATH, "r") as f:
+            return {
+                key: CollectionState(**state) for key, state in json.load(f).items()
+            }
+
+    @staticmethod
+    def _save(states: Dict[str, CollectionState]):
+        os.makedirs(os.path.dirname(COLLECTION_STATE_PATH) or ".", exist_ok=True)
+        # Replace the file atomically, so a crash never leaves a broken pointer
+        tmp_path = f"{COLLECTION_STATE_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: state.model_dump() for key, state in states.items()}, f)
+        os.replace(tmp_path, COLLECTION_STATE_PATH)
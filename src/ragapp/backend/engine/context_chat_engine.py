@@ -0,0 +1,26 @@
+from typing import List
+
+from llama_index.core import QueryBundle
+from llama_index.core.chat_engine import CondensePlusContextChatEngine
+from llama_index.core.schema import NodeWithScore
+
+
+class ContextChatEngine(CondensePlusContextChatEngine):
+    """
+    Context chat engine awaiting the async postprocessors (e.g. the local reranker),
+    instead of running them on the event loop.
+    """
+
+    async def _aget_nodes(self, message: str) -> List[NodeWithScore]:
+        nodes = await self._retriever.aretrieve(message)
+        query_bundle = QueryBundle(message)
+        for postprocessor in self._node_postprocessors:
+            if hasattr(postprocessor, "apostprocess_nodes"):
+                nodes = await postprocessor.apostprocess_nodes(
+                    nodes, query_bundle=query_bundle
+                )
+            else:
+                nodes = postprocessor.postprocess_nodes(
+                    nodes, query_bundle=query_bundle
+                )
+        return nodes
@@ -0,0 +1,248 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from backend.services.metrics import MetricsService
+from backend.services.offload import run_blocking
+
+logger = logging.getLogger("uvicorn")
+
+# Shared by all the collections, so re-indexing into a new collection reuses the cached embeddings
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "storage/cache/embeddings.db")
+# Maximum number of cached embeddings, the least recently used ones are evicted
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# Number of cache hits whose last use is written at once, instead of writing on every lookup
+EMBEDDING_CACHE_LAST_USED_BATCH = int(
+    os.getenv("EMBEDDING_CACHE_LAST_USED_BATCH", "100")
+)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache stored in SQLite, keyed by the embedding model and the text hash.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        last_used_batch: int = EMBEDDING_CACHE_LAST_USED_BATCH,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.last_used_batch = last_used_batch
+        self._lock = threading.Lock()
+        # The last use of the hits which isn't written yet, it's only needed for the eviction
+        self._last_used: Dict[str, float] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def get_key(model_key: str, text: str) -> str:
+        return hashlib.sha256(f"{model_key}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Embedding]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+            if rows:
+                now = time.time()
+                self._last_used.update((key, now) for key, _ in rows)
+                if len(self._last_used) >= self.last_used_batch:
+                    self._write_last_used()
+                    self._conn.commit()
+        found = {key: array("f", blob).tolist() for key, blob in rows}
+        MetricsService.increment("embedding_cache", "hits", len(found))
+        MetricsService.increment("embedding_cache", "misses", len(keys) - len(found))
+        return found
+
+    def set_many(self, embeddings: Dict[str, Embedding]):
+        if not embeddings:
+            return
+        now = time.time()
+        with self._lock:
+            # The evicted entries are chosen by their last use
+            self._write_last_used()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, array("f", embedding).tobytes(), now)
+                    for key, embedding in embeddings.items()
+                ],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._last_used.clear()
+
+    def _write_last_used(self):
+        if self._last_used:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self._last_used.items()],
+            )
+            self._last_used.clear()
+
+    def _evict(self):
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            # Evict a bit more than needed, so not every insert has to evict
+            excess += self.max_entries // 10
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            MetricsService.increment("embedding_cache", "evictions", excess)
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wrap an embedding model to look up the embeddings of texts and queries in the cache
+    and only send the missing ones to the model.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _model_key: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            num_workers=embed_model.num_workers,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+        # Some models embed queries differently than texts, so both are cached separately
+        self._model_key = (
+            f"{embed_model.class_name()}:{embed_model.model_name}:"
+            f"{os.getenv('EMBEDDING_DIM', '')}"
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        return self._embed_model
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        key = self._cache.get_key(f"{self._model_key}:query", query)
+        cached = self._cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        embedding = self._embed_model._get_query_embedding(query)
+        self._cache.set_many({key: embedding})
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        key = self._cache.get_key(f"{self._model_key}:query", query)
+        # The SQLite calls block, and wait for the lock while the files are indexed
+        cached = await run_blocking(self._cache.get_many, [key])
+        if key in cached:
+            return cached[key]
+        embedding = await self._embed_model._aget_query_embedding(query)
+        await run_blocking(self._cache.set_many, {key: embedding})
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = self._lookup(texts)
+        if missing:
+            embeddings = self._embed_model._get_text_embeddings(
+                [texts[i] for i in missing]
+            )
+            self._store(keys, cached, missing, embeddings)
+        return [cached[key] for key in keys]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = await run_blocking(self._lookup, texts)
+        if missing:
+            embeddings = await self._embed_model._aget_text_embeddings(
+                [texts[i] for i in missing]
+            )
+            await run_blocking(self._store, keys, cached, missing, embeddings)
+        return [cached[key] for key in keys]
+
+    def _lookup(self, texts: List[str]):
+        keys = [self._cache.get_key(f"{self._model_key}:text", text) for text in texts]
+        cached = self._cache.get_many(list(set(keys)))
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        return keys, cached, missing
+
+    def _store(
+        self,
+        keys: List[str],
+        cached: Dict[str, Embedding],
+        missing: List[int],
+        embeddings: List[Embedding],
+    ):
+        new_embeddings = {
+            keys[i]: embedding for i, embedding in zip(missing, embeddings)
+        }
+        self._cache.set_many(new_embeddings)
+        cached.update(new_embeddings)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+            MetricsService.register_collector("embedding_cache", _collect_metrics)
+        return _cache
+
+
+def _collect_metrics() -> Dict[str, float]:
+    counters = MetricsService.get_counters("embedding_cache")
+    lookups = counters.get("hits", 0) + counters.get("misses", 0)
+    return {
+        "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0,
+        "entries": _cache.count() if _cache is not None else 0,
+    }
@@ -3,15 +3,26 @@ import os
 from typing import List, Optional
 
 from app.api.routers.models import ChatMessage
-from app.engine.index import IndexConfig, get_index
 from llama_index.core.agent import AgentRunner
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.chat_engine import CondensePlusContextChatEngine
 from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.settings import Settings
 
+from backend.controllers.agents import AgentManager
 from backend.engine.constants import DEFAULT_MAX_TOP_K, DEFAULT_TOP_K
+from backend.engine.context_chat_engine import ContextChatEngine
+from backend.engine.hybrid_retriever import (
+    get_hybrid_retriever,
+    is_hybrid_retrieval_enabled,
+)
+from backend.engine.index_registry import IndexRegistry
 from backend.engine.postprocessors import NodeCitationProcessor, get_reranker
+from backend.engine.response_cache import (
+    CachedCondensePlusContextChatEngine,
+    ResponseCache,
+)
 from backend.workflows.multi import AgentOrchestrator
 from backend.workflows.orchestrator import get_agents
 from backend.workflows.single import FunctionCallingAgent
@@ -21,7 +32,6 @@ logger = logging.getLogger("uvicorn")
 
 def get_chat_engine(
     filters=None,
-    params=None,
     event_handlers=None,
     chat_history: Optional[List[ChatMessage]] = None,
 ) -> CondensePlusContextChatEngine | AgentOrchestrator | FunctionCallingAgent:
@@ -45,19 +55,36 @@ def get_chat_engine(
     else:
         top_k = int(os.getenv("TOP_K", DEFAULT_TOP_K))
 
-    # We need to create index here because we need to pass the callback manager to the index
-    # and we need to pass the index to the agents
-    # TODO: Refactor code to create index independently
-    index_config = IndexConfig(callback_manager=callback_manager, **(params or {}))
-    index = get_index(index_config)
+    # The index is loaded once and shared across requests,
+    # we only bind the callback manager of this request to it
+    index = IndexRegistry.get_index(callback_manager=callback_manager)
     if index is None:
         raise RuntimeError("Index is not found")
 
-    query_engine = index.as_query_engine(
-        similarity_top_k=top_k,
-        node_postprocessors=node_postprocessors,
-        filters=filters,
-    )
+    if is_hybrid_retrieval_enabled():
+        # Match the exact terms of the query (e.g. identifiers) in addition to the dense similarity
+        retriever = get_hybrid_retriever(
+            index,
+            similarity_top_k=top_k or DEFAULT_TOP_K,
+            filters=filters,
+            callback_manager=callback_manager,
+        )
+        query_engine = RetrieverQueryEngine.from_args(
+            retriever=retriever,
+            llm=Settings.llm,
+            node_postprocessors=node_postprocessors,
+            callback_manager=callback_manager,
+        )
+    else:
+        retriever = index.as_retriever(
+            filters=filters,
+            **({"similarity_top_k": top_k} if top_k != 0 else {}),
+        )
+        query_engine = index.as_query_engine(
+            similarity_top_k=top_k,
+            node_postprocessors=node_postprocessors,
+            filters=filters,
+        )
     agents = get_agents(chat_history, query_engine)
     if len(agents) == 0:
         raise ValueError("Required at least one agent to run chat engine.")
@@ -70,19 +97,22 @@ def get_chat_engine(
         if citation_prompt is not None:
             system_prompt = f"{system_prompt}\n{citation_prompt}"
         if len(tools) == 1 and tools[0].metadata.name == "QueryEngine":
-            return CondensePlusContextChatEngine(
+            chat_engine_kwargs = dict(
                 llm=Settings.llm,
                 memory=ChatMemoryBuffer.from_defaults(
                     token_limit=Settings.llm.metadata.context_window - 256
                 ),
                 system_prompt=system_prompt,
-                retriever=index.as_retriever(
-                    filters=filters,
-                    **({"similarity_top_k": top_k} if top_k != 0 else {}),
-                ),
+                retriever=retriever,
                 node_postprocessors=node_postprocessors,
                 callback_manager=callback_manager,
             )
+            if ResponseCache.is_enabled():
+                return CachedCondensePlusContextChatEngine(
+                    cache_scope=ResponseCache.get_scope(filters),
+                    **chat_engine_kwargs,
+                )
+            return ContextChatEngine(**chat_engine_kwargs)
         else:
             return AgentRunner.from_llm(
                 llm=Settings.llm,
@@ -92,4 +122,9 @@ def get_chat_engine(
                 verbose=True,
             )
     else:
-        return AgentOrchestrator(agents=agents, refine_plan=False)
+        return AgentOrchestrator(
+            agents=agents,
+            refine_plan=False,
+            # Reuse the plans created for the same agents
+            plan_cache_scope=str(AgentManager().version),
+        )
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.indices.base import BaseIndex
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import MetadataFilters
+
+from backend.engine.sparse_index import SparseIndex, get_sparse_index
+from backend.services.metrics import MetricsService
+from backend.services.offload import run_blocking
+
+# The rank constant of the reciprocal rank fusion, a higher value gives the lower ranks more weight
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Number of candidates retrieved by each retriever before the fusion, relative to the top k
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "2"))
+
+
+def is_hybrid_retrieval_enabled() -> bool:
+    # LlamaCloud indexes aren't ingested locally, so they have no sparse index
+    return (
+        os.getenv("USE_HYBRID_RETRIEVAL", "false").lower() == "true"
+        and os.getenv("USE_LLAMA_CLOUD", "false").lower() != "true"
+    )
+
+
+def reciprocal_rank_fusion(
+    results: List[List[NodeWithScore]], top_k: int, k: int = HYBRID_RRF_K
+) -> List[NodeWithScore]:
+    """
+    Merge the ranked results of several retrievers by the sum of 1 / (k + rank) of each node,
+    the scores of the retrievers (cosine similarity, BM25) aren't comparable.
+    """
+    scores: Dict[str, float] = {}
+    nodes: Dict[str, NodeWithScore] = {}
+    for ranked in results:
+        for rank, node in enumerate(ranked, start=1):
+            scores[node.node.node_id] = scores.get(node.node.node_id, 0.0) + 1 / (
+                k + rank
+            )
+            nodes.setdefault(node.node.node_id, node)
+    fused = sorted(scores, key=scores.__getitem__, reverse=True)[:top_k]
+    return [
+        NodeWithScore(node=nodes[node_id].node, score=scores[node_id])
+        for node_id in fused
+    ]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieve the nodes by the dense similarity of the vector store and by the BM25 score of the sparse index,
+    fused by their ranks. Both retrievers apply the same metadata filters (public and selected private documents).
+    """
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        sparse_index: SparseIndex,
+        similarity_top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        callback_manager: Optional[CallbackManager] = None,
+    ):
+        self._vector_retriever = vector_retriever
+        self._sparse_index = sparse_index
+        self._similarity_top_k = similarity_top_k
+        self._filters = filters
+        super().__init__(callback_manager=callback_manager)
+
+    def _sparse_search(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._sparse_index.search(
+            query_bundle.query_str,
+            self._similarity_top_k * HYBRID_CANDIDATES_FACTOR,
+            self._filters,
+        )
+
+    def _fuse(
+        self, dense: List[NodeWithScore], sparse: List[NodeWithScore]
+    ) -> List[NodeWithScore]:
+        fused = reciprocal_rank_fusion([dense, sparse], self._similarity_top_k)
+        dense_ids = {node.node.node_id for node in dense}
+        MetricsService.increment("hybrid_retrieval", "queries")
+        # The nodes the dense retrieval alone would have missed
+        MetricsService.increment(
+            "hybrid_retrieval",
+            "sparse_only_nodes",
+            sum(node.node.node_id not in dense_ids for node in fused),
+        )
+        return fused
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = self._vector_retriever.retrieve(query_bundle)
+        return self._fuse(dense, self._sparse_search(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense, sparse = await asyncio.gather(
+            self._vector_retriever.aretrieve(query_bundle),
+            run_blocking(self._sparse_search, query_bundle),
+        )
+        return self._fuse(dense, sparse)
+
+
+def get_hybrid_retriever(
+    index: BaseIndex,
+    similarity_top_k: int,
+    filters: Optional[MetadataFilters] = None,
+    callback_manager: Optional[CallbackManager] = None,
+) -> HybridRetriever:
+    return HybridRetriever(
+        vector_retriever=index.as_retriever(
+            filters=filters,
+            similarity_top_k=similarity_top_k * HYBRID_CANDIDATES_FACTOR,
+        ),
+        sparse_index=get_sparse_index(),
+        similarity_top_k=similarity_top_k,
+        filters=filters,
+        callback_manager=callback_manager,
+    )
@@ -0,0 +1,135 @@
+import copy
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.indices.base import BaseIndex
+
+logger = logging.getLogger("uvicorn")
+
+# The environment variables that decide which index (and embedding model) is served
+INDEX_CONFIG_ENV_VARS = (
+    "USE_LLAMA_CLOUD",
+    "LLAMA_CLOUD_INDEX_NAME",
+    "LLAMA_CLOUD_PROJECT_NAME",
+    "LLAMA_CLOUD_API_KEY",
+    "VECTOR_STORE_PROVIDER",
+    "CHROMA_PATH",
+    "CHROMA_HOST",
+    "CHROMA_PORT",
+    "CHROMA_COLLECTION",
+    "QDRANT_URL",
+    "QDRANT_API_KEY",
+    "QDRANT_COLLECTION",
+    "MODEL_PROVIDER",
+    "EMBEDDING_MODEL",
+    "EMBEDDING_DIM",
+)
+
+
+class IndexRegistry:
+    """
+    Process-wide registry of the loaded index, keyed by the effective index configuration.
+    Loading an index opens a new vector store client, so it's done once and shared by all requests.
+    Call `invalidate` whenever the configuration or the underlying collection is replaced.
+    The generation is increased on every change of the index (including ingestion),
+    so caches of query results can detect that they are outdated.
+    """
+
+    _lock = threading.Lock()
+    _indexes: Dict[Tuple, BaseIndex] = {}
+    # The index served regardless of the configuration, e.g. while the index is rebuilt
+    _pinned: Optional[BaseIndex] = None
+    _generation = 0
+
+    @staticmethod
+    def get_config_key() -> Tuple:
+        return tuple(os.getenv(env_name) for env_name in INDEX_CONFIG_ENV_VARS)
+
+    @classmethod
+    def get_index(
+        cls, callback_manager: Optional[CallbackManager] = None
+    ) -> Optional[BaseIndex]:
+        """
+        Get the index of the current configuration, load it if it's not loaded yet.
+        If a callback manager is provided, return a request scoped view of the cached index.
+        """
+        key = cls.get_config_key()
+        index = cls._pinned or cls._indexes.get(key)
+        if index is None:
+            with cls._lock:
+                index = cls._indexes.get(key)
+                if index is None:
+                    index = cls._load_index()
+                    if index is None:
+                        return None
+                    # Only keep the index of the current config, the others are outdated
+                    cls._indexes = {key: index}
+        if callback_manager is not None:
+            return cls._with_callback_manager(index, callback_manager)
+        return index
+
+    @classmethod
+    def invalidate(cls, keep_pinned: bool = False):
+        """
+        Drop the loaded index, the next request will load it again from the vector store.
+        The pinned index is dropped too, unless `keep_pinned` is set (e.g. the embedding model is changed
+        and the index is rebuilt in the background).
+        """
+        with cls._lock:
+            if cls._indexes or (cls._pinned is not None and not keep_pinned):
+                logger.info("Invalidating the cached index")
+            cls._indexes = {}
+            if not keep_pinned:
+                cls._pinned = None
+            cls._generation += 1
+
+    @classmethod
+    def pin(cls):
+        """
+        Keep serving the current index (with the embedding model it was loaded with)
+        after the embedding configuration changes, until `unpin` (or `invalidate`) is called.
+        """
+        index = cls.get_index()
+        with cls._lock:
+            cls._pinned = index
+
+    @classmethod
+    def unpin(cls):
+        with cls._lock:
+            cls._pinned = None
+        cls.invalidate()
+
+    @classmethod
+    def is_pinned(cls) -> bool:
+        return cls._pinned is not None
+
+    @classmethod
+    def notify_changed(cls):
+        """
+        Mark the content of the index as changed, e.g. after documents were added or removed.
+        """
+        with cls._lock:
+            cls._generation += 1
+
+    @classmethod
+    def get_generation(cls) -> int:
+        return cls._generation
+
+    @staticmethod
+    def _load_index() -> Optional[BaseIndex]:
+        from app.engine.index import get_index
+
+        return get_index()
+
+    @staticmethod
+    def _with_callback_manager(
+        index: BaseIndex, callback_manager: CallbackManager
+    ) -> BaseIndex:
+        # The shallow copy shares the vector store client and the index struct with the cached index,
+        # only the callback manager is bound to the request
+        request_index = copy.copy(index)
+        request_index._callback_manager = callback_manager
+        return request_index
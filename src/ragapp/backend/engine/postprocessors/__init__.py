@@ -1,4 +1,5 @@
+from .local_reranker import LocalReranker
 from .node_citation import NodeCitationProcessor
-from .reranker import get_reranker
+from .reranker import get_reranker, warm_up_reranker
 
-__all__ = ["NodeCitationProcessor", "get_reranker"]
+__all__ = ["LocalReranker", "NodeCitationProcessor", "get_reranker", "warm_up_reranker"]
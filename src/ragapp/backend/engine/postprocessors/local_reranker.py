@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from llama_index.core import QueryBundle
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from pydantic import Field
+
+from backend.engine.constants import DEFAULT_TOP_K
+from backend.services.offload import run_blocking
+
+logger = logging.getLogger("uvicorn")
+
+# The quantized ONNX cross-encoder, one of the reranking models supported by fastembed
+DEFAULT_LOCAL_RERANK_MODEL = "Xenova/ms-marco-MiniLM-L-6-v2"
+# Number of query and node pairs scored in one inference
+LOCAL_RERANK_BATCH_SIZE = int(os.getenv("LOCAL_RERANK_BATCH_SIZE", "32"))
+# Maximum number of rerankings running at the same time, the others wait for their turn
+LOCAL_RERANK_WORKERS = int(os.getenv("LOCAL_RERANK_WORKERS", "2"))
+# Threads of each inference, so the workers together don't use more than the available cores
+LOCAL_RERANK_THREADS = int(
+    os.getenv(
+        "LOCAL_RERANK_THREADS",
+        str(max(1, (os.cpu_count() or 1) // LOCAL_RERANK_WORKERS)),
+    )
+)
+
+# The loaded models are shared by the rerankers of all requests
+_encoders: Dict[str, Any] = {}
+_encoders_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_cross_encoder(model: str):
+    """
+    Load the cross-encoder once, the model is downloaded on its first use.
+    """
+    from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+    with _encoders_lock:
+        if model not in _encoders:
+            logger.info(f"Loading the local reranker model {model}")
+            _encoders[model] = TextCrossEncoder(
+                model_name=model, threads=LOCAL_RERANK_THREADS
+            )
+        return _encoders[model]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _encoders_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=LOCAL_RERANK_WORKERS, thread_name_prefix="reranker"
+            )
+        return _executor
+
+
+class LocalReranker(BaseNodePostprocessor):
+    """
+    Rerank the nodes on the CPU with a cross-encoder, instead of sending them to a reranking service.
+    """
+
+    model: str = Field(default=DEFAULT_LOCAL_RERANK_MODEL)
+    top_n: int = Field(default=DEFAULT_TOP_K)
+    batch_size: int = Field(default=LOCAL_RERANK_BATCH_SIZE)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalReranker"
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        encoder = get_cross_encoder(self.model)
+        # Score in the bounded pool, so concurrent requests don't oversubscribe the CPU
+        return _get_executor().submit(self._score, encoder, query, texts).result()
+
+    async def ascore(self, query: str, texts: List[str]) -> List[float]:
+        encoder = await run_blocking(get_cross_encoder, self.model)
+        # Wait for the bounded pool without blocking the event loop
+        return await asyncio.wrap_future(
+            _get_executor().submit(self._score, encoder, query, texts)
+        )
+
+    def _score(self, encoder: Any, query: str, texts: List[str]) -> List[float]:
+        return list(encoder.rerank(query, texts, batch_size=self.batch_size))
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if len(nodes) == 0:
+            return []
+
+        with self._rerank_event(nodes, query_bundle) as event:
+            scores = self.score(query_bundle.query_str, self._get_texts(nodes))
+            new_nodes = self._rank(nodes, scores)
+            event.on_end(payload={EventPayload.NODES: new_nodes})
+        return new_nodes
+
+    async def apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+        query_str: Optional[str] = None,
+    ) -> List[NodeWithScore]:
+        """
+        Postprocess nodes on the async chat path, without blocking the event loop while scoring.
+        """
+        if query_str is not None and query_bundle is not None:
+            raise ValueError("Cannot specify both query_str and query_bundle")
+        elif query_str is not None:
+            query_bundle = QueryBundle(query_str)
+        return await self._apostprocess_nodes(nodes, query_bundle)
+
+    async def _apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if len(nodes) == 0:
+            return []
+
+        with self._rerank_event(nodes, query_bundle) as event:
+            scores = await self.ascore(query_bundle.query_str, self._get_texts(nodes))
+            new_nodes = self._rank(nodes, scores)
+            event.on_end(payload={EventPayload.NODES: new_nodes})
+        return new_nodes
+
+    def _rerank_event(self, nodes: List[NodeWithScore], query_bundle: QueryBundle):
+        return self.callback_manager.event(
+            CBEventType.RERANKING,
+            payload={
+                EventPayload.NODES: nodes,
+                EventPayload.MODEL_NAME: self.model,
+                EventPayload.QUERY_STR: query_bundle.query_str,
+                EventPayload.TOP_K: self.top_n,
+            },
+        )
+
+    @staticmethod
+    def _get_texts(nodes: List[NodeWithScore]) -> List[str]:
+        return [
+            node.node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes
+        ]
+
+    def _rank(
+        self, nodes: List[NodeWithScore], scores: List[float]
+    ) -> List[NodeWithScore]:
+        ranked = sorted(zip(nodes, scores), key=lambda pair: pair[1], reverse=True)
+        return [
+            NodeWithScore(node=node.node, score=float(score))
+            for node, score in ranked[: self.top_n]
+        ]
@@ -1,11 +1,20 @@
+import logging
 import os
 
 from llama_index.core.postprocessor.types import BaseNodePostprocessor
 
 from backend.engine.constants import DEFAULT_TOP_K
+from backend.engine.postprocessors.local_reranker import (
+    DEFAULT_LOCAL_RERANK_MODEL,
+    LocalReranker,
+)
+from backend.services.http_clients import HttpClientRegistry
+
+logger = logging.getLogger("uvicorn")
 
 
 def get_cohere_reranker():
+    from cohere import Client
     from llama_index.postprocessor.cohere_rerank import CohereRerank
 
     api_key = os.getenv("COHERE_API_KEY")
@@ -15,10 +24,22 @@ def get_cohere_reranker():
             "Please set your COHERE_API_KEY. Get it from https://dashboard.cohere.com/api-keys"
         )
 
-    return CohereRerank(
+    reranker = CohereRerank(
         api_key=api_key,
         top_n=top_k,
     )
+    # Send the requests with the pooled client instead of a new client for each reranker
+    reranker._client = Client(
+        api_key=api_key, httpx_client=HttpClientRegistry.get_client("cohere")
+    )
+    return reranker
+
+
+def get_local_reranker():
+    return LocalReranker(
+        model=os.getenv("LOCAL_RERANK_MODEL") or DEFAULT_LOCAL_RERANK_MODEL,
+        top_n=int(os.getenv("TOP_K", DEFAULT_TOP_K)),
+    )
 
 
 def get_reranker() -> BaseNodePostprocessor:
@@ -28,5 +49,22 @@ def get_reranker() -> BaseNodePostprocessor:
 
     if rerank_provider == "cohere":
         return get_cohere_reranker()
+    elif rerank_provider == "local":
+        return get_local_reranker()
     else:
         raise ValueError(f"Unknown rerank provider: {rerank_provider}")
+
+
+def warm_up_reranker():
+    """
+    Load the model of the local reranker and run it once,
+    so the first query doesn't wait for the download and the initialization.
+    """
+    if os.getenv("USE_RERANKER", "False").lower() != "true":
+        return
+    if os.getenv("RERANK_PROVIDER") != "local":
+        return
+    try:
+        get_local_reranker().score("warm up", ["warm up"])
+    except Exception:
+        logger.exception("Could not warm up the local reranker")
@@ -1,12 +1,14 @@
-from app.engine.index import get_index
+import os
+
 from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters
-from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
 
 
 def generate_filters(doc_ids):
-    current_index = get_index()
+    # The filter dialect only depends on the configured index type,
+    # resolve it from the config instead of loading the index
+    use_llama_cloud = os.getenv("USE_LLAMA_CLOUD", "false").lower() == "true"
 
-    if isinstance(current_index, LlamaCloudIndex):
+    if use_llama_cloud:
         public_doc_filter = MetadataFilter(
             key="private",
             value=None,
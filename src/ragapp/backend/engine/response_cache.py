@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from cachetools import TTLCache
+from llama_index.core.base.embeddings.base import Embedding, similarity
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.core.base.response.schema import AsyncStreamingResponse
+from llama_index.core.callbacks import trace_method
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.settings import Settings
+from llama_index.core.vector_stores.types import MetadataFilters
+
+from backend.engine.context_chat_engine import ContextChatEngine
+from backend.engine.index_registry import IndexRegistry
+from backend.services.metrics import MetricsService
+from backend.services.offload import run_blocking
+
+logger = logging.getLogger("uvicorn")
+
+
+@dataclass
+class CachedResponse:
+    scope: Tuple
+    embedding: Embedding
+    answer: str
+    source_nodes: List[NodeWithScore] = field(default_factory=list)
+
+
+class ResponseCache:
+    """
+    In-memory cache of chat answers, looked up by the embedding similarity of the condensed question.
+    An answer is only reused within the same scope: the index generation, the document filters
+    and the agent config version, so it's never served after the index or the config changed.
+    """
+
+    _lock = threading.Lock()
+    _cache: Optional[TTLCache] = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return os.getenv("USE_RESPONSE_CACHE", "false").lower() == "true"
+
+    @staticmethod
+    def get_scope(filters: Optional[MetadataFilters] = None) -> Tuple:
+        from backend.controllers.agents import AgentManager
+
+        return (
+            IndexRegistry.get_generation(),
+            filters.model_dump_json() if filters is not None else None,
+            AgentManager().version,
+        )
+
+    @classmethod
+    def lookup(cls, scope: Tuple, embedding: Embedding) -> Optional[CachedResponse]:
+        threshold = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+        best, best_score = None, threshold
+        with cls._lock:
+            entries = list(cls._get_cache().values())
+        for entry in entries:
+            if entry.scope != scope:
+                continue
+            score = similarity(embedding, entry.embedding)
+            if score >= best_score:
+                best, best_score = entry, score
+        MetricsService.increment("response_cache", "hits" if best else "misses")
+        return best
+
+    @classmethod
+    def add(cls, entry: CachedResponse):
+        with cls._lock:
+            cls._get_cache()[uuid.uuid4().hex] = entry
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache = None
+
+    @classmethod
+    def _get_cache(cls) -> TTLCache:
+        if cls._cache is None:
+            cls._cache = TTLCache(
+                maxsize=int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "1000")),
+                ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            )
+        return cls._cache
+
+
+class CachedCondensePlusContextChatEngine(ContextChatEngine):
+    """
+    Context chat engine answering from the response cache if a similar question was answered before.
+    """
+
+    def __init__(self, *args, cache_scope: Tuple, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_scope = cache_scope
+        self._condensed_question: Optional[str] = None
+
+    async def _acondense_question(
+        self, chat_history: List[ChatMessage], latest_message: str
+    ) -> str:
+        # The question is condensed once for the cache lookup and reused for the retrieval
+        if self._condensed_question is not None:
+            return self._condensed_question
+        return await super()._acondense_question(chat_history, latest_message)
+
+    @trace_method("chat")
+    async def astream_chat(
+        self, message: str, chat_history: Optional[List[ChatMessage]] = None
+    ) -> StreamingAgentChatResponse:
+        if chat_history is not None:
+            self._memory.set(chat_history)
+        self._condensed_question = await self._acondense_question(
+            self._memory.get(input=message), message
+        )
+        embedding = await Settings.embed_model.aget_query_embedding(
+            self._condensed_question
+        )
+
+        # The similarity scan over the cached answers runs off the event loop
+        cached = await run_blocking(ResponseCache.lookup, self._cache_scope, embedding)
+        if cached is not None:
+            logger.info("Answering from the response cache")
+            return StreamingAgentChatResponse(
+                achat_stream=_replay(cached.answer),
+                source_nodes=cached.source_nodes,
+                is_writing_to_memory=False,
+            )
+
+        # Like CondensePlusContextChatEngine.astream_chat, with the answer recorded
+        # by the LLM stream the response is created with
+        synthesizer, context_source, context_nodes = await self._arun_c3(
+            message, chat_history, streaming=True
+        )
+        response = await synthesizer.asynthesize(message, context_nodes)
+        return StreamingAgentChatResponse(
+            achat_stream=self._record(
+                self._chat_stream(message, response), embedding, context_nodes
+            ),
+            sources=[context_source],
+            source_nodes=context_nodes,
+            is_writing_to_memory=False,
+        )
+
+    async def _chat_stream(self, message: str, response: AsyncStreamingResponse):
+        full_response = ""
+        async for token in response.async_response_gen():
+            full_response += token
+            yield ChatResponse(
+                message=ChatMessage(content=full_response, role=MessageRole.ASSISTANT),
+                delta=token,
+            )
+        await self._memory.aput(ChatMessage(content=message, role=MessageRole.USER))
+        await self._memory.aput(
+            ChatMessage(content=full_response, role=MessageRole.ASSISTANT)
+        )
+
+    async def _record(self, chat_stream, embedding: Embedding, source_nodes):
+        answer = ""
+        async for chat_response in chat_stream:
+            answer += chat_response.delta or ""
+            yield chat_response
+        # Only cache complete answers: a stream closed on a client disconnect stops before this point,
+        # while a stream read to the end (e.g. by the memory writer) has the complete answer
+        if answer:
+            ResponseCache.add(
+                CachedResponse(
+                    scope=self._cache_scope,
+                    embedding=embedding,
+                    answer=answer,
+                    source_nodes=source_nodes,
+                )
+            )
+
+
+async def _replay(answer: str):
+    yield ChatResponse(
+        message=ChatMessage(content=answer, role=MessageRole.ASSISTANT),
+        delta=answer,
+    )
@@ -0,0 +1,24 @@
+import os
+
+from llama_index.core.settings import Settings
+
+from backend.engine.embedding_cache import CachedEmbedding, get_embedding_cache
+from backend.services.http_clients import HttpClientRegistry
+from create_llama.backend.app.settings import init_settings as init_model_settings
+
+
+def init_settings():
+    """
+    Initialize the LlamaIndex settings from the environment variables,
+    caching the embeddings of the configured model if enabled.
+    The models send their requests with the pooled HTTP clients of their provider.
+    """
+    init_model_settings()
+    provider = os.getenv("MODEL_PROVIDER")
+    HttpClientRegistry.attach(Settings.llm, provider)
+    HttpClientRegistry.attach(Settings.embed_model, provider)
+    if os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true":
+        Settings.embed_model = CachedEmbedding(
+            embed_model=Settings.embed_model,
+            cache=get_embedding_cache(),
+        )
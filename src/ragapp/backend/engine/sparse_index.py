@@ -0,0 +1,303 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore
+from llama_index.core.vector_stores.simple import _build_metadata_filter_fn
+from llama_index.core.vector_stores.types import MetadataFilters
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+
+logger = logging.getLogger("uvicorn")
+
+SPARSE_INDEX_FILE_NAME = "sparse_index_{collection}.db"
+# The BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Number of candidates whose metadata is checked against the filters at once
+FILTER_BATCH_SIZE = 100
+
+# Words, numbers and identifiers joined by dashes, dots, slashes or underscores (e.g. XK-2041.B)
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was "
+    "were what when where which who will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase words, an identifier is kept as a whole and also split into its parts,
+    so "XK-2041" is matched by both "xk-2041" and "2041".
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token not in _STOPWORDS:
+            tokens.append(token)
+        parts = re.split(r"[-./_]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in _STOPWORDS)
+    return tokens
+
+
+class SparseIndex:
+    """
+    Local BM25 inverted index of the nodes of a collection, stored in SQLite next to the ingestion manifest.
+    It's updated with the vector store during the ingestion, so the exact terms of a query
+    (identifiers, part numbers) can be matched in addition to the dense similarity.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "node_id TEXT PRIMARY KEY, ref_doc_id TEXT, length INTEGER NOT NULL, node TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS nodes_ref_doc_id ON nodes (ref_doc_id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, node_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, node_id)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS postings_node_id ON postings (node_id)"
+        )
+        self._conn.commit()
+        # The corpus statistics of the BM25 scores, kept up to date by the changes
+        self._node_count, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM nodes"
+        ).fetchone()
+
+    @staticmethod
+    def get_path(collection: Optional[str] = None) -> str:
+        """
+        Each collection has its own sparse index, the active collection is used by default.
+        """
+        from backend.engine.collection_state import CollectionManager
+
+        collection = collection or CollectionManager.get_active_collection()
+        return os.path.join(
+            os.getenv("STORAGE_DIR", "storage"),
+            SPARSE_INDEX_FILE_NAME.format(collection=collection),
+        )
+
+    def add_nodes(self, nodes: Sequence[BaseNode]):
+        """
+        Add the nodes to the index, nodes with the same id are replaced.
+        """
+        if not nodes:
+            return
+        rows = []
+        postings = []
+        for node in nodes:
+            terms = Counter(tokenize(node.get_content(metadata_mode=MetadataMode.NONE)))
+            # The same metadata as stored in the vector stores, e.g. with the `doc_id` of the filters
+            metadata = node_to_metadata_dict(
+                node, remove_text=False, flat_metadata=False
+            )
+            rows.append(
+                (
+                    node.node_id,
+                    node.ref_doc_id,
+                    sum(terms.values()),
+                    json.dumps(metadata),
+                )
+            )
+            postings.extend((term, node.node_id, tf) for term, tf in terms.items())
+        with self._lock:
+            self._delete(
+                "SELECT node_id, length FROM nodes WHERE node_id IN ({})",
+                [node.node_id for node in nodes],
+            )
+            self._conn.executemany(
+                "INSERT INTO nodes (node_id, ref_doc_id, length, node) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (term, node_id, tf) VALUES (?, ?, ?)", postings
+            )
+            self._conn.commit()
+            self._node_count += len(rows)
+            self._total_length += sum(row[2] for row in rows)
+
+    def delete_ref_docs(self, ref_doc_ids: Sequence[str]):
+        """
+        Remove the nodes of the given documents, like `vector_store.delete(ref_doc_id)`.
+        """
+        if not ref_doc_ids:
+            return
+        with self._lock:
+            self._delete(
+                "SELECT node_id, length FROM nodes WHERE ref_doc_id IN ({})",
+                list(ref_doc_ids),
+            )
+            self._conn.commit()
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[Sequence[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ):
+        """
+        Remove the nodes with the given ids or matching the filters, like `vector_store.delete_nodes`.
+        """
+        with self._lock:
+            if filters is not None:
+                rows = self._conn.execute("SELECT node_id, node FROM nodes").fetchall()
+                metadata = {node_id: json.loads(node) for node_id, node in rows}
+                matches = _build_metadata_filter_fn(metadata.__getitem__, filters)
+                filtered_ids = [node_id for node_id in metadata if matches(node_id)]
+                if node_ids is not None:
+                    filtered_ids = list(set(filtered_ids) & set(node_ids))
+                node_ids = filtered_ids
+            self._delete(
+                "SELECT node_id, length FROM nodes WHERE node_id IN ({})",
+                list(node_ids or []),
+            )
+            self._conn.commit()
+
+    def missing_node_ids(self, node_ids: Sequence[str]) -> List[str]:
+        """
+        The given nodes which are not in the index, e.g. they were ingested before the index existed.
+        """
+        found = set()
+        with self._lock:
+            for start in range(0, len(node_ids), FILTER_BATCH_SIZE):
+                batch = list(node_ids[start : start + FILTER_BATCH_SIZE])
+                found.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT node_id FROM nodes WHERE node_id IN ({_placeholders(batch)})",
+                        batch,
+                    )
+                )
+        return [node_id for node_id in node_ids if node_id not in found]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._node_count
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[NodeWithScore]:
+        """
+        The `top_k` nodes with the highest BM25 score for the query, among the nodes matching the filters.
+        """
+        terms = Counter(tokenize(query))
+        if not terms or top_k <= 0:
+            return []
+        with self._lock:
+            if self._node_count == 0:
+                return []
+            avg_length = self._total_length / self._node_count
+            scores: Dict[str, float] = {}
+            lengths: Dict[str, int] = {}
+            for term, query_tf in terms.items():
+                postings = self._conn.execute(
+                    "SELECT p.node_id, p.tf, n.length FROM postings p "
+                    "JOIN nodes n ON n.node_id = p.node_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (self._node_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for node_id, tf, length in postings:
+                    lengths[node_id] = length
+                    scores[node_id] = scores.get(node_id, 0.0) + query_tf * idf * (
+                        tf
+                        * (BM25_K1 + 1)
+                        / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                    )
+            ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+            # Check the filters in the order of the scores, until enough nodes are found
+            results = []
+            for start in range(0, len(ranked), FILTER_BATCH_SIZE):
+                batch = ranked[start : start + FILTER_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT node_id, node FROM nodes WHERE node_id IN ({_placeholders(batch)})",
+                    batch,
+                ).fetchall()
+                metadata = {node_id: json.loads(node) for node_id, node in rows}
+                matches = _build_metadata_filter_fn(metadata.__getitem__, filters)
+                for node_id in batch:
+                    if matches(node_id):
+                        results.append(
+                            NodeWithScore(
+                                node=metadata_dict_to_node(metadata[node_id]),
+                                score=scores[node_id],
+                            )
+                        )
+                        if len(results) == top_k:
+                            return results
+            return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _delete(self, select: str, values: List[str]):
+        for start in range(0, len(values), FILTER_BATCH_SIZE):
+            batch = values[start : start + FILTER_BATCH_SIZE]
+            rows = self._conn.execute(
+                select.format(_placeholders(batch)), batch
+            ).fetchall()
+            if not rows:
+                continue
+            node_ids = [node_id for node_id, _ in rows]
+            placeholders = _placeholders(node_ids)
+            self._conn.execute(
+                f"DELETE FROM postings WHERE node_id IN ({placeholders})", node_ids
+            )
+            self._conn.execute(
+                f"DELETE FROM nodes WHERE node_id IN ({placeholders})", node_ids
+            )
+            self._node_count -= len(rows)
+            self._total_length -= sum(length for _, length in rows)
+
+
+def _placeholders(values: Sequence) -> str:
+    return ",".join("?" * len(values))
+
+
+# The opened indexes are shared by the ingestion jobs and the requests
+_indexes: Dict[str, SparseIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sparse_index(collection: Optional[str] = None) -> SparseIndex:
+    path = SparseIndex.get_path(collection)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = SparseIndex(path)
+        return _indexes[path]
+
+
+def delete_sparse_index(collection: str):
+    path = SparseIndex.get_path(collection)
+    with _indexes_lock:
+        index = _indexes.pop(path, None)
+        if index is not None:
+            index.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
@@ -1,15 +1,62 @@
 import importlib
 import logging
 import os
+import sys
 
 logger = logging.getLogger(__name__)
 
 
-def get_vector_store():
+def _get_provider_module():
     provider = os.getenv("VECTOR_STORE_PROVIDER", "chroma")
     try:
         module = importlib.import_module(f"backend.engine.vectordbs.{provider}")
         logger.info(f"Using vector provider: {provider}")
-        return module.get_vector_store()
+        return module
     except ImportError:
         raise ValueError(f"Unsupported vector provider: {provider}")
+
+
+def get_vector_store(collection_name: str | None = None):
+    """
+    Get the vector store of the given collection, the active collection of the configured one by default.
+    """
+    return _get_provider_module().get_vector_store(collection_name)
+
+
+def delete_collection(collection_name: str):
+    _get_provider_module().delete_collection(collection_name)
+
+
+def ensure_collection(collection_name: str):
+    _get_provider_module().ensure_collection(collection_name)
+
+
+def activate_collection(collection_name: str, active_collection: str):
+    _get_provider_module().activate_collection(collection_name, active_collection)
+
+
+def _get_loaded_provider_modules():
+    # The provider may have been changed since its clients were created
+    return [
+        module
+        for name, module in list(sys.modules.items())
+        if name.startswith("backend.engine.vectordbs.")
+    ]
+
+
+def clear_clients():
+    """
+    Drop the shared clients of the vector stores after the config changed.
+    """
+    for module in _get_loaded_provider_modules():
+        if hasattr(module, "clear_clients"):
+            module.clear_clients()
+
+
+async def close_clients():
+    """
+    Close the shared clients of the vector stores on shutdown.
+    """
+    for module in _get_loaded_provider_modules():
+        if hasattr(module, "close_clients"):
+            await module.close_clients()
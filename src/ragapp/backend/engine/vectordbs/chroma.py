@@ -1,14 +1,45 @@
 import os
+from typing import Any, List, Sequence
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
 from llama_index.vector_stores.chroma import ChromaVectorStore
 
+from backend.engine.collection_state import CollectionManager
+from backend.services.offload import run_blocking
+
+
+class AsyncChromaVectorStore(ChromaVectorStore):
+    """
+    Chroma has no async client, run the blocking calls of the async methods in the thread pool
+    instead of the event loop (the base class calls the sync methods directly).
+    """
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        return await run_blocking(self.query, query, **kwargs)
+
+    async def async_add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        return await run_blocking(self.add, nodes, **kwargs)
 
-def get_vector_store():
-    collection_name = os.getenv("CHROMA_COLLECTION", "default")
+    async def adelete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        await run_blocking(self.delete, ref_doc_id, **delete_kwargs)
+
+
+def get_vector_store(collection_name: str | None = None):
+    # Use the active collection of the configured one if no collection is given
+    collection_name = collection_name or CollectionManager.get_active_collection(
+        os.getenv("CHROMA_COLLECTION", "default")
+    )
     chroma_path = os.getenv("CHROMA_PATH")
     # if CHROMA_PATH is set, use a local ChromaVectorStore from the path
     # otherwise, use a remote ChromaVectorStore (ChromaDB Cloud is not supported yet)
     if chroma_path:
-        store = ChromaVectorStore.from_params(
+        store = AsyncChromaVectorStore.from_params(
             persist_dir=chroma_path, collection_name=collection_name
         )
     else:
@@ -16,9 +47,36 @@ def get_vector_store():
             raise ValueError(
                 "Please provide either CHROMA_PATH or CHROMA_HOST and CHROMA_PORT"
             )
-        store = ChromaVectorStore.from_params(
+        store = AsyncChromaVectorStore.from_params(
             host=os.getenv("CHROMA_HOST"),
             port=int(os.getenv("CHROMA_PORT")),
             collection_name=collection_name,
         )
     return store
+
+
+def delete_collection(collection_name: str):
+    import chromadb
+
+    chroma_path = os.getenv("CHROMA_PATH")
+    if chroma_path:
+        client = chromadb.PersistentClient(path=chroma_path)
+    else:
+        client = chromadb.HttpClient(
+            host=os.getenv("CHROMA_HOST"), port=int(os.getenv("CHROMA_PORT"))
+        )
+    try:
+        client.delete_collection(collection_name)
+    except ValueError:
+        # The collection doesn't exist
+        pass
+
+
+def ensure_collection(collection_name: str):
+    # Chroma creates the collection when the vector store is created
+    get_vector_store(collection_name)
+
+
+def activate_collection(collection_name: str, active_collection: str):
+    # Chroma has no aliases, the active collection is resolved from the collection state
+    pass
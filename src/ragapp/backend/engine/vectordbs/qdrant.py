@@ -1,19 +1,117 @@
 import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 
+from backend.engine.collection_state import CollectionManager
+
+# The clients of each URL and API key, shared by the vector stores of all requests
+_clients: Dict[Tuple[str, Optional[str]], Tuple] = {}
+# The clients of a previous config, they may still be used by a running request
+_retired_clients: List[Tuple] = []
+_clients_lock = threading.Lock()
+
 
-def get_vector_store():
-    collection_name = os.getenv("QDRANT_COLLECTION")
+def get_vector_store(collection_name: str | None = None):
+    configured_collection = os.getenv("QDRANT_COLLECTION")
     url = os.getenv("QDRANT_URL")
     api_key = os.getenv("QDRANT_API_KEY")
-    if not collection_name or not url:
+    if not configured_collection or not url:
         raise ValueError(
             "Please set QDRANT_COLLECTION, QDRANT_URL"
             " to your environment variables or config them in the .env file"
         )
-    store = QdrantVectorStore(
-        collection_name=collection_name,
-        url=url,
-        api_key=api_key,
+    # Use the active collection of the configured one if no collection is given
+    collection_name = collection_name or CollectionManager.get_active_collection(
+        configured_collection
     )
+    client, aclient = _get_clients(url, api_key)
+    store = QdrantVectorStore(collection_name=collection_name, client=client)
+    # Passing both clients to the constructor logs a warning meant for in-memory clients
+    store._aclient = aclient
     return store
+
+
+def _get_clients(url: str, api_key: Optional[str]) -> Tuple:
+    """
+    Share the clients (and their connection pools) across the vector stores.
+    The async client is used by the async queries of the chat, so they don't block the event loop.
+    """
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+
+    with _clients_lock:
+        if (url, api_key) not in _clients:
+            _clients[(url, api_key)] = (
+                QdrantClient(url=url, api_key=api_key),
+                AsyncQdrantClient(url=url, api_key=api_key),
+            )
+        return _clients[(url, api_key)]
+
+
+def clear_clients():
+    """
+    Create new clients on the next use, e.g. after the URL or the API key changed.
+    The current clients are closed on shutdown.
+    """
+    with _clients_lock:
+        _retired_clients.extend(_clients.values())
+        _clients.clear()
+
+
+async def close_clients():
+    """
+    Close the connections of the clients on the shutdown of the app.
+    """
+    with _clients_lock:
+        clients = list(_clients.values()) + _retired_clients
+        _clients.clear()
+        _retired_clients.clear()
+    for client, aclient in clients:
+        client.close()
+        await aclient.close()
+
+
+def delete_collection(collection_name: str):
+    store = get_vector_store(collection_name)
+    store.client.delete_collection(collection_name)
+
+
+def ensure_collection(collection_name: str):
+    # Qdrant creates the collection on the first insert, create it for an empty index
+    store = get_vector_store(collection_name)
+    if not store._collection_exists(collection_name):
+        store._create_collection(
+            collection_name=collection_name,
+            vector_size=int(os.getenv("EMBEDDING_DIM", 1536)),
+        )
+
+
+def activate_collection(collection_name: str, active_collection: str):
+    """
+    Point the alias of the configured collection name to the active collection,
+    so other Qdrant clients using the configured name are switched atomically too.
+    """
+    from qdrant_client import models
+
+    client = get_vector_store(active_collection).client
+    collections = client.get_collections().collections
+    if any(collection.name == collection_name for collection in collections):
+        # The configured name is still used by a collection created before the aliases
+        return
+    operations = [
+        models.CreateAliasOperation(
+            create_alias=models.CreateAlias(
+                collection_name=active_collection, alias_name=collection_name
+            )
+        )
+    ]
+    aliases = client.get_aliases().aliases
+    if any(alias.alias_name == collection_name for alias in aliases):
+        operations.insert(
+            0,
+            models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=collection_name)
+            ),
+        )
+    client.update_collection_aliases(change_aliases_operations=operations)
@@ -1,21 +1,28 @@
-from pydantic import BaseModel, Field
-
+from typing import Optional
 
+from pydantic import BaseModel, Field
 
 
 class FileStatus:
     UPLOADED = "uploaded"
     UPLOADING = "uploading"
+    INDEXING = "indexing"
+    FAILED = "failed"
 
 
 class File(BaseModel):
     name: str = Field(..., description="The name of the file.")
     status: str = Field(..., description="The status of the file.")
+    job_id: Optional[str] = Field(
+        default=None,
+        description="The id of the indexing job of the file, to track its progress.",
+    )
 
     class Config:
         json_schema_extra = {
             "example": {
                 "name": "example.txt",
-                "status": "uploaded",
+                "status": "indexing",
+                "job_id": "0b8b7d4e-2c39-4a0e-9d8c-6f0a3c0c2c1e",
             }
         }
@@ -15,4 +15,6 @@ class UserChatRequest(SQLModel, table=True):
     __table_args__ = (
         Index("idx_user_id", "user_id"),
         Index("idx_time_frame", "time_frame"),
+        # Prevent concurrent requests from creating duplicate counters
+        Index("idx_user_id_time_frame", "user_id", "time_frame", unique=True),
     )
@@ -1,9 +1,11 @@
+from typing import Type
+
 from pydantic import Field
 
 from backend.models.base_env import BaseEnvConfig
 
 
-class CohereRerankerConfig(BaseEnvConfig):
+class RerankerConfig(BaseEnvConfig):
     use_reranker: bool | None = Field(
         default=None,
         description="Whether to use the reranker service or not.",
@@ -11,9 +13,16 @@ class CohereRerankerConfig(BaseEnvConfig):
     )
     rerank_provider: str | None = Field(
         default="cohere",
-        description="The provider of the reranker service.",
+        description="The provider of the reranker service: cohere or local.",
         env="RERANK_PROVIDER",
     )
+
+    class Config:
+        # The admin UI sends the fields of all the providers
+        extra = "ignore"
+
+
+class CohereRerankerConfig(RerankerConfig):
     cohere_api_key: str | None = Field(
         default=None,
         description="The API key for the Cohere API.",
@@ -21,5 +30,19 @@ class CohereRerankerConfig(BaseEnvConfig):
     )
 
 
-def get_reranker_config():
-    return CohereRerankerConfig()
+class LocalRerankerConfig(RerankerConfig):
+    local_rerank_model: str | None = Field(
+        default=None,
+        description="The cross-encoder model of the local reranker, one supported by fastembed.",
+        env="LOCAL_RERANK_MODEL",
+    )
+
+
+def get_reranker_config_class(rerank_provider: str | None) -> Type[RerankerConfig]:
+    if rerank_provider == "local":
+        return LocalRerankerConfig
+    return CohereRerankerConfig
+
+
+def get_reranker_config() -> RerankerConfig:
+    return get_reranker_config_class(RerankerConfig().rerank_provider)()
@@ -12,6 +12,8 @@ class E2BInterpreterToolConfig(BaseModel):
 
 class E2BInterpreterTool(BaseModel):
     config_id: ClassVar[str] = "interpreter"
+    # The interpreter keeps a sandbox session, so it's created per chat request
+    shareable: ClassVar[bool] = False
     name: Literal["Interpreter"] = "Interpreter"
     tool_type: Literal["local"] = "local"
     label: Literal["Code Interpreter"] = "Code Interpreter"
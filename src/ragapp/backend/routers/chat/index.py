@@ -14,6 +14,7 @@ from backend.routers.chat.vercel_response import (
     ChatEngineVercelStreamResponse,
     WorkflowVercelStreamResponse,
 )
+from backend.services.offload import run_blocking
 
 chat_router = r = APIRouter()
 
@@ -32,14 +33,14 @@ async def chat(
 
         doc_ids = data.get_chat_document_ids()
         filters = generate_filters(doc_ids)
-        params = data.data or {}
         logger.info(
             f"Creating chat engine with filters: {str(filters)}",
         )
         event_handler = EventCallbackHandler()
-        chat_engine = get_chat_engine(
+        # Loading the index and the agent config may connect to the vector store or read files
+        chat_engine = await run_blocking(
+            get_chat_engine,
             filters=filters,
-            params=params,
             event_handlers=[event_handler],
             chat_history=messages,
         )
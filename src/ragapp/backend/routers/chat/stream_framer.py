@@ -0,0 +1,84 @@
+import asyncio
+import os
+from typing import AsyncIterable, AsyncIterator, Optional
+
+# A text frame is sent once it has this many characters
+STREAM_FLUSH_SIZE = int(os.getenv("STREAM_FLUSH_SIZE", "64"))
+# or once its first token is waiting for this many seconds
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+
+
+class _StreamEnd:
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+async def coalesce_text(
+    tokens: AsyncIterable[str],
+    flush_size: int = STREAM_FLUSH_SIZE,
+    flush_interval: float = STREAM_FLUSH_INTERVAL,
+) -> AsyncIterator[str]:
+    """
+    Join the streamed tokens into larger text chunks, so each chunk is encoded and sent as one frame.
+    A chunk is flushed when it reaches `flush_size` characters or after `flush_interval` seconds,
+    so a slow generation is still shown as it's written.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _read():
+        try:
+            async for token in tokens:
+                queue.put_nowait(token)
+        except Exception as e:
+            queue.put_nowait(_StreamEnd(e))
+        else:
+            queue.put_nowait(_StreamEnd())
+
+    # Read the tokens in a task, so the buffered text can be flushed while waiting for the next one
+    reader = asyncio.ensure_future(_read())
+    buffer = ""
+    deadline = 0.0
+    try:
+        while True:
+            if buffer and queue.empty():
+                # Not asyncio.wait_for, which drops the cancellation of the stream
+                # if the next token arrives at the same time
+                getter = asyncio.ensure_future(queue.get())
+                try:
+                    await asyncio.wait(
+                        [getter], timeout=max(0.0, deadline - loop.time())
+                    )
+                finally:
+                    getter.cancel()
+                if not getter.done():
+                    yield buffer
+                    buffer = ""
+                    continue
+                item = getter.result()
+            else:
+                item = await queue.get()
+
+            if isinstance(item, _StreamEnd):
+                if buffer:
+                    yield buffer
+                if item.error is not None:
+                    raise item.error
+                break
+            if not item:
+                continue
+            if not buffer:
+                deadline = loop.time() + flush_interval
+            buffer += item
+            if len(buffer) >= flush_size or loop.time() >= deadline:
+                yield buffer
+                buffer = ""
+    finally:
+        reader.cancel()
+        # Not `await reader`: its CancelledError can't be told apart from a cancellation of this task,
+        # which is raised here (the cancelled reader then stops the token stream by itself)
+        await asyncio.wait([reader])
+        # Close the token stream right away (e.g. the LLM stream), not when it's garbage collected
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
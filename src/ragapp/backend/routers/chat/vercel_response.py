@@ -2,18 +2,26 @@ import asyncio
 import json
 import logging
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Awaitable, List
+from contextlib import aclosing
+from typing import AsyncGenerator, Awaitable, List, Optional
 
 from aiostream import stream
 from app.api.routers.events import EventCallbackHandler
 from app.api.routers.models import ChatData, Message, SourceNodes
-from app.api.services.suggestion import NextQuestionSuggestion
 from fastapi import BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
 from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 from llama_index.core.schema import NodeWithScore
 
-from backend.workflows.single import AgentRunEvent, AgentRunResult
+from backend.routers.chat.stream_framer import coalesce_text
+from backend.services.metrics import MetricsService
+from backend.services.suggestion import NextQuestionSuggestion
+from backend.workflows.single import (
+    AgentRunEvent,
+    AgentRunResult,
+    SourceNodesEvent,
+    cancel_workflow_run,
+)
 
 logger = logging.getLogger("uvicorn")
 
@@ -58,7 +66,10 @@ class BaseVercelStreamResponse(StreamingResponse, ABC):
 
     async def content_generator(self, stream):
         is_stream_started = False
+        is_stream_completed = False
 
+        # A client disconnect is detected by the disconnect listener of the StreamingResponse,
+        # which cancels this generator, instead of polling the connection after every frame
         try:
             async with stream.stream() as streamer:
                 async for output in streamer:
@@ -68,29 +79,48 @@ class BaseVercelStreamResponse(StreamingResponse, ABC):
                         yield self.convert_text("")
 
                     yield output
-
-                    if await self.request.is_disconnected():
-                        break
+            is_stream_completed = True
         except asyncio.CancelledError:
             logger.info("Stopping workflow")
-            await self.event_handler.cancel_run()
         except Exception as e:
             logger.error(
                 f"Unexpected error in content_generator: {str(e)}", exc_info=True
             )
         finally:
+            if not is_stream_completed:
+                MetricsService.increment("cancellation", "streams")
+                self.cancel_run()
             logger.info("The stream has been stopped!")
 
+    def cancel_run(self):
+        """
+        Stop the work for a response which isn't sent completely, e.g. when the client disconnected.
+        """
+        pass
+
     @classmethod
-    def convert_text(cls, token: str):
+    def convert_text(cls, token: str) -> bytes:
         # Escape newlines and double quotes to avoid breaking the stream
         token = json.dumps(token)
-        return f"{cls.TEXT_PREFIX}{token}\n"
+        # Encode the frames here, so the response sends them as they are
+        return f"{cls.TEXT_PREFIX}{token}\n".encode()
 
     @classmethod
-    def convert_data(cls, data: dict):
+    def convert_data(cls, data: dict) -> bytes:
         data_str = json.dumps(data)
-        return f"{cls.DATA_PREFIX}[{data_str}]\n"
+        return f"{cls.DATA_PREFIX}[{data_str}]\n".encode()
+
+    @staticmethod
+    def _source_nodes_to_response(source_nodes: List):
+        return {
+            "type": "sources",
+            "data": {
+                "nodes": [
+                    SourceNodes.from_source_node(node).model_dump()
+                    for node in source_nodes
+                ]
+            },
+        }
 
     @staticmethod
     async def _generate_next_questions(chat_history: List[Message], response: str):
@@ -118,6 +148,9 @@ class ChatEngineVercelStreamResponse(BaseVercelStreamResponse):
         response: Awaitable[StreamingAgentChatResponse],
         background_tasks: BackgroundTasks,
     ):
+        # The response of the chat engine once it's started
+        self._chat_response: Optional[StreamingAgentChatResponse] = None
+
         # Yield the events from the event handler
         async def _event_generator():
             async for event in event_handler.async_event_gen():
@@ -129,6 +162,7 @@ class ChatEngineVercelStreamResponse(BaseVercelStreamResponse):
         async def _chat_response_generator():
             # Wait for the response from the chat engine
             result = await response
+            self._chat_response = result
 
             # Once we got a source node, start a background task to download the files (if needed)
             source_nodes = result.source_nodes
@@ -138,16 +172,31 @@ class ChatEngineVercelStreamResponse(BaseVercelStreamResponse):
             yield self.convert_data(self._source_nodes_to_response(source_nodes))
 
             final_response = ""
-            async for token in result.async_response_gen():
-                final_response += token
-                yield self.convert_text(token)
+            question_task = None
 
-            # Generate next questions if next question prompt is configured
-            question_data = await self._generate_next_questions(
-                chat_data.messages, final_response
-            )
-            if question_data:
-                yield self.convert_data(question_data)
+            async def _tokens():
+                nonlocal final_response, question_task
+                async for token in result.async_response_gen():
+                    final_response += token
+                    yield token
+                # The answer is complete, suggest the next questions while its last frames are sent
+                question_task = asyncio.ensure_future(
+                    self._generate_next_questions(chat_data.messages, final_response)
+                )
+
+            try:
+                # Close the framed stream with the response, also when it's stopped while sending a frame
+                async with aclosing(coalesce_text(_tokens())) as texts:
+                    async for text in texts:
+                        yield self.convert_text(text)
+
+                # Generate next questions if next question prompt is configured
+                question_data = await question_task if question_task else None
+                if question_data:
+                    yield self.convert_data(question_data)
+            finally:
+                if question_task is not None:
+                    question_task.cancel()
 
             # the text_generator is the leading stream, once it's finished, also finish the event stream
             event_handler.is_done = True
@@ -155,17 +204,12 @@ class ChatEngineVercelStreamResponse(BaseVercelStreamResponse):
         combine = stream.merge(_chat_response_generator(), _event_generator())
         return combine
 
-    @staticmethod
-    def _source_nodes_to_response(source_nodes: List):
-        return {
-            "type": "sources",
-            "data": {
-                "nodes": [
-                    SourceNodes.from_source_node(node).model_dump()
-                    for node in source_nodes
-                ]
-            },
-        }
+    def cancel_run(self):
+        # Closing the text stream only stops reading the response: a chat engine writing the response
+        # to its memory reads the LLM stream in a task of its own
+        if self._chat_response is not None:
+            MetricsService.increment("cancellation", "llm_streams")
+            asyncio.ensure_future(_close_chat_response(self._chat_response))
 
     @staticmethod
     def _process_response_nodes(
@@ -201,31 +245,60 @@ class WorkflowVercelStreamResponse(BaseVercelStreamResponse):
     ):
         # Yield the text response
         async def _chat_response_generator():
-            result = await event_handler
+            # The run is cancelled by cancel_run, not by cancelling the wait for its result
+            result = await asyncio.shield(event_handler)
             final_response = ""
 
-            if isinstance(result, AgentRunResult):
-                for token in result.response.message.content:
-                    final_response += token
-                    yield self.convert_text(token)
-
-            if isinstance(result, AsyncGenerator):
-                async for token in result:
-                    final_response += token.delta
-                    yield self.convert_text(token.delta)
-
-            # Generate next questions if next question prompt is configured
-            question_data = await self._generate_next_questions(
-                chat_data.messages, final_response
-            )
-            if question_data:
-                yield self.convert_data(question_data)
-
-            # TODO: stream sources
+            question_task = None
+            try:
+                if isinstance(result, AgentRunResult):
+                    # The answer is already complete, suggest the next questions while it's sent
+                    final_response = result.response.message.content or ""
+                    question_task = asyncio.ensure_future(
+                        self._generate_next_questions(
+                            chat_data.messages, final_response
+                        )
+                    )
+                    if final_response:
+                        yield self.convert_text(final_response)
+
+                if isinstance(result, AsyncGenerator):
+                    deltas = (token.delta or "" async for token in result)
+                    # Close the framed stream with the response, also when it's stopped while sending a frame
+                    async with aclosing(coalesce_text(deltas)) as texts:
+                        async for text in texts:
+                            final_response += text
+                            yield self.convert_text(text)
+
+                # Generate next questions if next question prompt is configured
+                if question_task is None:
+                    question_task = asyncio.ensure_future(
+                        self._generate_next_questions(
+                            chat_data.messages, final_response
+                        )
+                    )
+                question_data = await question_task
+                if question_data:
+                    yield self.convert_data(question_data)
+            finally:
+                if question_task is not None:
+                    question_task.cancel()
+
+        # The nodes already sent, the same node can be retrieved by several tool calls
+        sent_node_ids = set()
 
         # Yield the events from the event handler
         async def _event_generator():
             async for event in events:
+                if isinstance(event, SourceNodesEvent):
+                    nodes = []
+                    for node in event.nodes:
+                        if node.node_id not in sent_node_ids:
+                            sent_node_ids.add(node.node_id)
+                            nodes.append(node)
+                    if nodes:
+                        yield self.convert_data(self._source_nodes_to_response(nodes))
+                    continue
                 event_response = self._event_to_response(event)
                 if verbose:
                     logger.debug(event_response)
@@ -235,9 +308,22 @@ class WorkflowVercelStreamResponse(BaseVercelStreamResponse):
         combine = stream.merge(_chat_response_generator(), _event_generator())
         return combine
 
+    def cancel_run(self):
+        # Cancel the workflow, which cancels the nested agent runs and their LLM calls
+        cancel_workflow_run(self.event_handler)
+
     @staticmethod
     def _event_to_response(event: AgentRunEvent) -> dict:
         return {
             "type": "agent",
             "data": {"agent": event.name, "text": event.msg},
         }
+
+
+async def _close_chat_response(chat_response: StreamingAgentChatResponse):
+    writer = getattr(chat_response, "awrite_response_to_history_task", None)
+    if writer is not None and not writer.done():
+        writer.cancel()
+        await asyncio.wait([writer])
+    if chat_response.achat_stream is not None:
+        await chat_response.achat_stream.aclose()
@@ -5,6 +5,7 @@ from backend.routers.management.config import config_router
 from backend.routers.management.files import files_router
 from backend.routers.management.llamacloud import llamacloud_router
 from backend.routers.management.loader import loader_router
+from backend.routers.management.metrics import metrics_router
 from backend.routers.management.reranker import reranker_router
 
 management_router = APIRouter()
@@ -17,3 +18,4 @@ management_router.include_router(
 )
 management_router.include_router(loader_router, prefix="/loader", tags=["Knowledge"])
 management_router.include_router(reranker_router, prefix="/reranker", tags=["Reranker"])
+management_router.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
@@ -1,3 +1,5 @@
+import logging
+import os
 from typing import Annotated, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -7,11 +9,19 @@ from backend.controllers.agents import AgentManager, agent_manager
 from backend.controllers.env_configs import EnvConfigManager
 from backend.controllers.providers import AIProvider
 from backend.models.chat_config import ChatConfig
+from backend.engine.collection_state import (
+    CollectionManager,
+    get_embedding_fingerprint,
+)
+from backend.engine.index_registry import IndexRegistry
 from backend.models.model_config import ModelConfig
-from backend.tasks.indexing import reset_index
+from backend.tasks.indexing import activate_index_collection, release_pinned_index
+from backend.tasks.jobs import IndexingJobManager
 
 config_router = r = APIRouter()
 
+logger = logging.getLogger("uvicorn")
+
 
 @r.get("/is_configured")
 def is_configured(
@@ -57,13 +67,6 @@ def update_model_config(
     agent_manager: Annotated[AgentManager, Depends(agent_manager)],
     config: ModelConfig = Depends(ModelConfig.get_config),
 ):
-    # If the new config has a different model provider
-    # or embedding model
-    # or the model config has not been configured yet
-    # We need to:
-    # 1. Reload the llama_index settings
-    # 2. Reset the index
-
     if new_config.model_provider != config.model_provider:
         # If multi-agent mode is enabled, and the new model is not a function calling model
         # raise an error
@@ -78,15 +81,38 @@ def update_model_config(
                 detail="You are using multi-agent mode, please select a model supporting function calling. Or remove the multi-agent mode by deleting agents.",
             )
 
-    EnvConfigManager.update(config, new_config, rollback_on_failure=True)
-
-    # We won't rollback the changes if the index reset fails
-    if (
-        (new_config.model_provider != config.model_provider)
-        or (new_config.embedding_model != config.embedding_model)
-        or not config.configured
-    ):
-        reset_index()
+    use_vector_store = os.getenv("USE_LLAMA_CLOUD", "false").lower() != "true"
+    if config.configured and use_vector_store:
+        # Collections created before the fingerprints were tracked match the current config
+        CollectionManager.adopt(get_embedding_fingerprint())
+        # Keep serving the current index with its embedding model in case it needs a rebuild
+        try:
+            IndexRegistry.pin()
+        except Exception:
+            logger.warning("Could not load the current index", exc_info=True)
+
+    try:
+        EnvConfigManager.update(
+            config, new_config, rollback_on_failure=True, keep_pinned_index=True
+        )
+    except Exception:
+        release_pinned_index()
+        raise
+
+    # The index only needs to be rebuilt if the embeddings changed (provider, model or dimension).
+    # It's rebuilt in the background into a new collection, which is swapped in once it's ready.
+    if use_vector_store and CollectionManager.needs_rebuild():
+        fingerprint = get_embedding_fingerprint()
+        retained = CollectionManager.find_retained(fingerprint)
+        if retained is not None:
+            # Switching back to a previous embedding model: roll back to its retained collection
+            # and only index the files changed since then
+            activate_index_collection(retained, fingerprint)
+            IndexingJobManager.submit(full_sync=True)
+        else:
+            IndexingJobManager.submit_rebuild()
+    else:
+        release_pinned_index()
 
     # Response with the updated config
     config = ModelConfig.get_config()
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, UploadFile, Form
+from fastapi import APIRouter, Form, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
 
-from backend.controllers.files import FileHandler, UnsupportedFileExtensionError
+from backend.controllers.files import (
+    FileHandler,
+    FileTooLargeError,
+    UnsupportedFileExtensionError,
+)
 from backend.models.file import File
+from backend.tasks.jobs import IndexingJob, IndexingJobManager, IndexingQueueFullError
 
 files_router = r = APIRouter()
 
@@ -20,7 +25,14 @@ async def add_file(file: UploadFile, fileIndex: str = Form(), totalFiles: str =
     """
     Upload a new file.
     """
-    res = await FileHandler.upload_file(file, str(file.filename), fileIndex, totalFiles)
+    try:
+        res = await FileHandler.upload_file(
+            file, str(file.filename), fileIndex, totalFiles
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IndexingQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     if isinstance(res, UnsupportedFileExtensionError):
         # Return 400 response with message if the file extension is not supported
         return JSONResponse(
@@ -33,6 +45,17 @@ async def add_file(file: UploadFile, fileIndex: str = Form(), totalFiles: str =
     return res
 
 
+@r.get("/jobs/{job_id}")
+def get_indexing_job(job_id: str) -> IndexingJob:
+    """
+    Get the progress of an indexing job.
+    """
+    job = IndexingJobManager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Indexing job not found")
+    return job
+
+
 @r.delete("/{file_name}")
 def remove_file(file_name: str):
     """
@@ -40,6 +63,8 @@ def remove_file(file_name: str):
     """
     try:
         FileHandler.remove_file(file_name)
+    except IndexingQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except FileNotFoundError:
         # Ignore the error if the file is not found
         # This is to ensure that the file is removed even if it is not found
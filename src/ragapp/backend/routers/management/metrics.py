@@ -0,0 +1,15 @@
+from typing import Dict
+
+from fastapi import APIRouter
+
+from backend.services.metrics import MetricsService
+
+metrics_router = r = APIRouter()
+
+
+@r.get("")
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Get the runtime metrics of the app, e.g. the embedding cache hit rate.
+    """
+    return MetricsService.snapshot()
@@ -1,25 +1,43 @@
-from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 
 from backend.controllers.env_configs import EnvConfigManager
-from backend.models.reranker_config import CohereRerankerConfig, get_reranker_config
+from backend.engine.postprocessors import warm_up_reranker
+from backend.models.reranker_config import (
+    RerankerConfig,
+    get_reranker_config,
+    get_reranker_config_class,
+)
 
 reranker_router = r = APIRouter()
 
 
 @r.get("")
 def get_llamacloud_config(
-    config: CohereRerankerConfig = Depends(get_reranker_config),
+    config: RerankerConfig = Depends(get_reranker_config),
 ):
     return config.to_api_response()
 
 
 @r.put("")
 def update_reranker_config(
-    new_config: CohereRerankerConfig,
-    config: CohereRerankerConfig = Depends(get_reranker_config),
+    data: Dict[str, Any] = Body(...),
+    config: RerankerConfig = Depends(get_reranker_config),
 ):
+    # Only keep the settings of the selected provider
+    config_class = get_reranker_config_class(
+        data.get("rerank_provider", config.rerank_provider)
+    )
+    try:
+        new_config = config_class(**data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     EnvConfigManager.update(config, new_config, rollback_on_failure=True)
+    # Load the model of the local reranker before it's used by a query
+    warm_up_reranker()
     return JSONResponse(
         {
             "message": "Config updated successfully.",
@@ -0,0 +1,265 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import httpx
+
+from backend.services.metrics import MetricsService
+
+logger = logging.getLogger("uvicorn")
+
+# Maximum number of connections of each provider and base URL
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+# Maximum number of idle connections kept alive
+HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+# Seconds an idle connection is kept alive
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "60"))
+# Seconds to wait for a response, unless the provider's client sets its own timeout
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "600"))
+# HTTP/2 is used for HTTPS connections if the h2 package is installed
+HTTP_CLIENT_HTTP2 = (
+    os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    )
+
+
+def _count_request(provider: str, new_connection: bool):
+    MetricsService.increment("http_clients", f"{provider}_requests")
+    if new_connection:
+        MetricsService.increment("http_clients", f"{provider}_connections")
+
+
+class _PooledTransport(httpx.BaseTransport):
+    """
+    The connection pool shared by the clients of a provider, closed by the registry.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._transport = httpx.HTTPTransport(http2=HTTP_CLIENT_HTTP2, limits=_limits())
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        new_connection = False
+        trace = request.extensions.get("trace")
+
+        def _trace(event_name: str, info: Dict[str, Any]):
+            nonlocal new_connection
+            if event_name == "connection.connect_tcp.complete":
+                new_connection = True
+            if trace is not None:
+                trace(event_name, info)
+
+        request.extensions["trace"] = _trace
+        try:
+            return self._transport.handle_request(request)
+        finally:
+            _count_request(self.provider, new_connection)
+
+    def close(self):
+        # The clients using the pool don't close it
+        pass
+
+
+class _PooledAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    The async connection pools shared by the clients of a provider, closed by the registry.
+    A connection can only be used in the event loop it's opened in, so each loop has its own pool,
+    e.g. the indexing jobs run their embedding requests in separate loops.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._lock = threading.Lock()
+        self._transports: (
+            "WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]"
+        ) = WeakKeyDictionary()
+
+    def _get_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(
+                    http2=HTTP_CLIENT_HTTP2, limits=_limits()
+                )
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        new_connection = False
+        trace = request.extensions.get("trace")
+
+        async def _trace(event_name: str, info: Dict[str, Any]):
+            nonlocal new_connection
+            if event_name == "connection.connect_tcp.complete":
+                new_connection = True
+            if trace is not None:
+                await trace(event_name, info)
+
+        request.extensions["trace"] = _trace
+        try:
+            return await self._get_transport().handle_async_request(request)
+        finally:
+            _count_request(self.provider, new_connection)
+
+    async def aclose(self):
+        # The clients using the pool don't close it
+        pass
+
+    async def close_pools(self):
+        """
+        Close the pool of the running event loop, the pools of other loops are released with their loop.
+        """
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+            self._transports.clear()
+        if transport is not None:
+            await transport.aclose()
+
+
+class HttpClientRegistry:
+    """
+    Process-wide pooled HTTP clients of the model providers, one per provider and base URL.
+    The clients are kept when the settings are re-initialized, so the connections (and their TLS sessions)
+    are reused across requests instead of being opened for each new provider client.
+    """
+
+    _lock = threading.Lock()
+    _transports: Dict[Tuple[str, Optional[str]], _PooledTransport] = {}
+    _async_transports: Dict[Tuple[str, Optional[str]], _PooledAsyncTransport] = {}
+    _clients: Dict[Tuple[str, Optional[str]], httpx.Client] = {}
+    _async_clients: Dict[Tuple[str, Optional[str]], httpx.AsyncClient] = {}
+
+    @classmethod
+    def get_transport(
+        cls, provider: str, base_url: Optional[str] = None
+    ) -> httpx.BaseTransport:
+        """
+        The shared pool of the provider, for SDKs which create their own httpx client, e.g. Ollama.
+        """
+        with cls._lock:
+            key = (provider, base_url)
+            if key not in cls._transports:
+                cls._register_collector()
+                cls._transports[key] = _PooledTransport(provider)
+            return cls._transports[key]
+
+    @classmethod
+    def get_async_transport(
+        cls, provider: str, base_url: Optional[str] = None
+    ) -> httpx.AsyncBaseTransport:
+        with cls._lock:
+            key = (provider, base_url)
+            if key not in cls._async_transports:
+                cls._register_collector()
+                cls._async_transports[key] = _PooledAsyncTransport(provider)
+            return cls._async_transports[key]
+
+    @classmethod
+    def get_client(cls, provider: str, base_url: Optional[str] = None) -> httpx.Client:
+        transport = cls.get_transport(provider, base_url)
+        with cls._lock:
+            key = (provider, base_url)
+            if key not in cls._clients:
+                cls._clients[key] = httpx.Client(
+                    transport=transport, timeout=HTTP_CLIENT_TIMEOUT
+                )
+            return cls._clients[key]
+
+    @classmethod
+    def get_async_client(
+        cls, provider: str, base_url: Optional[str] = None
+    ) -> httpx.AsyncClient:
+        transport = cls.get_async_transport(provider, base_url)
+        with cls._lock:
+            key = (provider, base_url)
+            if key not in cls._async_clients:
+                cls._async_clients[key] = httpx.AsyncClient(
+                    transport=transport, timeout=HTTP_CLIENT_TIMEOUT
+                )
+            return cls._async_clients[key]
+
+    @classmethod
+    def attach(cls, model: Any, provider: Optional[str]):
+        """
+        Let an LLM or embedding model send its requests with the pooled clients of its provider.
+        Models without a way to pass the HTTP client keep their own.
+        """
+        provider = provider or type(model).__name__.lower()
+        private_attributes = getattr(type(model), "__private_attributes__", {})
+        if "_http_client" in private_attributes:
+            # OpenAI and the OpenAI compatible providers (Azure OpenAI, Groq, OpenAI like)
+            base_url = getattr(model, "api_base", None)
+            model._http_client = cls.get_client(provider, base_url)
+            model._async_http_client = cls.get_async_client(provider, base_url)
+            # The SDK clients are created with the HTTP clients on the next request
+            for name in ("_client", "_aclient"):
+                if name in private_attributes:
+                    setattr(model, name, None)
+        elif provider == "ollama" and "_async_client" in private_attributes:
+            from ollama import AsyncClient, Client
+
+            base_url = getattr(model, "base_url", None)
+            timeout = getattr(model, "request_timeout", None)
+            model._client = Client(
+                host=base_url,
+                timeout=timeout,
+                transport=cls.get_transport(provider, base_url),
+            )
+            model._async_client = AsyncClient(
+                host=base_url,
+                timeout=timeout,
+                transport=cls.get_async_transport(provider, base_url),
+            )
+        else:
+            logger.debug(f"{type(model).__name__} doesn't support a pooled HTTP client")
+
+    @classmethod
+    async def aclose(cls):
+        """
+        Close the pooled connections on the shutdown of the app.
+        """
+        with cls._lock:
+            transports = list(cls._transports.values())
+            async_transports = list(cls._async_transports.values())
+            cls._transports.clear()
+            cls._async_transports.clear()
+            cls._clients.clear()
+            cls._async_clients.clear()
+        for transport in transports:
+            transport._transport.close()
+        for async_transport in async_transports:
+            await async_transport.close_pools()
+
+    @classmethod
+    def _register_collector(cls):
+        if not cls._transports and not cls._async_transports:
+            MetricsService.register_collector("http_clients", _collect_metrics)
+
+
+def _collect_metrics() -> Dict[str, float]:
+    counters = MetricsService.get_counters("http_clients")
+    metrics = {}
+    for name, requests in counters.items():
+        if not name.endswith("_requests"):
+            continue
+        provider = name[: -len("_requests")]
+        connections = counters.get(f"{provider}_connections", 0)
+        # The share of the requests sent on an already open connection
+        metrics[f"{provider}_connection_reuse_ratio"] = (
+            1 - connections / requests if requests else 0.0
+        )
+    return metrics
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from backend.services.metrics import MetricsService
+
+logger = logging.getLogger("uvicorn")
+
+# Report the calls blocking the event loop for longer than this, 0 disables the monitor
+EVENT_LOOP_LAG_THRESHOLD_MS = float(os.getenv("EVENT_LOOP_LAG_THRESHOLD_MS", "250"))
+
+
+class EventLoopMonitor:
+    """
+    Detect blocking calls on the event loop.
+    A heartbeat task records when the loop last ran, a watchdog thread logs the stack
+    of the loop thread when the heartbeat stalls for longer than the threshold.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = EVENT_LOOP_LAG_THRESHOLD_MS,
+        interval: float = 0.05,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self._last_beat = time.monotonic()
+        self._max_lag = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        if self.threshold <= 0:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="event-loop-monitor", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._last_beat = time.monotonic()
+            lag = self._last_beat - start - self.interval
+            if lag > self._max_lag:
+                self._max_lag = lag
+                MetricsService.set("event_loop", "max_lag_ms", lag * 1000)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat
+            # Report each stall once, with the stack of the call blocking the loop
+            if blocked_for > self.threshold and reported_beat != last_beat:
+                reported_beat = last_beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else ""
+                MetricsService.increment("event_loop", "blocked_calls")
+                logger.warning(
+                    f"Event loop blocked for more than {blocked_for * 1000:.0f}ms:\n{stack}"
+                )
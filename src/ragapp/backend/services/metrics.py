@@ -0,0 +1,54 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class MetricsService:
+    """
+    In-process counters and gauges exposed by the metrics API.
+    Counters are grouped by component, e.g. `MetricsService.increment("embedding_cache", "hits")`.
+    """
+
+    _lock = threading.Lock()
+    _counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    # Callables returning the current values of a component, evaluated on read
+    _collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    @classmethod
+    def increment(cls, component: str, name: str, value: float = 1):
+        with cls._lock:
+            cls._counters[component][name] += value
+
+    @classmethod
+    def set(cls, component: str, name: str, value: float):
+        with cls._lock:
+            cls._counters[component][name] = value
+
+    @classmethod
+    def register_collector(
+        cls, component: str, collector: Callable[[], Dict[str, float]]
+    ):
+        with cls._lock:
+            cls._collectors[component] = collector
+
+    @classmethod
+    def get_counters(cls, component: str) -> Dict[str, float]:
+        with cls._lock:
+            return dict(cls._counters.get(component, {}))
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, float]]:
+        with cls._lock:
+            metrics = {
+                component: dict(counters)
+                for component, counters in cls._counters.items()
+            }
+            collectors = dict(cls._collectors)
+        for component, collector in collectors.items():
+            metrics.setdefault(component, {}).update(collector())
+        return metrics
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import os
+from typing import Callable, TypeVar
+from weakref import WeakKeyDictionary
+
+import anyio
+from anyio import CapacityLimiter
+
+T = TypeVar("T")
+
+# Maximum number of blocking calls running at the same time,
+# separate from the thread pool of FastAPI's sync endpoints so they don't starve each other
+BLOCKING_CALLS_CONCURRENCY = int(os.getenv("BLOCKING_CALLS_CONCURRENCY", "16"))
+
+# A capacity limiter is bound to the event loop it's created in
+_limiters: "WeakKeyDictionary[asyncio.AbstractEventLoop, CapacityLimiter]" = (
+    WeakKeyDictionary()
+)
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking function (file or network I/O, e.g. creating a vector store client)
+    in a bounded thread pool, so it doesn't stall the event loop.
+    """
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=_get_limiter()
+    )
+
+
+def _get_limiter() -> CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = CapacityLimiter(BLOCKING_CALLS_CONCURRENCY)
+    return limiter
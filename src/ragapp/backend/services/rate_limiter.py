@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.models.user_info import UserInfo
+from backend.services.user_chat_service import UserChatService
+
+logger = logging.getLogger("uvicorn")
+
+# "memory" for a single worker, "database" if the app runs with multiple workers
+CHAT_REQUEST_LIMIT_BACKEND = os.getenv("CHAT_REQUEST_LIMIT_BACKEND", "memory")
+# Seconds between the writes of the in-memory request counts to the database
+CHAT_REQUEST_LIMIT_FLUSH_INTERVAL = float(
+    os.getenv("CHAT_REQUEST_LIMIT_FLUSH_INTERVAL", "5")
+)
+
+
+class RateLimiter(ABC):
+    """
+    Count the chat requests of the users per time frame.
+    """
+
+    @abstractmethod
+    async def acquire(
+        self, user: UserInfo, time_frame: str, limit: Optional[int] = None
+    ) -> bool:
+        """
+        Count a request of the user, unless the user already reached the limit.
+        Returns whether the request is admitted.
+        """
+
+    def flush(self):
+        pass
+
+    def shutdown(self):
+        self.flush()
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Count each request with an atomic conditional update in the database,
+    so the limit is shared by all workers of the app.
+    """
+
+    async def acquire(
+        self, user: UserInfo, time_frame: str, limit: Optional[int] = None
+    ) -> bool:
+        return await run_in_threadpool(
+            UserChatService.increment_user_chat_request_count, user, time_frame, limit
+        )
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Count the requests in memory and write the counts to the database in the background.
+    The database is only queried for the first request of a user in a time frame.
+    Each worker counts on its own, use the database limiter with multiple workers.
+    """
+
+    def __init__(self, flush_interval: float = CHAT_REQUEST_LIMIT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._time_frame: Optional[str] = None
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    async def acquire(
+        self, user: UserInfo, time_frame: str, limit: Optional[int] = None
+    ) -> bool:
+        key = (user.user_id, time_frame)
+        count = None
+        if key not in self._counts:
+            # Continue from the count persisted by a previous run of the app
+            count = await run_in_threadpool(
+                UserChatService.get_user_chat_request_count, user, time_frame
+            )
+        with self._lock:
+            if count is not None:
+                self._counts.setdefault(key, count)
+            if limit is not None and self._counts[key] >= limit:
+                return False
+            self._counts[key] += 1
+            self._dirty.add(key)
+            self._time_frame = time_frame
+            self._ensure_flusher()
+        return True
+
+    def flush(self):
+        """
+        Write the changed counts to the database in a single transaction.
+        """
+        with self._lock:
+            counts = {key: self._counts[key] for key in self._dirty}
+            self._dirty.clear()
+        if not counts:
+            return
+        try:
+            UserChatService.set_user_chat_request_counts(counts)
+        except Exception:
+            logger.exception("Failed to write the chat request counts")
+            with self._lock:
+                self._dirty.update(counts)
+            return
+        with self._lock:
+            # Forget the counts of the past time frames once they are written
+            for key in list(self._counts):
+                if key[1] != self._time_frame and key not in self._dirty:
+                    del self._counts[key]
+
+    def shutdown(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name="rate-limit-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = _create_rate_limiter()
+    return _limiter
+
+
+def shutdown_rate_limiter():
+    if _limiter is not None:
+        _limiter.shutdown()
+
+
+def _create_rate_limiter() -> RateLimiter:
+    if CHAT_REQUEST_LIMIT_BACKEND == "database":
+        return DatabaseRateLimiter()
+    if CHAT_REQUEST_LIMIT_BACKEND == "memory":
+        return MemoryRateLimiter()
+    raise ValueError(
+        f"Invalid CHAT_REQUEST_LIMIT_BACKEND: {CHAT_REQUEST_LIMIT_BACKEND}, expected 'memory' or 'database'"
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import List, Optional
+
+from cachetools import TTLCache
+from llama_index.core.llms import LLM
+from llama_index.core.prompts import PromptTemplate
+from llama_index.core.settings import Settings
+
+from backend.services.metrics import MetricsService
+
+logger = logging.getLogger("uvicorn")
+
+
+class NextQuestionSuggestion:
+    """
+    Suggest the next questions of the user, with a cache per question and answer.
+    Uses the model set in NEXT_QUESTION_MODEL (a cheaper model of the configured provider) if set,
+    and gives up after NEXT_QUESTION_TIMEOUT seconds so the response isn't kept open.
+    """
+
+    _lock = threading.Lock()
+    _cache: Optional[TTLCache] = None
+    _llm: Optional[LLM] = None
+    _llm_key: Optional[tuple] = None
+
+    @staticmethod
+    def get_prompt() -> Optional[PromptTemplate]:
+        prompt = os.getenv("NEXT_QUESTION_PROMPT")
+        if not prompt:
+            return None
+        return PromptTemplate(prompt)
+
+    @classmethod
+    def get_llm(cls) -> LLM:
+        llm = Settings.llm
+        model = os.getenv("NEXT_QUESTION_MODEL")
+        if not model or "model" not in type(llm).model_fields:
+            return llm
+        with cls._lock:
+            # Reuse the copy until the configured LLM changes
+            if cls._llm_key != (id(llm), model):
+                cls._llm = llm.model_copy(update={"model": model})
+                cls._llm_key = (id(llm), model)
+            return cls._llm
+
+    @classmethod
+    async def suggest_next_questions(
+        cls, chat_history: List, response: str
+    ) -> Optional[List[str]]:
+        prompt = cls.get_prompt()
+        if prompt is None or not response:
+            return None
+        last_question = chat_history[-1].content if chat_history else ""
+        key = (
+            last_question,
+            hashlib.sha256(response.encode()).hexdigest(),
+            prompt.template,
+            os.getenv("NEXT_QUESTION_MODEL"),
+        )
+        with cls._lock:
+            questions = cls._get_cache().get(key)
+        if questions is not None:
+            MetricsService.increment("next_questions", "cache_hits")
+            return questions
+
+        conversation = "\n".join(
+            [
+                *(f"{message.role}: {message.content}" for message in chat_history),
+                f"assistant: {response}",
+            ]
+        )
+        try:
+            output = await asyncio.wait_for(
+                cls.get_llm().acomplete(prompt.format(conversation=conversation)),
+                float(os.getenv("NEXT_QUESTION_TIMEOUT", "5")),
+            )
+        except asyncio.TimeoutError:
+            MetricsService.increment("next_questions", "timeouts")
+            logger.warning("Suggesting the next questions timed out")
+            return None
+        except Exception as e:
+            MetricsService.increment("next_questions", "errors")
+            logger.error(f"Error when suggesting the next questions: {e}")
+            return None
+
+        questions = _extract_questions(output.text)
+        MetricsService.increment("next_questions", "generated")
+        with cls._lock:
+            cls._get_cache()[key] = questions
+        return questions
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache = None
+            cls._llm = None
+            cls._llm_key = None
+
+    @classmethod
+    def _get_cache(cls) -> TTLCache:
+        if cls._cache is None:
+            cls._cache = TTLCache(
+                maxsize=int(os.getenv("NEXT_QUESTION_CACHE_MAX_SIZE", "1000")),
+                ttl=int(os.getenv("NEXT_QUESTION_CACHE_TTL", "3600")),
+            )
+        return cls._cache
+
+
+def _extract_questions(text: str) -> List[str]:
+    # The prompt asks for the questions wrapped in three backticks, one per line
+    match = re.search(r"```(.*?)```", text, re.DOTALL)
+    content = match.group(1) if match else ""
+    return [question.strip() for question in content.strip().split("\n") if question]
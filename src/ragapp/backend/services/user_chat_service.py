@@ -1,4 +1,7 @@
-from sqlmodel import Session, select
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
 
 from backend.database import DB
 from backend.models.orm.chat_request import UserChatRequest
@@ -12,35 +15,76 @@ class UserChatService:
 
     @classmethod
     def get_user_chat_request_count(cls, user: UserInfo, time_frame: str) -> int:
-        db: Session = next(DB.get_session())
-        user_request = cls._get_user_chat_request_record(db, user, time_frame)
-        if user_request:
-            return user_request.count
-        return 0
+        with DB.session() as db:
+            user_request = cls._get_user_chat_request_record(
+                db, user.user_id, time_frame
+            )
+            if user_request:
+                return user_request.count
+            return 0
 
     @classmethod
-    def update_user_chat_request_count(
-        cls, user: UserInfo, time_frame: str, count: int
-    ):
-        db: Session = next(DB.get_session())
-        user_request = cls._get_user_chat_request_record(db, user, time_frame)
-        if user_request:
-            user_request.count = count
-            db.add(user_request)  # Mark the object as modified
-        else:
-            user_request = UserChatRequest(
-                user_id=user.user_id, time_frame=time_frame, count=count
-            )
-            db.add(user_request)
-        db.commit()
-        db.refresh(user_request)
+    def increment_user_chat_request_count(
+        cls, user: UserInfo, time_frame: str, limit: Optional[int] = None
+    ) -> bool:
+        """
+        Atomically count a request of the user, unless the user already reached the limit.
+        Returns whether the request was counted.
+        """
+        with DB.session() as db:
+            # Retry once if the record was created by a concurrent request
+            for _ in range(2):
+                statement = update(UserChatRequest).where(
+                    UserChatRequest.user_id == user.user_id,
+                    UserChatRequest.time_frame == time_frame,
+                )
+                if limit is not None:
+                    statement = statement.where(UserChatRequest.count < limit)
+                result = db.exec(statement.values(count=UserChatRequest.count + 1))
+                if result.rowcount > 0:
+                    db.commit()
+                    return True
+                if cls._get_user_chat_request_record(db, user.user_id, time_frame):
+                    # The limit is reached
+                    db.rollback()
+                    return False
+                try:
+                    db.add(
+                        UserChatRequest(
+                            user_id=user.user_id, time_frame=time_frame, count=1
+                        )
+                    )
+                    db.commit()
+                    return True
+                except IntegrityError:
+                    db.rollback()
+            return False
+
+    @classmethod
+    def set_user_chat_request_counts(cls, counts: Dict[Tuple[str, str], int]):
+        """
+        Write the request counts by user id and time frame in a single transaction.
+        """
+        with DB.session() as db:
+            for (user_id, time_frame), count in counts.items():
+                user_request = cls._get_user_chat_request_record(
+                    db, user_id, time_frame
+                )
+                if user_request:
+                    user_request.count = count
+                else:
+                    user_request = UserChatRequest(
+                        user_id=user_id, time_frame=time_frame, count=count
+                    )
+                db.add(user_request)
+            db.commit()
 
     @staticmethod
     def _get_user_chat_request_record(
-        db: Session, user: UserInfo, time_frame: str
-    ) -> UserChatRequest:
+        db: Session, user_id: str, time_frame: str
+    ) -> Optional[UserChatRequest]:
         statement = select(UserChatRequest).where(
-            UserChatRequest.user_id == user.user_id,
+            UserChatRequest.user_id == user_id,
             UserChatRequest.time_frame == time_frame,
         )
         result = db.exec(statement)
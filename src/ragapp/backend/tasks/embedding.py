@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from llama_index.core.settings import Settings
+
+logger = logging.getLogger("uvicorn")
+
+# Maximum number of embedding requests sent in parallel
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+# Maximum number of tokens sent in one embedding request
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "50000"))
+# Number of retries of a rate limited embedding request
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+
+class BatchedEmbedding(TransformComponent):
+    """
+    Embed nodes in batches limited by a token budget and the batch size of the embedding model,
+    sending up to `concurrency` batches in parallel.
+    Rate limited requests are retried with an exponential backoff, pausing all batches.
+    """
+
+    embed_model: BaseEmbedding
+    batch_tokens: int = Field(default=EMBEDDING_BATCH_TOKENS)
+    concurrency: int = Field(default=EMBEDDING_CONCURRENCY)
+    max_retries: int = Field(default=EMBEDDING_MAX_RETRIES)
+    initial_backoff: float = Field(default=1.0)
+    max_backoff: float = Field(default=60.0)
+
+    _paused_until: float = PrivateAttr(default=0.0)
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        return asyncio_run(self.acall(nodes, **kwargs))
+
+    async def acall(
+        self, nodes: Sequence[BaseNode], **kwargs: Any
+    ) -> Sequence[BaseNode]:
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def _embed(batch: List[BaseNode]):
+            texts = [
+                node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch
+            ]
+            async with semaphore:
+                embeddings = await self._embed_with_backoff(texts)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+
+        batches = self.get_batches([node for node in nodes if node.embedding is None])
+        await asyncio.gather(*[_embed(batch) for batch in batches])
+        return nodes
+
+    def get_batches(self, nodes: List[BaseNode]) -> List[List[BaseNode]]:
+        """
+        Group the nodes into batches that fit into the token budget and the batch size of the model.
+        """
+        max_size = self.embed_model.embed_batch_size
+        batches: List[List[BaseNode]] = []
+        batch: List[BaseNode] = []
+        batch_tokens = 0
+        for node in nodes:
+            tokens = len(
+                Settings.tokenizer(node.get_content(metadata_mode=MetadataMode.EMBED))
+            )
+            if batch and (
+                len(batch) >= max_size or batch_tokens + tokens > self.batch_tokens
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(node)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _embed_with_backoff(self, texts: List[str]) -> List[List[float]]:
+        backoff = self.initial_backoff
+        attempt = 0
+        while True:
+            # Wait if another batch was rate limited
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self.embed_model.aget_text_embedding_batch(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_rate_limit_error(e):
+                    raise
+                delay = _get_retry_after(e) or backoff * (1 + random.random())
+                delay = min(delay, self.max_backoff)
+                logger.warning(
+                    f"Embedding request was rate limited, retrying in {delay:.1f}s"
+                )
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                backoff = min(backoff * 2, self.max_backoff)
+                attempt += 1
+
+
+def _is_rate_limit_error(e: Exception) -> bool:
+    status_code = getattr(e, "status_code", None)
+    response = getattr(e, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    return status_code == 429 or "ratelimit" in type(e).__name__.lower()
+
+
+def _get_retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -1,58 +1,338 @@
 import logging
 import os
-import shutil
+import time
+from typing import Callable, Dict, List, Optional
 
-from create_llama.backend.app.engine.generate import generate_datasource
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import Document
+from llama_index.core.settings import Settings
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilter,
+    MetadataFilters,
+)
+
+from backend.controllers.loader import LoaderManager
+from backend.engine.collection_state import (
+    CollectionManager,
+    get_embedding_fingerprint,
+)
+from backend.engine.index_registry import IndexRegistry
+from backend.engine.sparse_index import (
+    SparseIndex,
+    delete_sparse_index,
+    get_sparse_index,
+)
+from backend.engine.vectordb import (
+    activate_collection,
+    delete_collection,
+    ensure_collection,
+    get_vector_store,
+)
+from backend.services.metrics import MetricsService
+from backend.tasks.embedding import BatchedEmbedding
+from backend.tasks.manifest import FileRecord, IngestionManifest, hash_file
+from backend.tasks.parsing import DocumentParser
 
 logger = logging.getLogger("uvicorn")
 
+DATA_DIR = "data"
+# Number of files that are loaded and embedded together
+INDEXING_BATCH_SIZE = int(os.getenv("INDEXING_BATCH_SIZE", "10"))
+
 
-def index_all():
-    # Just call the generate_datasource from create_llama for now
-    generate_datasource()
+def index_all(
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    collection: Optional[str] = None,
+) -> List[str]:
+    """
+    Synchronize the index with the data folder:
+    embed the new or changed files and remove the nodes of the deleted files.
+    The active collection is used if no collection is given.
+    """
+    file_names = (
+        [
+            file_name
+            for file_name in os.listdir(DATA_DIR)
+            # Skip hidden files, e.g. the temporary files of ongoing uploads
+            if not file_name.startswith(".")
+        ]
+        if os.path.exists(DATA_DIR)
+        else []
+    )
+    manifest = IngestionManifest(collection=collection)
+    deleted_files = [name for name in manifest.files if name not in file_names]
+    if deleted_files:
+        remove_files(deleted_files, collection=collection)
+    return index_files(file_names, on_progress=on_progress, collection=collection)
 
 
-def reset_index():
+def index_files(
+    file_names: List[str],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    collection: Optional[str] = None,
+) -> List[str]:
     """
-    Reset the index by removing the vector store data and STORAGE_DIR then re-indexing the data.
+    Embed the given files of the data folder if they are new or have changed since the last ingestion.
+    The files are indexed in batches of INDEXING_BATCH_SIZE, `on_progress` is called with
+    the number of processed and total files after each batch.
+    Returns the names of the files that were (re-)indexed.
     """
+    manifest = IngestionManifest(collection=collection)
+    sparse_index = get_sparse_index(collection)
+    changed_files = []
+    # The unchanged files ingested before the sparse index existed
+    missing_node_ids = []
+    for file_name in file_names:
+        file_path = os.path.join(DATA_DIR, file_name)
+        if not os.path.exists(file_path):
+            # The file was removed in the meantime
+            continue
+        record = manifest.get(file_name)
+        if IngestionManifest.is_unchanged(record, file_path):
+            record.mtime = os.stat(file_path).st_mtime
+            manifest.set(file_name, record)
+            missing_node_ids.extend(sparse_index.missing_node_ids(record.node_ids))
+        else:
+            changed_files.append(file_name)
+
+    if missing_node_ids:
+        # Add their stored nodes to the sparse index without re-embedding them
+        logger.info(f"Adding {len(missing_node_ids)} nodes to the sparse index")
+        nodes = get_vector_store(collection).get_nodes(node_ids=missing_node_ids)
+        sparse_index.add_nodes(nodes)
+        IndexRegistry.notify_changed()
+
+    if not changed_files:
+        logger.info("All files are already indexed")
+        manifest.save()
+        return []
 
-    def reset_index_chroma():
-        from chromadb import PersistentClient
+    logger.info(f"Indexing {len(changed_files)} new or changed files")
+    vector_store = get_vector_store(collection)
+    for start in range(0, len(changed_files), INDEXING_BATCH_SIZE):
+        batch = changed_files[start : start + INDEXING_BATCH_SIZE]
+        _index_batch(vector_store, sparse_index, manifest, batch)
+        # Persist the progress, so a crash doesn't re-embed the finished batches
+        manifest.save()
+        if on_progress is not None:
+            on_progress(start + len(batch), len(changed_files))
+    return changed_files
 
-        # Todo: Consider using other method to clear the vector store data
-        chroma_path = os.getenv("CHROMA_PATH")
-        collection_name = os.getenv("CHROMA_COLLECTION", "default")
-        chroma_client = PersistentClient(path=chroma_path)
-        if chroma_client.get_or_create_collection(collection_name):
-            logger.info(f"Removing collection {collection_name}")
-            chroma_client.delete_collection(collection_name)
 
-    def reset_index_qdrant():
-        from backend.engine.vectordbs.qdrant import get_vector_store
+def _index_batch(
+    vector_store: BasePydanticVectorStore,
+    sparse_index: SparseIndex,
+    manifest: IngestionManifest,
+    file_names: List[str],
+):
+    documents = _load_documents(file_names)
+    for document in documents:
+        # Set private=false to mark the document as public (required for filtering)
+        document.metadata["private"] = "false"
 
-        store = get_vector_store()
-        store.client.delete_collection(
-            store.collection_name,
+    # The nodes of the previous version of the changed files,
+    # only removed once the new nodes are stored so a failed embedding keeps them
+    old_node_ids = [
+        node_id
+        for file_name in file_names
+        for node_id in _get_file_node_ids(
+            vector_store, file_name, manifest.get(file_name)
         )
-        store._create_collection(
-            collection_name=store.collection_name,
-            vector_size=int(os.getenv("EMBEDDING_DIM", 1536)),
+    ]
+
+    pipeline = IngestionPipeline(
+        transformations=[
+            SentenceSplitter(
+                chunk_size=Settings.chunk_size,
+                chunk_overlap=Settings.chunk_overlap,
+            ),
+            BatchedEmbedding(embed_model=Settings.embed_model),
+        ],
+        vector_store=vector_store,
+    )
+    nodes = pipeline.run(documents=documents)
+    sparse_index.add_nodes(nodes)
+    if old_node_ids:
+        vector_store.delete_nodes(node_ids=old_node_ids)
+        sparse_index.delete_nodes(node_ids=old_node_ids)
+
+    nodes_by_doc: Dict[str, List[str]] = {}
+    for node in nodes:
+        nodes_by_doc.setdefault(node.ref_doc_id, []).append(node.node_id)
+    for file_name in file_names:
+        file_path = os.path.join(DATA_DIR, file_name)
+        stat = os.stat(file_path)
+        doc_ids = _get_file_doc_ids(file_name, documents)
+        manifest.set(
+            file_name,
+            FileRecord(
+                hash=hash_file(file_path),
+                mtime=stat.st_mtime,
+                size=stat.st_size,
+                ref_doc_ids=doc_ids,
+                node_ids=[
+                    node_id
+                    for doc_id in doc_ids
+                    for node_id in nodes_by_doc.get(doc_id, [])
+                ],
+            ),
         )
+    IndexRegistry.notify_changed()
+    logger.info(f"Indexed {len(nodes)} nodes from {len(file_names)} files")
+
+
+def remove_files(file_names: List[str], collection: Optional[str] = None):
+    """
+    Remove the nodes of the given files from the vector store.
+    """
+    manifest = IngestionManifest(collection=collection)
+    vector_store = get_vector_store(collection)
+    sparse_index = get_sparse_index(collection)
+    for file_name in file_names:
+        _delete_file_nodes(
+            vector_store, sparse_index, file_name, manifest.remove(file_name)
+        )
+        logger.info(f"Removed {file_name} from the index")
+    manifest.save()
+    IndexRegistry.notify_changed()
+
+
+def _load_documents(file_names: List[str]) -> List[Document]:
+    return DocumentParser.load_documents(
+        [os.path.join(DATA_DIR, file_name) for file_name in file_names],
+        file_extractor=_get_file_extractor(),
+    )
+
+
+def _get_file_extractor():
+    if not LoaderManager().get_loader("file").use_llama_parse:
+        return None
+    # LlamaParse is async first, so we need nest_asyncio to run it in sync mode
+    import nest_asyncio
+    from llama_parse import LlamaParse
+    from llama_parse.utils import SUPPORTED_FILE_TYPES
+
+    nest_asyncio.apply()
+    parser = LlamaParse(result_type="markdown")
+    return {file_type: parser for file_type in SUPPORTED_FILE_TYPES}
+
+
+def _get_file_doc_ids(file_name: str, documents: List[Document]) -> List[str]:
+    # SimpleDirectoryReader uses the file path as document id, with a part suffix for multi-document files
+    file_path = os.path.join(DATA_DIR, file_name)
+    return [
+        document.doc_id
+        for document in documents
+        if document.doc_id == file_path
+        or document.doc_id.startswith(f"{file_path}_part_")
+    ]
+
 
-    vector_store_provider = os.getenv("VECTOR_STORE_PROVIDER", "chroma")
-    if vector_store_provider == "chroma":
-        reset_index_chroma()
-    elif vector_store_provider == "qdrant":
-        reset_index_qdrant()
+def _delete_file_nodes(
+    vector_store: BasePydanticVectorStore,
+    sparse_index: SparseIndex,
+    file_name: str,
+    record: FileRecord | None,
+):
+    if record is not None:
+        for ref_doc_id in record.ref_doc_ids:
+            vector_store.delete(ref_doc_id)
+        sparse_index.delete_ref_docs(record.ref_doc_ids)
     else:
-        raise ValueError(f"Unsupported vector provider: {vector_store_provider}")
+        filters = _get_file_filters(file_name)
+        vector_store.delete_nodes(filters=filters)
+        sparse_index.delete_nodes(filters=filters)
+
+
+def _get_file_node_ids(
+    vector_store: BasePydanticVectorStore,
+    file_name: str,
+    record: FileRecord | None,
+) -> List[str]:
+    if record is not None:
+        return record.node_ids
+    nodes = vector_store.get_nodes(node_ids=None, filters=_get_file_filters(file_name))
+    return [node.node_id for node in nodes]
+
+
+def _get_file_filters(file_name: str) -> MetadataFilters:
+    # The file was indexed before the manifest existed (or never), match its public nodes by name
+    return MetadataFilters(
+        filters=[
+            MetadataFilter(key="file_name", value=file_name),
+            MetadataFilter(key="private", value="false"),
+        ]
+    )
+
+
+def rebuild_index(
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> List[str]:
+    """
+    Re-index all files with the current embedding model into a new collection, then switch to it.
+    The previous collection keeps serving the chat (see `IndexRegistry.pin`) until the switch
+    and is retained afterwards for a rollback (INDEX_RETAINED_GENERATIONS).
+    """
+    start = time.perf_counter()
+    fingerprint = get_embedding_fingerprint()
+    collection = CollectionManager.get_next_collection()
+    # Remove the leftovers of a failed rebuild
+    _delete_collection_data(collection)
+
+    logger.info(f"Rebuilding the index into collection {collection}")
+    try:
+        indexed_files = index_all(on_progress=on_progress, collection=collection)
+        ensure_collection(collection)
+    except Exception:
+        MetricsService.increment("index_rebuild", "failed")
+        raise
+
+    if get_embedding_fingerprint() != fingerprint:
+        # The embedding model was changed again during the rebuild, the next rebuild is queued
+        logger.info(
+            f"Discarding collection {collection} of an outdated embedding model"
+        )
+        _delete_collection_data(collection)
+        MetricsService.increment("index_rebuild", "discarded")
+        return []
+
+    activate_index_collection(collection, fingerprint)
+    duration = time.perf_counter() - start
+    MetricsService.increment("index_rebuild", "completed")
+    MetricsService.set("index_rebuild", "last_duration_seconds", duration)
+    logger.info(f"Rebuilt the index into collection {collection} in {duration:.1f}s")
+    return indexed_files
+
+
+def activate_index_collection(collection: str, fingerprint: Optional[str]):
+    """
+    Switch the index to the given collection, a rebuilt or a retained one,
+    and remove the collections exceeding the retention.
+    """
+    collection_name = CollectionManager.get_collection_name()
+    previous, dropped = CollectionManager.activate(collection, fingerprint)
+    activate_collection(collection_name, collection)
+    IndexRegistry.unpin()
+    logger.info(f"Switched the index from collection {previous} to {collection}")
+    for dropped_collection in dropped:
+        logger.info(f"Removing collection {dropped_collection}")
+        _delete_collection_data(dropped_collection)
+
+
+def release_pinned_index():
+    """
+    Stop serving the pinned index if the active collection matches the embedding configuration,
+    e.g. after switching back to the embedding model of the active collection during a rebuild.
+    """
+    if not CollectionManager.needs_rebuild():
+        IndexRegistry.unpin()
 
-    # Remove STORAGE_DIR
-    storage_context_dir = os.getenv("STORAGE_DIR")
-    logger.info(f"Removing {storage_context_dir}")
-    if os.path.exists(storage_context_dir):
-        shutil.rmtree(storage_context_dir)
 
-    # Run the indexing
-    index_all()
+def _delete_collection_data(collection: str):
+    delete_collection(collection)
+    delete_sparse_index(collection)
+    manifest_path = IngestionManifest.get_path(collection)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
@@ -0,0 +1,283 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from backend.engine.collection_state import (
+    CollectionManager,
+    get_embedding_fingerprint,
+)
+from backend.engine.index_registry import IndexRegistry
+from backend.models.file import FileStatus
+from backend.tasks.indexing import index_all, index_files, rebuild_index, remove_files
+
+logger = logging.getLogger("uvicorn")
+
+# Number of indexing jobs that can run in parallel (jobs touching the same files never run together)
+INDEXING_WORKERS = int(os.getenv("INDEXING_WORKERS", "2"))
+# Maximum number of queued indexing jobs
+INDEXING_QUEUE_SIZE = int(os.getenv("INDEXING_QUEUE_SIZE", "100"))
+# Maximum number of files a queued job collects before a new job is queued
+INDEXING_MAX_JOB_FILES = int(os.getenv("INDEXING_MAX_JOB_FILES", "100"))
+# Number of finished jobs to keep for the progress API
+MAX_FINISHED_JOBS = 1000
+
+
+class IndexingQueueFullError(Exception):
+    pass
+
+
+class IndexingJobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class IndexingJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = Field(default=IndexingJobStatus.PENDING)
+    full_sync: bool = Field(
+        default=False,
+        description="Synchronize the whole data folder instead of the listed files.",
+    )
+    rebuild: bool = Field(
+        default=False,
+        description="Rebuild the index into a new collection, e.g. after the embedding model changed.",
+    )
+    files_to_index: List[str] = Field(default_factory=list)
+    files_to_remove: List[str] = Field(default_factory=list)
+    total_files: int = Field(
+        default=0, description="The number of new or changed files to embed."
+    )
+    processed_files: int = Field(default=0)
+    indexed_files: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = Field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def files(self) -> Set[str]:
+        return {*self.files_to_index, *self.files_to_remove}
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (IndexingJobStatus.COMPLETED, IndexingJobStatus.FAILED)
+
+
+class IndexingJobManager:
+    """
+    Run the indexing in background worker threads, so uploads and deletions don't block the event loop.
+    Repeated triggers are coalesced into the newest queued job (unless it's a rebuild),
+    and jobs touching the same files (or a full sync) are run one after another.
+    """
+
+    _condition = threading.Condition()
+    _jobs: Dict[str, IndexingJob] = {}
+    _queue: Deque[IndexingJob] = deque()
+    _running: List[IndexingJob] = []
+    # The latest job of each file, used to report the file status
+    _file_jobs: Dict[str, str] = {}
+    _workers: List[threading.Thread] = []
+    _stopping = False
+
+    @classmethod
+    def submit(
+        cls,
+        files_to_index: Optional[List[str]] = None,
+        files_to_remove: Optional[List[str]] = None,
+        full_sync: bool = False,
+    ) -> IndexingJob:
+        files_to_index = files_to_index or []
+        files_to_remove = files_to_remove or []
+        with cls._condition:
+            job = cls._queue[-1] if cls._queue else None
+            # A rebuild indexes the data folder as it is when it runs and doesn't take any files
+            if job is None or job.rebuild or len(job.files) >= INDEXING_MAX_JOB_FILES:
+                if len(cls._queue) >= INDEXING_QUEUE_SIZE:
+                    raise IndexingQueueFullError(
+                        "Too many indexing jobs are queued. Please try again later."
+                    )
+                job = IndexingJob()
+                cls._queue.append(job)
+                cls._jobs[job.id] = job
+
+            # Coalesce: the latest trigger wins if the same file is indexed and removed
+            for file_name in files_to_remove:
+                if file_name in job.files_to_index:
+                    job.files_to_index.remove(file_name)
+                if file_name not in job.files_to_remove:
+                    job.files_to_remove.append(file_name)
+                cls._file_jobs.pop(file_name, None)
+            for file_name in files_to_index:
+                if file_name in job.files_to_remove:
+                    job.files_to_remove.remove(file_name)
+                if file_name not in job.files_to_index:
+                    job.files_to_index.append(file_name)
+                cls._file_jobs[file_name] = job.id
+            job.full_sync = job.full_sync or full_sync
+
+            cls._ensure_workers()
+            cls._condition.notify()
+            return job
+
+    @classmethod
+    def submit_rebuild(cls) -> IndexingJob:
+        """
+        Queue a rebuild of the index ahead of the other queued jobs,
+        so they are run with the new embedding model against the new collection.
+        """
+        with cls._condition:
+            job = IndexingJob(full_sync=True, rebuild=True)
+            cls._queue.appendleft(job)
+            cls._jobs[job.id] = job
+            cls._ensure_workers()
+            cls._condition.notify()
+            return job
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Optional[IndexingJob]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def get_file_status(cls, file_name: str) -> str:
+        job = cls._jobs.get(cls._file_jobs.get(file_name))
+        if job is None or job.status == IndexingJobStatus.COMPLETED:
+            return FileStatus.UPLOADED
+        if job.status == IndexingJobStatus.FAILED:
+            return FileStatus.FAILED
+        return FileStatus.INDEXING
+
+    @classmethod
+    def shutdown(cls, timeout: float = 5.0):
+        """
+        Stop the workers once their current job is finished, the queued jobs are dropped.
+        """
+        with cls._condition:
+            cls._stopping = True
+            cls._condition.notify_all()
+        for worker in cls._workers:
+            worker.join(timeout=timeout)
+        cls._workers = []
+
+    @classmethod
+    def _ensure_workers(cls):
+        cls._stopping = False
+        cls._workers = [worker for worker in cls._workers if worker.is_alive()]
+        for i in range(len(cls._workers), INDEXING_WORKERS):
+            worker = threading.Thread(
+                target=cls._work, name=f"indexing-worker-{i}", daemon=True
+            )
+            worker.start()
+            cls._workers.append(worker)
+
+    @classmethod
+    def _work(cls):
+        while True:
+            with cls._condition:
+                job = cls._take_next_job()
+                while job is None:
+                    if cls._stopping:
+                        return
+                    cls._condition.wait()
+                    job = cls._take_next_job()
+                job.status = IndexingJobStatus.RUNNING
+                job.started_at = time.time()
+                cls._running.append(job)
+
+            try:
+                cls._run(job)
+                job.status = IndexingJobStatus.COMPLETED
+            except Exception as e:
+                logger.exception(f"Indexing job {job.id} failed", exc_info=True)
+                job.error = str(e)
+                job.status = IndexingJobStatus.FAILED
+            finally:
+                job.finished_at = time.time()
+                with cls._condition:
+                    cls._running.remove(job)
+                    cls._evict_finished_jobs()
+                    cls._condition.notify_all()
+
+    @classmethod
+    def _take_next_job(cls) -> Optional[IndexingJob]:
+        """
+        Take the first queued job that doesn't touch the files of a running or an earlier queued job.
+        """
+        busy_files: Set[str] = set()
+        busy_all = False
+        for job in cls._running:
+            busy_files.update(job.files)
+            busy_all = busy_all or job.full_sync
+        for job in cls._queue:
+            conflicts = busy_all or (job.full_sync and (busy_files or cls._running))
+            if not conflicts and not (job.files & busy_files):
+                cls._queue.remove(job)
+                return job
+            # Keep the order of jobs touching the same files
+            busy_files.update(job.files)
+            busy_all = busy_all or job.full_sync
+        return None
+
+    @classmethod
+    def _run(cls, job: IndexingJob):
+        def on_progress(processed: int, total: int):
+            job.processed_files = processed
+            job.total_files = total
+
+        if not job.rebuild and _needs_rebuild():
+            # E.g. a previous rebuild failed: don't add embeddings of the new model to the active collection,
+            # rebuild it with all files (including the ones of this job) instead
+            logger.info(f"Rebuilding the index for indexing job {job.id}")
+            job.rebuild = True
+        if job.rebuild:
+            try:
+                job.indexed_files = rebuild_index(on_progress=on_progress)
+            finally:
+                cls._release_pinned_index(job)
+            with cls._condition:
+                # Report the status of the rebuilt files unless they have a newer job
+                for file_name in job.indexed_files:
+                    file_job = cls._jobs.get(cls._file_jobs.get(file_name))
+                    if file_job is None or file_job.is_finished:
+                        cls._file_jobs[file_name] = job.id
+            return
+        if job.files_to_remove:
+            remove_files(job.files_to_remove)
+        if job.full_sync:
+            job.indexed_files = index_all(on_progress=on_progress)
+        elif job.files_to_index:
+            job.indexed_files = index_files(job.files_to_index, on_progress=on_progress)
+
+    @classmethod
+    def _release_pinned_index(cls, job: IndexingJob):
+        # A completed rebuild has switched the index already, a discarded or failed one keeps
+        # the active collection: stop serving the pinned index unless another rebuild is queued
+        with cls._condition:
+            pending = any(
+                other.rebuild
+                for other in [*cls._queue, *cls._running]
+                if other is not job
+            )
+        if not pending and IndexRegistry.is_pinned():
+            IndexRegistry.unpin()
+
+    @classmethod
+    def _evict_finished_jobs(cls):
+        finished = [job_id for job_id, job in cls._jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del cls._jobs[job_id]
+
+
+def _needs_rebuild() -> bool:
+    if os.getenv("USE_LLAMA_CLOUD", "false").lower() == "true":
+        return False
+    # Collections without a fingerprint are adopted by the next config update
+    fingerprint = CollectionManager.get_state().fingerprint
+    return fingerprint is not None and fingerprint != get_embedding_fingerprint()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+MANIFEST_FILE_NAME = "ingestion_manifest_{collection}.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class FileRecord(BaseModel):
+    hash: str = Field(..., description="The SHA-256 hash of the file content.")
+    mtime: float = Field(..., description="The modification time of the file.")
+    size: int = Field(..., description="The size of the file in bytes.")
+    ref_doc_ids: List[str] = Field(
+        default_factory=list,
+        description="The ids of the documents loaded from the file.",
+    )
+    node_ids: List[str] = Field(
+        default_factory=list,
+        description="The ids of the nodes stored in the vector store.",
+    )
+
+
+class IngestionManifest:
+    """
+    Keep track of the files ingested into the vector store,
+    so only new or changed files are embedded and deleted files are removed by their document ids.
+    """
+
+    _lock = threading.RLock()
+
+    def __init__(self, path: Optional[str] = None, collection: Optional[str] = None):
+        if path is None:
+            path = self.get_path(collection)
+        self.path = path
+        self.files: Dict[str, FileRecord] = self._load()
+        # Changes of this instance, applied on top of the stored manifest on save
+        # so concurrent indexing jobs don't overwrite each other's records
+        self._updated: Dict[str, FileRecord] = {}
+        self._removed: Set[str] = set()
+
+    @staticmethod
+    def get_path(collection: Optional[str] = None) -> str:
+        """
+        Each collection has its own manifest, the active collection is used by default.
+        """
+        from backend.engine.collection_state import CollectionManager
+
+        collection = collection or CollectionManager.get_active_collection()
+        return os.path.join(
+            os.getenv("STORAGE_DIR", "storage"),
+            MANIFEST_FILE_NAME.format(collection=collection),
+        )
+
+    def _load(self) -> Dict[str, FileRecord]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        return {file_name: FileRecord(**record) for file_name, record in data.items()}
+
+    def save(self):
+        with self._lock:
+            files = self._load()
+            files.update(self._updated)
+            for file_name in self._removed:
+                files.pop(file_name, None)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a broken manifest
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {name: record.model_dump() for name, record in files.items()},
+                    f,
+                )
+            os.replace(tmp_path, self.path)
+
+            self.files = files
+            self._updated = {}
+            self._removed = set()
+
+    def get(self, file_name: str) -> Optional[FileRecord]:
+        return self.files.get(file_name)
+
+    def set(self, file_name: str, record: FileRecord):
+        self.files[file_name] = record
+        self._updated[file_name] = record
+        self._removed.discard(file_name)
+
+    def remove(self, file_name: str) -> Optional[FileRecord]:
+        self._updated.pop(file_name, None)
+        self._removed.add(file_name)
+        return self.files.pop(file_name, None)
+
+    @staticmethod
+    def is_unchanged(record: Optional[FileRecord], file_path: str) -> bool:
+        """
+        Check whether the file is the same as the ingested one.
+        The file is only hashed if its size or modification time differ from the record.
+        """
+        if record is None:
+            return False
+        stat = os.stat(file_path)
+        if stat.st_size == record.size and stat.st_mtime == record.mtime:
+            return True
+        return stat.st_size == record.size and hash_file(file_path) == record.hash
+
+
+def hash_file(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
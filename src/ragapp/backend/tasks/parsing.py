@@ -0,0 +1,86 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from llama_index.core.readers import SimpleDirectoryReader
+from llama_index.core.readers.base import BaseReader
+from llama_index.core.schema import Document
+
+logger = logging.getLogger("uvicorn")
+
+# Number of processes parsing the files, 0 parses the files in the indexing thread
+INDEXING_PARSE_WORKERS = int(
+    os.getenv("INDEXING_PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+
+class DocumentParser:
+    """
+    Parse files in a pool of processes, as parsing (e.g. PDFs) is CPU-bound
+    and would otherwise compete with the request handling for the GIL.
+    """
+
+    _lock = threading.Lock()
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def load_documents(
+        cls,
+        file_paths: List[str],
+        file_extractor: Optional[Dict[str, BaseReader]] = None,
+    ) -> List[Document]:
+        if file_extractor is not None or INDEXING_PARSE_WORKERS < 1:
+            # Custom extractors (e.g. LlamaParse) are calling an API, parse in the current process
+            return load_file_documents(file_paths, file_extractor)
+
+        executor = cls._get_executor()
+        try:
+            futures = [
+                executor.submit(load_file_documents, [file_path])
+                for file_path in file_paths
+            ]
+            return [document for future in futures for document in future.result()]
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory), start a new pool for the next files
+            with cls._lock:
+                if cls._executor is executor:
+                    cls._executor = None
+            raise
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                logger.info(
+                    f"Starting {INDEXING_PARSE_WORKERS} processes for parsing files"
+                )
+                # Spawn the workers, forking a process with running threads is unsafe
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=INDEXING_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return cls._executor
+
+
+def load_file_documents(
+    file_paths: List[str],
+    file_extractor: Optional[Dict[str, BaseReader]] = None,
+) -> List[Document]:
+    reader = SimpleDirectoryReader(
+        input_files=file_paths,
+        filename_as_id=True,
+        raise_on_error=True,
+        file_extractor=file_extractor,
+    )
+    return reader.load_data()
@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+from llama_index.core.base.llms.types import LLMMetadata
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+from llama_index.core.tools import FunctionTool
+
+from backend.controllers.agents import AgentManager
+from backend.models.agent import ToolConfig
+from backend.workflows.orchestrator import AgentCache, get_agents
+
+
+class MockFunctionCallingLLM(MockLLM):
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+
+@pytest.fixture
+def agent_manager(tmp_path, monkeypatch):
+    config_file = tmp_path / "agents.yaml"
+    config_file.write_text(
+        yaml.dump(
+            {
+                "agent1": {
+                    "name": "Agent 1",
+                    "role": "Assistant",
+                    "goal": "To assist users",
+                    "tools": {
+                        "DuckDuckGo": ToolConfig(enabled=True).dict(),
+                        "Interpreter": ToolConfig(
+                            enabled=True, config={"api_key": "test"}
+                        ).dict(),
+                        "QueryEngine": ToolConfig(enabled=True).dict(),
+                    },
+                    "created_at": 1721060837,
+                }
+            }
+        )
+    )
+    monkeypatch.setattr("backend.controllers.agents.AGENT_CONFIG_FILE", config_file)
+    monkeypatch.setattr(AgentManager, "_instance", None)
+    monkeypatch.setattr(Settings, "_llm", MockFunctionCallingLLM())
+    AgentCache.clear()
+    yield AgentManager()
+    AgentCache.clear()
+
+
+@pytest.fixture
+def load_tools():
+    with patch("backend.workflows.orchestrator.ToolFactory.load_tools") as mock:
+        mock.side_effect = lambda tool_type, config_id, config: [
+            FunctionTool.from_defaults(fn=lambda: config_id, name=config_id)
+        ]
+        yield mock
+
+
+def _loaded_tools(load_tools):
+    return [call.args[1] for call in load_tools.call_args_list]
+
+
+def test_tools_are_loaded_once(agent_manager, load_tools):
+    first = get_agents(query_engine=MagicMock())
+    second = get_agents(query_engine=MagicMock())
+
+    # The interpreter keeps a sandbox session, so it's loaded per request
+    assert sorted(_loaded_tools(load_tools)) == [
+        "duckduckgo",
+        "interpreter",
+        "interpreter",
+    ]
+    assert first[0] is not second[0]
+    assert first[0].memory is not second[0].memory
+    assert first[0].tools[0] is second[0].tools[0]
+    assert first[0].system_prompt == second[0].system_prompt
+
+
+def test_query_engine_tool_is_bound_per_request(agent_manager, load_tools):
+    query_engine = MagicMock()
+
+    agents = get_agents(query_engine=query_engine)
+
+    query_engine_tool = next(
+        tool for tool in agents[0].tools if tool.metadata.name == "QueryEngine"
+    )
+    assert query_engine_tool.query_engine is query_engine
+
+
+def test_cache_is_invalidated_by_config_changes(agent_manager, load_tools):
+    get_agents()
+    agent_manager.update_agent("agent1", {"name": "Agent 2"})
+
+    agents = get_agents()
+
+    assert agents[0].name == "Agent2"
+    assert _loaded_tools(load_tools).count("duckduckgo") == 2
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, List
+from unittest.mock import patch
+
+import pytest
+from llama_index.core.agent.runner.planner import Plan, SubTask
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+
+from backend.workflows.multi import AgentOrchestrator
+from backend.workflows.planner import Planner
+from backend.workflows.routing import AgentRouter, PlanCache
+from backend.workflows.single import FunctionCallingAgent
+
+KEYWORDS = ["weather", "forecast", "code", "python", "report"]
+
+
+class KeywordEmbedding(MockEmbedding):
+    """
+    Embeds a text by counting the keywords it contains.
+    """
+
+    def _embed(self, text: str) -> List[float]:
+        return [float(text.lower().count(keyword)) for keyword in KEYWORDS]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class AnsweringLLM(MockLLM):
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        return ChatResponse(message=ChatMessage(role="assistant", content="answer"))
+
+    def get_tool_calls_from_response(self, response: ChatResponse, **kwargs: Any):
+        return []
+
+
+PLAN = Plan(
+    sub_tasks=[SubTask(name="task", input="task", expected_output="", dependencies=[])]
+)
+
+
+@pytest.fixture(autouse=True)
+def routing(monkeypatch):
+    monkeypatch.setenv("USE_AGENT_ROUTING", "true")
+    monkeypatch.setattr(Settings, "_embed_model", KeywordEmbedding(embed_dim=5))
+    AgentRouter.clear()
+    PlanCache.clear()
+    yield
+    AgentRouter.clear()
+    PlanCache.clear()
+
+
+def _agents() -> List[FunctionCallingAgent]:
+    return [
+        FunctionCallingAgent(
+            name="weather", description="weather forecast", llm=AnsweringLLM()
+        ),
+        FunctionCallingAgent(
+            name="coder", description="python code", llm=AnsweringLLM()
+        ),
+    ]
+
+
+def test_route_to_the_matching_agent():
+    agents = _agents()
+
+    agent = asyncio.run(AgentRouter.route("What's the weather forecast?", agents))
+
+    assert agent is agents[0]
+
+
+def test_tasks_for_several_agents_are_planned():
+    agents = _agents()
+
+    assert asyncio.run(AgentRouter.route("Write a report", agents)) is None
+    assert (
+        asyncio.run(AgentRouter.route("python code for the weather forecast", agents))
+        is None
+    )
+
+
+def test_routing_is_disabled(monkeypatch):
+    monkeypatch.setenv("USE_AGENT_ROUTING", "false")
+
+    assert asyncio.run(AgentRouter.route("weather forecast", _agents())) is None
+
+
+def test_orchestrator_runs_the_routed_agent_without_planning():
+    orchestrator = AgentOrchestrator(agents=_agents(), llm=AnsweringLLM())
+
+    async def _run():
+        return await orchestrator.run(input="weather forecast for Berlin")
+
+    with patch.object(AnsweringLLM, "astructured_predict") as astructured_predict:
+        result = asyncio.run(_run())
+
+    astructured_predict.assert_not_called()
+    assert result.response.message.content == "answer"
+
+
+def test_plans_are_cached_per_scope():
+    async def _create_plans():
+        with patch.object(
+            AnsweringLLM, "astructured_predict", return_value=PLAN
+        ) as astructured_predict:
+            planner = Planner(llm=AnsweringLLM(), cache_scope="1", verbose=False)
+            await planner.create_plan("Write a report.")
+            await planner.create_plan("  write a  REPORT ")
+            # Another agent config version or another conversation needs a new plan
+            await Planner(
+                llm=AnsweringLLM(), cache_scope="2", verbose=False
+            ).create_plan("Write a report")
+            await planner.create_plan(
+                "Write a report",
+                chat_history=[ChatMessage(role="user", content="Hello")],
+            )
+            return astructured_predict.call_count
+
+    assert asyncio.run(_create_plans()) == 3
+
+
+def test_failed_plans_are_not_cached():
+    async def _create_plans():
+        with patch.object(
+            AnsweringLLM, "astructured_predict", side_effect=ValueError
+        ) as astructured_predict:
+            planner = Planner(llm=AnsweringLLM(), cache_scope="1", verbose=False)
+            await planner.create_plan("Write a report")
+            _, plan = await planner.create_plan("Write a report")
+            return astructured_predict.call_count, plan
+
+    call_count, plan = asyncio.run(_create_plans())
+
+    assert call_count == 2
+    assert plan.sub_tasks[0].name == "default"
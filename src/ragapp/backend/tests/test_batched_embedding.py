@@ -0,0 +1,83 @@
+import asyncio
+from typing import List
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+from backend.tasks.embedding import BatchedEmbedding
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RecordingEmbedding(MockEmbedding):
+    batches: List[List[str]] = []
+    in_flight: int = 0
+    max_in_flight: int = 0
+    rate_limited_calls: int = 0
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self.rate_limited_calls > 0:
+            self.rate_limited_calls -= 1
+            raise RateLimitError("Too many requests")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.batches.append(texts)
+        return [[float(len(text))] * self.embed_dim for text in texts]
+
+
+def _nodes(count: int, words: int = 10) -> List[TextNode]:
+    # "hello" is a single token, so each node has `words` tokens
+    return [TextNode(text=" ".join(["hello"] * words)) for _ in range(count)]
+
+
+@pytest.fixture
+def embed_model():
+    return RecordingEmbedding(embed_dim=2, embed_batch_size=4)
+
+
+def test_nodes_are_batched_by_batch_size(embed_model):
+    nodes = BatchedEmbedding(embed_model=embed_model)(_nodes(10))
+
+    assert [len(batch) for batch in embed_model.batches] == [4, 4, 2]
+    assert all(node.embedding is not None for node in nodes)
+
+
+def test_nodes_are_batched_by_token_budget(embed_model):
+    transform = BatchedEmbedding(embed_model=embed_model, batch_tokens=25)
+
+    batches = transform.get_batches(_nodes(5))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_batches_are_embedded_concurrently(embed_model):
+    BatchedEmbedding(embed_model=embed_model, concurrency=2)(_nodes(20))
+
+    assert embed_model.max_in_flight == 2
+    assert sum(len(batch) for batch in embed_model.batches) == 20
+
+
+def test_rate_limited_batches_are_retried(embed_model):
+    embed_model.rate_limited_calls = 2
+    transform = BatchedEmbedding(
+        embed_model=embed_model, concurrency=1, initial_backoff=0.01
+    )
+
+    nodes = transform(_nodes(4))
+
+    assert all(node.embedding is not None for node in nodes)
+
+
+def test_rate_limit_retries_are_limited(embed_model):
+    embed_model.rate_limited_calls = 10
+    transform = BatchedEmbedding(
+        embed_model=embed_model, max_retries=2, initial_backoff=0.01
+    )
+
+    with pytest.raises(RateLimitError):
+        transform(_nodes(4))
@@ -0,0 +1,201 @@
+import asyncio
+from typing import Any, List
+from unittest.mock import MagicMock
+
+from app.api.routers.events import EventCallbackHandler
+from app.api.routers.models import ChatData, Message
+from fastapi import BackgroundTasks
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
+from llama_index.core.llms import MockLLM
+from llama_index.core.tools import ToolSelection
+
+from backend.routers.chat.vercel_response import (
+    ChatEngineVercelStreamResponse,
+    WorkflowVercelStreamResponse,
+)
+from backend.services.metrics import MetricsService
+from backend.workflows.multi import AgentCallTool
+from backend.workflows.single import FunctionCallingAgent
+
+
+CHAT_DATA = ChatData(messages=[Message(role="user", content="question")])
+
+
+class SlowLLM(MockLLM):
+    """
+    Delegates to the first tool if there is one, otherwise answers slowly.
+    """
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    def _tool_call(self, tools: List[Any]) -> ChatResponse:
+        tool_call = ToolSelection(
+            tool_id="call", tool_name=tools[0].metadata.name, tool_kwargs={"input": "q"}
+        )
+        return ChatResponse(
+            message=ChatMessage(
+                role="assistant",
+                content="",
+                additional_kwargs={"tool_calls": [tool_call]},
+            )
+        )
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        if tools:
+            return self._tool_call(tools)
+        self.events.append("started")
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.events.append("cancelled")
+            raise
+
+    async def astream_chat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ):
+        async def gen():
+            if tools:
+                yield self._tool_call(tools)
+                return
+            self.events.append("started")
+            content = ""
+            try:
+                while True:
+                    content += "token "
+                    yield ChatResponse(
+                        message=ChatMessage(role="assistant", content=content),
+                        delta="token ",
+                    )
+                    await asyncio.sleep(0.01)
+            finally:
+                self.events.append("closed")
+
+        return gen()
+
+    def get_tool_calls_from_response(self, response: ChatResponse, **kwargs: Any):
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+
+async def _llm_stream(events: List[str]):
+    events.append("started")
+    content = ""
+    try:
+        while True:
+            content += "token "
+            yield ChatResponse(
+                message=ChatMessage(role="assistant", content=content), delta="token "
+            )
+            await asyncio.sleep(0.01)
+    finally:
+        events.append("closed")
+
+
+async def _astream_chat(events: List[str]) -> StreamingAgentChatResponse:
+    response = StreamingAgentChatResponse(achat_stream=_llm_stream(events))
+    # Like a chat engine writing the response to its memory, in a task reading the LLM stream
+    response.awrite_response_to_history_task = asyncio.ensure_future(
+        response.awrite_response_to_history(MagicMock())
+    )
+    return response
+
+
+def _llm(events: List[str]) -> SlowLLM:
+    llm = SlowLLM()
+    # MockLLM doesn't pass its fields to the constructor
+    object.__setattr__(llm, "events", events)
+    return llm
+
+
+def _caller(events: List[str]) -> FunctionCallingAgent:
+    answerer = FunctionCallingAgent(name="answerer", llm=_llm(events))
+    return FunctionCallingAgent(
+        name="caller",
+        llm=_llm(events),
+        tools=[AgentCallTool(agent=answerer)],
+    )
+
+
+async def _disconnect(
+    workflow: FunctionCallingAgent, events: List[str], streaming: bool
+):
+    handler = workflow.run(input="question", streaming=streaming)
+    response = WorkflowVercelStreamResponse(
+        request=None,
+        chat_data=CHAT_DATA,
+        event_handler=handler,
+        events=workflow.stream_events(),
+    )
+    pending = await _disconnect_response(response, events, handler)
+    return handler, pending
+
+
+async def _disconnect_response(response, events: List[str], handler=None):
+    async def _send():
+        async for _ in response.body_iterator:
+            pass
+
+    send = asyncio.ensure_future(_send())
+    while "started" not in events:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    # The disconnect listener of the response cancels the sending
+    send.cancel()
+    await asyncio.wait([send])
+    if handler is not None:
+        await asyncio.wait([handler], timeout=5)
+    # Let the cancelled tasks finish
+    await asyncio.sleep(0.1)
+    return asyncio.all_tasks() - {asyncio.current_task()}
+
+
+def test_disconnect_cancels_the_nested_agent_runs():
+    MetricsService.reset()
+    events = []
+
+    handler, pending = asyncio.run(_disconnect(_caller(events), events, False))
+
+    assert handler.done()
+    # The LLM call of the nested agent is cancelled
+    assert events == ["started", "cancelled"]
+    assert not pending
+    counters = MetricsService.get_counters("cancellation")
+    assert counters["streams"] == 1
+    # The called agent and the calling agent
+    assert counters["workflow_runs"] == 2
+
+
+def test_disconnect_closes_the_llm_stream():
+    MetricsService.reset()
+    events = []
+
+    agent = FunctionCallingAgent(name="answerer", llm=_llm(events))
+
+    handler, pending = asyncio.run(_disconnect(agent, events, True))
+
+    assert handler.done()
+    assert events == ["started", "closed"]
+    assert not pending
+    assert MetricsService.get_counters("cancellation")["llm_streams"] == 1
+
+
+def test_disconnect_closes_the_llm_stream_of_the_chat_engine():
+    MetricsService.reset()
+    events = []
+    response = ChatEngineVercelStreamResponse(
+        request=None,
+        chat_data=CHAT_DATA,
+        event_handler=EventCallbackHandler(),
+        response=_astream_chat(events),
+        background_tasks=BackgroundTasks(),
+    )
+
+    pending = asyncio.run(_disconnect_response(response, events))
+
+    assert events == ["started", "closed"]
+    assert not pending
+    assert MetricsService.get_counters("cancellation")["llm_streams"] == 1
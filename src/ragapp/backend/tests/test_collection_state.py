@@ -0,0 +1,94 @@
+import pytest
+
+from backend.engine import collection_state
+from backend.engine.collection_state import (
+    CollectionManager,
+    get_embedding_fingerprint,
+)
+
+
+@pytest.fixture(autouse=True)
+def state_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        collection_state, "COLLECTION_STATE_PATH", str(tmp_path / "collections.json")
+    )
+    monkeypatch.setenv("VECTOR_STORE_PROVIDER", "chroma")
+    monkeypatch.setenv("CHROMA_COLLECTION", "default")
+    monkeypatch.setenv("MODEL_PROVIDER", "openai")
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    monkeypatch.setenv("EMBEDDING_DIM", "1536")
+
+
+def test_configured_collection_is_active_by_default():
+    assert CollectionManager.get_active_collection() == "default"
+    assert CollectionManager.needs_rebuild()
+
+
+def test_adopt_existing_collection():
+    CollectionManager.adopt(get_embedding_fingerprint())
+
+    assert not CollectionManager.needs_rebuild()
+    # Adopting doesn't overwrite a known fingerprint
+    CollectionManager.adopt("other")
+    assert not CollectionManager.needs_rebuild()
+
+
+def test_fingerprint_change_needs_rebuild(monkeypatch):
+    CollectionManager.adopt(get_embedding_fingerprint())
+
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    assert CollectionManager.needs_rebuild()
+
+
+def test_activate_next_collection():
+    collection = CollectionManager.get_next_collection()
+    previous, dropped = CollectionManager.activate(
+        collection, get_embedding_fingerprint()
+    )
+
+    assert previous == "default"
+    assert dropped == []
+    assert collection == "default__g1"
+    assert CollectionManager.get_active_collection() == "default__g1"
+    assert CollectionManager.get_next_collection() == "default__g2"
+    assert not CollectionManager.needs_rebuild()
+
+
+def test_previous_collection_is_retained(monkeypatch):
+    monkeypatch.setattr(collection_state, "INDEX_RETAINED_GENERATIONS", 1)
+    small = get_embedding_fingerprint()
+    CollectionManager.adopt(small)
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    large = get_embedding_fingerprint()
+
+    _, dropped = CollectionManager.activate("default__g1", large)
+    assert dropped == []
+    assert CollectionManager.find_retained(small) == "default"
+    assert CollectionManager.find_retained(large) is None
+
+    # Only the most recent previous collection is retained
+    _, dropped = CollectionManager.activate("default__g2", large)
+    assert dropped == ["default"]
+    assert CollectionManager.find_retained(small) is None
+
+
+def test_rollback_to_retained_collection(monkeypatch):
+    small = get_embedding_fingerprint()
+    CollectionManager.adopt(small)
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    large = get_embedding_fingerprint()
+    CollectionManager.activate("default__g1", large)
+
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    assert CollectionManager.needs_rebuild()
+    previous, dropped = CollectionManager.activate(
+        CollectionManager.find_retained(small), small
+    )
+
+    assert previous == "default__g1"
+    assert dropped == []
+    assert CollectionManager.get_active_collection() == "default"
+    assert not CollectionManager.needs_rebuild()
+    # The rolled back collection is retained in turn, the generations keep counting up
+    assert CollectionManager.find_retained(large) == "default__g1"
+    assert CollectionManager.get_next_collection() == "default__g2"
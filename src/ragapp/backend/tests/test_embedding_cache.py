@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import List
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+
+from backend.engine.embedding_cache import CachedEmbedding, EmbeddingCache
+from backend.services.metrics import MetricsService
+
+
+class CountingEmbedding(MockEmbedding):
+    texts: List[str] = []
+    queries: List[str] = []
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return [[float(len(text))] * self.embed_dim for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self.queries.append(query)
+        return [0.5] * self.embed_dim
+
+
+@pytest.fixture
+def cache(tmp_path):
+    MetricsService.reset()
+    return EmbeddingCache(path=str(tmp_path / "embeddings.db"), max_entries=100)
+
+
+def _cached_model(cache: EmbeddingCache, model_name: str = "model-a"):
+    inner = CountingEmbedding(embed_dim=4, model_name=model_name)
+    return inner, CachedEmbedding(embed_model=inner, cache=cache)
+
+
+def test_text_embeddings_are_cached(cache):
+    inner, model = _cached_model(cache)
+
+    first = model.get_text_embedding_batch(["a", "bb"])
+    second = model.get_text_embedding_batch(["bb", "ccc", "a"])
+
+    assert inner.texts == ["a", "bb", "ccc"]
+    assert second == [first[1], [3.0] * 4, first[0]]
+    counters = MetricsService.get_counters("embedding_cache")
+    assert counters["hits"] == 2
+    assert counters["misses"] == 3
+
+
+def test_async_text_embeddings_are_cached(cache):
+    inner, model = _cached_model(cache)
+
+    asyncio.run(model.aget_text_embedding_batch(["a", "bb"]))
+    asyncio.run(model.aget_text_embedding_batch(["a", "bb"]))
+
+    assert inner.texts == ["a", "bb"]
+
+
+def test_query_embeddings_are_cached_separately(cache):
+    inner, model = _cached_model(cache)
+
+    model.get_text_embedding("question")
+    model.get_query_embedding("question")
+    model.get_query_embedding("question")
+
+    assert inner.texts == ["question"]
+    assert inner.queries == ["question"]
+
+
+def test_cache_is_keyed_by_model(cache):
+    _, model_a = _cached_model(cache, "model-a")
+    inner_b, model_b = _cached_model(cache, "model-b")
+
+    model_a.get_text_embedding("text")
+    model_b.get_text_embedding("text")
+
+    assert inner_b.texts == ["text"]
+
+
+def test_cache_is_persistent(cache):
+    _, model = _cached_model(cache)
+    model.get_text_embedding("text")
+
+    inner, model = _cached_model(EmbeddingCache(path=cache.path))
+    model.get_text_embedding("text")
+
+    assert inner.texts == []
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    inner, model = _cached_model(cache)
+    model.get_text_embedding_batch([f"text {i}" for i in range(100)])
+    # Use the first text again, so it is the most recently used one
+    model.get_text_embedding("text 0")
+
+    model.get_text_embedding("new text")
+
+    assert cache.count() <= cache.max_entries
+    inner.texts.clear()
+    model.get_text_embedding_batch(["text 0", "text 1"])
+    assert inner.texts == ["text 1"]
+
+
+def test_async_lookups_dont_block_the_event_loop(cache, monkeypatch):
+    _, model = _cached_model(cache)
+    threads = []
+    get_many = cache.get_many
+
+    def _get_many(keys):
+        threads.append(threading.get_ident())
+        return get_many(keys)
+
+    monkeypatch.setattr(cache, "get_many", _get_many)
+
+    async def _embed():
+        await model.aget_query_embedding("question")
+        await model.aget_text_embedding_batch(["a", "bb"])
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(_embed())
+
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+def test_last_use_is_written_in_batches(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"), last_used_batch=3)
+    _, model = _cached_model(cache)
+    model.get_text_embedding_batch(["a", "b", "c"])
+    reader = sqlite3.connect(cache.path)
+
+    def _last_used():
+        return reader.execute("SELECT MAX(last_used) FROM embeddings").fetchone()[0]
+
+    stored = _last_used()
+    time.sleep(0.01)
+    model.get_text_embedding("a")
+    model.get_text_embedding("b")
+    # The hits aren't written on every lookup
+    assert _last_used() == stored
+
+    model.get_text_embedding("c")
+    assert _last_used() > stored
+    reader.close()
@@ -1,23 +1,33 @@
+import asyncio
 from unittest.mock import MagicMock, patch
 
 import pytest
+from llama_index.core.agent.runner.planner import Plan, SubTask
 from llama_index.core.agent import AgentRunner
 from llama_index.core.chat_engine import CondensePlusContextChatEngine
+from llama_index.core.settings import Settings
 
 from backend.controllers.agents import AgentManager
 from backend.engine.engine import get_chat_engine
+from backend.engine.index_registry import IndexRegistry
+from backend.engine.query_filters import generate_filters
 from backend.models.agent import AgentConfig
 from backend.workflows.multi import AgentOrchestrator
+from backend.workflows.orchestrator import AgentCache
+from backend.workflows.routing import PlanCache
 
 
 @pytest.fixture
 def agent_manager():
-    return AgentManager()
+    # The agents are patched per test, don't reuse the cached ones
+    AgentCache.clear()
+    yield AgentManager()
+    AgentCache.clear()
 
 
 @pytest.fixture
 def mock_get_index():
-    with patch("backend.engine.engine.get_index") as mock:
+    with patch("backend.engine.engine.IndexRegistry.get_index") as mock:
         mock.return_value = MagicMock()
         yield mock
 
@@ -126,3 +136,66 @@ def test_get_chat_engine_no_agents(agent_manager, mock_get_index, mock_openai_ke
             ValueError, match="Required at least one agent to run chat engine."
         ):
             get_chat_engine()
+
+
+def test_chat_request_constructs_index_once(
+    agent_manager, mock_openai_key, mock_load_tools, monkeypatch
+):
+    agent_config = AgentConfig(
+        agent_id="test_agent",
+        name="Test Agent",
+        role="assistant",
+        goal="To assist with tests",
+        system_prompt="Test system prompt",
+        tools={"QueryEngine": {"enabled": True, "config": {}}},
+    )
+    monkeypatch.setattr(IndexRegistry, "_indexes", {})
+    monkeypatch.setattr(IndexRegistry, "_pinned", None)
+    with patch.object(
+        IndexRegistry, "_load_index", return_value=MagicMock()
+    ) as mock_load_index:
+        with patch.object(agent_manager, "get_agents", return_value=[agent_config]):
+            with patch.object(
+                agent_manager,
+                "get_agent_tools",
+                return_value=[("QueryEngine", MagicMock())],
+            ):
+                # Like the chat endpoint: generate the filters, then create the chat engine
+                filters = generate_filters(["doc_1"])
+                get_chat_engine(filters=filters)
+
+    mock_load_index.assert_called_once()
+
+
+def test_chat_requests_reuse_the_plans(
+    agent_manager, mock_get_index, mock_openai_key, monkeypatch
+):
+    monkeypatch.setenv("USE_AGENT_ROUTING", "false")
+    PlanCache.clear()
+    agent_configs = [
+        AgentConfig(
+            agent_id=f"test_agent_{i}",
+            name=f"Test Agent {i}",
+            role="assistant",
+            goal=f"To assist with tests {i}",
+            system_prompt=f"Test system prompt {i}",
+            tools={},
+        )
+        for i in range(2)
+    ]
+    plan = Plan(
+        sub_tasks=[
+            SubTask(name="task", input="task", expected_output="", dependencies=[])
+        ]
+    )
+    with patch.object(agent_manager, "get_agents", return_value=agent_configs):
+        with patch.object(agent_manager, "get_agent_tools", return_value=[]):
+            with patch.object(
+                type(Settings.llm), "astructured_predict", return_value=plan
+            ) as astructured_predict:
+                for _ in range(2):
+                    engine = get_chat_engine()
+                    asyncio.run(engine.planner.create_plan("Write a report"))
+    PlanCache.clear()
+
+    assert astructured_predict.call_count == 1
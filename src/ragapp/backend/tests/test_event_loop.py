@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import threading
+import time
+
+from backend.services import offload
+from backend.services.loop_monitor import EventLoopMonitor
+from backend.services.metrics import MetricsService
+from backend.services.offload import run_blocking
+
+
+def test_run_blocking_runs_off_the_loop():
+    async def _run():
+        return await run_blocking(threading.get_ident)
+
+    assert asyncio.run(_run()) != threading.get_ident()
+
+
+def test_run_blocking_is_bounded(monkeypatch):
+    monkeypatch.setattr(offload, "BLOCKING_CALLS_CONCURRENCY", 2)
+    running, max_running = 0, 0
+    lock = threading.Lock()
+
+    def _blocking_call():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    async def _run():
+        await asyncio.gather(*[run_blocking(_blocking_call) for _ in range(6)])
+
+    asyncio.run(_run())
+    assert max_running == 2
+
+
+def _block_the_loop():
+    time.sleep(0.3)
+
+
+def test_loop_monitor_reports_blocking_call(caplog):
+    MetricsService.reset()
+
+    async def _run():
+        monitor = EventLoopMonitor(threshold_ms=100, interval=0.01)
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        _block_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn"):
+        asyncio.run(_run())
+
+    assert MetricsService.get_counters("event_loop")["blocked_calls"] == 1
+    assert MetricsService.get_counters("event_loop")["max_lag_ms"] >= 200
+    # The report contains the stack of the blocking call
+    assert "_block_the_loop" in caplog.text
+
+
+def test_loop_monitor_ignores_short_calls(caplog):
+    MetricsService.reset()
+
+    async def _run():
+        monitor = EventLoopMonitor(threshold_ms=200, interval=0.01)
+        await monitor.start()
+        for _ in range(5):
+            time.sleep(0.02)
+            await asyncio.sleep(0.01)
+        await monitor.stop()
+
+    asyncio.run(_run())
+
+    assert "blocked_calls" not in MetricsService.get_counters("event_loop")
@@ -0,0 +1,86 @@
+import asyncio
+import io
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from backend.controllers import files
+from backend.controllers.files import FileHandler, FileTooLargeError
+from backend.tasks.manifest import FileRecord, IngestionManifest, hash_file
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STORAGE_DIR", str(tmp_path / "storage"))
+    with patch.object(FileHandler, "validate_file_extension"), patch.object(
+        files.IndexingJobManager, "submit", return_value=MagicMock(id="job-1")
+    ) as mock_submit:
+        yield mock_submit
+
+
+def _upload(content: bytes, file_name: str = "example.txt"):
+    file = UploadFile(file=io.BytesIO(content), filename=file_name)
+    return asyncio.run(FileHandler.upload_file(file, file_name, "1", "1"))
+
+
+def test_upload_is_copied_in_chunks(workdir):
+    content = os.urandom(files.UPLOAD_CHUNK_SIZE * 3 + 1)
+
+    res = _upload(content)
+
+    assert res.job_id == "job-1"
+    with open("data/example.txt", "rb") as f:
+        assert f.read() == content
+    # No temporary files are left behind
+    assert os.listdir("data") == ["example.txt"]
+    workdir.assert_called_once_with(files_to_index=["example.txt"])
+
+
+def test_too_large_upload_is_rejected(workdir, monkeypatch):
+    monkeypatch.setattr(files, "MAX_UPLOAD_FILE_SIZE_MB", 1)
+
+    with pytest.raises(FileTooLargeError):
+        _upload(b"x" * (1024 * 1024 + 1))
+
+    assert os.listdir("data") == []
+    workdir.assert_not_called()
+
+
+def test_identical_reupload_is_not_indexed(workdir):
+    _upload(b"Llamas are cute")
+    stat = os.stat("data/example.txt")
+    manifest = IngestionManifest()
+    manifest.set(
+        "example.txt",
+        FileRecord(
+            hash=hash_file("data/example.txt"),
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+        ),
+    )
+    manifest.save()
+    workdir.reset_mock()
+
+    _upload(b"Llamas are cute")
+    workdir.assert_not_called()
+
+    _upload(b"Llamas are very cute")
+    workdir.assert_called_once_with(files_to_index=["example.txt"])
+
+
+def test_manifest_is_read_off_the_event_loop(workdir):
+    threads = []
+    is_indexed = FileHandler._is_indexed
+
+    def _is_indexed(*args):
+        threads.append(threading.current_thread())
+        return is_indexed(*args)
+
+    with patch.object(FileHandler, "_is_indexed", side_effect=_is_indexed):
+        _upload(b"Llamas are cute")
+
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import qdrant_client
+from llama_index.llms.openai import OpenAI
+
+from backend.engine import vectordb
+from backend.engine.vectordbs import qdrant
+from backend.services.http_clients import HttpClientRegistry
+from backend.services.metrics import MetricsService
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    MetricsService.reset()
+    yield f"http://127.0.0.1:{server.server_port}"
+    asyncio.run(HttpClientRegistry.aclose())
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(base_url):
+    client = HttpClientRegistry.get_client("test", base_url)
+    assert HttpClientRegistry.get_client("test", base_url) is client
+
+    for _ in range(4):
+        assert client.get(base_url).text == "ok"
+
+    counters = MetricsService.get_counters("http_clients")
+    assert counters["test_requests"] == 4
+    assert counters["test_connections"] == 1
+    assert (
+        MetricsService.snapshot()["http_clients"]["test_connection_reuse_ratio"] == 0.75
+    )
+
+
+def test_async_connections_are_pooled_per_event_loop(base_url):
+    client = HttpClientRegistry.get_async_client("test", base_url)
+
+    async def _get():
+        return [(await client.get(base_url)).text for _ in range(2)]
+
+    # e.g. the indexing jobs embed the documents in their own event loop
+    assert asyncio.run(_get()) == ["ok", "ok"]
+    assert asyncio.run(_get()) == ["ok", "ok"]
+
+    counters = MetricsService.get_counters("http_clients")
+    assert counters["test_requests"] == 4
+    assert counters["test_connections"] == 2
+
+
+def test_models_of_a_provider_share_the_clients(base_url):
+    llms = [OpenAI(api_key="key", api_base=base_url) for _ in range(2)]
+    for llm in llms:
+        HttpClientRegistry.attach(llm, "openai")
+
+    assert llms[0]._http_client is llms[1]._http_client
+    assert llms[0]._async_http_client is llms[1]._async_http_client
+    assert llms[0]._get_client()._client is llms[0]._http_client
+
+
+def test_qdrant_clients_are_closed(monkeypatch):
+    monkeypatch.setattr(qdrant_client, "QdrantClient", MagicMock)
+    monkeypatch.setattr(
+        qdrant_client, "AsyncQdrantClient", lambda **kwargs: AsyncMock()
+    )
+    client, aclient = qdrant._get_clients("http://localhost:6333", None)
+    assert qdrant._get_clients("http://localhost:6333", None) == (client, aclient)
+
+    # The config changed
+    vectordb.clear_clients()
+    new_client, new_aclient = qdrant._get_clients("http://localhost:6333", None)
+    assert new_client is not client
+    client.close.assert_not_called()
+
+    asyncio.run(vectordb.close_clients())
+
+    for closed_client, closed_aclient in [(client, aclient), (new_client, new_aclient)]:
+        closed_client.close.assert_called_once()
+        closed_aclient.close.assert_awaited_once()
+    assert qdrant._clients == {}
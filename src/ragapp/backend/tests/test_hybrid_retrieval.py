@@ -0,0 +1,143 @@
+import asyncio
+from typing import List
+
+import pytest
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import (
+    NodeRelationship,
+    NodeWithScore,
+    RelatedNodeInfo,
+    TextNode,
+)
+
+from backend.engine.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from backend.engine.query_filters import generate_filters
+from backend.engine.sparse_index import SparseIndex, tokenize
+
+
+class TopicEmbedding(BaseEmbedding):
+    """Embed a text by its topics, so identifiers don't make a difference for the dense retrieval."""
+
+    topics: List[str] = ["pump", "valve", "filter"]
+
+    def _embed(self, text: str) -> List[float]:
+        return [float(topic in text.lower()) + 0.01 for topic in self.topics]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _node(node_id: str, text: str, doc_id: str, private: str = "false") -> TextNode:
+    return TextNode(
+        id_=node_id,
+        text=text,
+        metadata={"private": private, "file_name": f"{doc_id}.txt"},
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+
+NODES = [
+    _node("n1", "The pump PX-100 moves water.", "doc_a"),
+    _node("n2", "The XK-2041 is used for oil.", "doc_a"),
+    _node("n3", "The pump housing is made of steel.", "doc_b"),
+    _node("n4", "The valve VL-7 controls the flow.", "doc_b"),
+    _node("n5", "The private pump XK-2041 manual.", "doc_private", private="true"),
+]
+
+
+@pytest.fixture
+def sparse_index(tmp_path):
+    index = SparseIndex(str(tmp_path / "sparse_index.db"))
+    index.add_nodes(NODES)
+    yield index
+    index.close()
+
+
+def test_identifiers_are_tokenized_as_a_whole_and_in_parts():
+    assert tokenize("Order XK-2041.B now") == [
+        "order",
+        "xk-2041.b",
+        "xk",
+        "2041",
+        "b",
+        "now",
+    ]
+
+
+def test_search_ranks_exact_terms(sparse_index):
+    results = sparse_index.search("XK-2041", top_k=3)
+
+    assert [node.node.node_id for node in results] == ["n2", "n5"]
+    assert results[0].node.ref_doc_id == "doc_a"
+    assert results[0].node.text == "The XK-2041 is used for oil."
+
+
+def test_search_respects_the_document_filters(sparse_index, monkeypatch):
+    monkeypatch.setenv("USE_LLAMA_CLOUD", "false")
+
+    public = sparse_index.search("XK-2041", top_k=3, filters=generate_filters([]))
+    selected = sparse_index.search(
+        "XK-2041", top_k=3, filters=generate_filters(["doc_private"])
+    )
+
+    assert [node.node.node_id for node in public] == ["n2"]
+    assert [node.node.node_id for node in selected] == ["n2", "n5"]
+
+
+def test_incremental_updates(sparse_index, tmp_path):
+    sparse_index.delete_ref_docs(["doc_a"])
+    sparse_index.add_nodes([_node("n6", "The filter XK-2041 is replaced.", "doc_c")])
+
+    assert sparse_index.count() == 4
+    assert sparse_index.missing_node_ids(["n1", "n6"]) == ["n1"]
+    # The corpus statistics are restored when the index is opened again
+    reopened = SparseIndex(sparse_index.path)
+    assert reopened.count() == 4
+    assert [n.node.node_id for n in reopened.search("XK-2041", top_k=3)] == [
+        "n6",
+        "n5",
+    ]
+    reopened.close()
+
+
+def test_reciprocal_rank_fusion():
+    dense = [NodeWithScore(node=NODES[0]), NodeWithScore(node=NODES[1])]
+    sparse = [NodeWithScore(node=NODES[1]), NodeWithScore(node=NODES[3])]
+
+    fused = reciprocal_rank_fusion([dense, sparse], top_k=2, k=60)
+
+    assert [node.node.node_id for node in fused] == ["n2", "n1"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_hybrid_retriever_finds_identifiers_missed_by_the_dense_retrieval(
+    sparse_index, monkeypatch
+):
+    monkeypatch.setenv("USE_LLAMA_CLOUD", "false")
+    filters = generate_filters([])
+    index = VectorStoreIndex(NODES, embed_model=TopicEmbedding())
+    dense_retriever = index.as_retriever(filters=filters, similarity_top_k=2)
+    retriever = HybridRetriever(
+        vector_retriever=dense_retriever,
+        sparse_index=sparse_index,
+        similarity_top_k=3,
+        filters=filters,
+    )
+
+    dense = dense_retriever.retrieve("Which pump is XK-2041?")
+    hybrid = retriever.retrieve("Which pump is XK-2041?")
+    async_hybrid = asyncio.run(retriever.aretrieve("Which pump is XK-2041?"))
+
+    assert "n2" not in [node.node.node_id for node in dense]
+    assert "n2" in [node.node.node_id for node in hybrid]
+    assert [node.node.node_id for node in async_hybrid] == [
+        node.node.node_id for node in hybrid
+    ]
+    assert "n5" not in [node.node.node_id for node in hybrid]
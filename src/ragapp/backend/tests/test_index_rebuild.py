@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.engine import collection_state
+from backend.engine.collection_state import (
+    CollectionManager,
+    get_embedding_fingerprint,
+)
+from backend.engine.index_registry import IndexRegistry
+from backend.tasks.indexing import release_pinned_index
+from backend.tasks.jobs import IndexingJobManager, IndexingJobStatus
+
+
+@pytest.fixture(autouse=True)
+def collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        collection_state, "COLLECTION_STATE_PATH", str(tmp_path / "collections.json")
+    )
+    monkeypatch.setenv("STORAGE_DIR", str(tmp_path / "storage"))
+    monkeypatch.setenv("USE_LLAMA_CLOUD", "false")
+    monkeypatch.setenv("VECTOR_STORE_PROVIDER", "chroma")
+    monkeypatch.setenv("CHROMA_COLLECTION", "default")
+    monkeypatch.setenv("MODEL_PROVIDER", "openai")
+    monkeypatch.setenv("EMBEDDING_MODEL", "model-a")
+    monkeypatch.setenv("EMBEDDING_DIM", "1536")
+    CollectionManager.adopt(get_embedding_fingerprint())
+    yield
+
+
+@pytest.fixture(autouse=True)
+def job_manager():
+    IndexingJobManager.shutdown()
+    IndexingJobManager._jobs = {}
+    IndexingJobManager._queue = deque()
+    IndexingJobManager._running = []
+    IndexingJobManager._file_jobs = {}
+    IndexRegistry.invalidate()
+    yield IndexingJobManager
+    IndexingJobManager.shutdown()
+    IndexRegistry.invalidate()
+
+
+@pytest.fixture
+def mock_load_index():
+    with patch.object(IndexRegistry, "_load_index") as mock:
+        mock.side_effect = lambda: MagicMock()
+        yield mock
+
+
+@pytest.fixture
+def vector_store():
+    with patch("backend.tasks.indexing.delete_collection"), patch(
+        "backend.tasks.indexing.ensure_collection"
+    ), patch("backend.tasks.indexing.activate_collection"):
+        yield
+
+
+def _wait_until_finished(job, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not job.is_finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished
+
+
+def _change_embedding_model(monkeypatch, model: str):
+    # Like the model config update: keep serving the pinned index
+    monkeypatch.setenv("EMBEDDING_MODEL", model)
+    IndexRegistry.invalidate(keep_pinned=True)
+
+
+def test_switching_back_during_a_rebuild(
+    job_manager, mock_load_index, vector_store, monkeypatch
+):
+    rebuilding = threading.Event()
+    finish_rebuild = threading.Event()
+
+    def _index_all(**kwargs):
+        rebuilding.set()
+        finish_rebuild.wait(5)
+        return []
+
+    index_a = IndexRegistry.get_index()
+    IndexRegistry.pin()
+    _change_embedding_model(monkeypatch, "model-b")
+    with patch("backend.tasks.indexing.index_all", side_effect=_index_all):
+        job = job_manager.submit_rebuild()
+        assert rebuilding.wait(5)
+
+        _change_embedding_model(monkeypatch, "model-a")
+        release_pinned_index()
+        assert not IndexRegistry.is_pinned()
+        index = IndexRegistry.get_index()
+        assert index is not index_a
+
+        finish_rebuild.set()
+        _wait_until_finished(job)
+
+    # The rebuild of model B is discarded, the index of model A keeps being served
+    assert job.status == IndexingJobStatus.COMPLETED
+    assert job.indexed_files == []
+    assert not IndexRegistry.is_pinned()
+    assert CollectionManager.get_active_collection() == "default"
+    assert IndexRegistry.get_index() is index
+
+
+def test_failed_rebuild(job_manager, mock_load_index, vector_store, monkeypatch):
+    IndexRegistry.pin()
+    _change_embedding_model(monkeypatch, "model-b")
+    with patch(
+        "backend.tasks.indexing.index_all", side_effect=ValueError("Provider is down")
+    ) as index_all:
+        job = job_manager.submit_rebuild()
+        _wait_until_finished(job)
+
+        assert job.status == IndexingJobStatus.FAILED
+        assert not IndexRegistry.is_pinned()
+
+        # The uploaded files aren't embedded with model B into the collection of model A
+        with patch("backend.tasks.jobs.index_files") as index_files:
+            upload = job_manager.submit(files_to_index=["a.txt"])
+            _wait_until_finished(upload)
+
+    index_files.assert_not_called()
+    assert upload.rebuild
+    assert index_all.call_count == 2
@@ -0,0 +1,94 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from llama_index.core.callbacks import CallbackManager
+
+from backend.engine.index_registry import IndexRegistry
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    IndexRegistry.invalidate()
+    yield
+    IndexRegistry.invalidate()
+
+
+@pytest.fixture
+def mock_load_index():
+    with patch.object(IndexRegistry, "_load_index") as mock:
+        mock.side_effect = lambda: MagicMock()
+        yield mock
+
+
+def test_index_is_loaded_once(mock_load_index):
+    first = IndexRegistry.get_index()
+    second = IndexRegistry.get_index()
+
+    assert first is second
+    assert mock_load_index.call_count == 1
+
+
+def test_request_callback_manager_does_not_rebuild_index(mock_load_index):
+    index = IndexRegistry.get_index()
+    callback_manager = CallbackManager()
+
+    request_index = IndexRegistry.get_index(callback_manager=callback_manager)
+
+    assert mock_load_index.call_count == 1
+    assert request_index._callback_manager is callback_manager
+    assert index._callback_manager is not callback_manager
+
+
+def test_invalidate_reloads_index(mock_load_index):
+    first = IndexRegistry.get_index()
+    IndexRegistry.invalidate()
+    second = IndexRegistry.get_index()
+
+    assert first is not second
+    assert mock_load_index.call_count == 2
+
+
+def test_config_change_reloads_index(mock_load_index):
+    with patch.dict(os.environ, {"EMBEDDING_MODEL": "text-embedding-3-small"}):
+        first = IndexRegistry.get_index()
+    with patch.dict(os.environ, {"EMBEDDING_MODEL": "text-embedding-3-large"}):
+        second = IndexRegistry.get_index()
+
+    assert first is not second
+    assert mock_load_index.call_count == 2
+
+
+def test_generation_changes_with_the_index(mock_load_index):
+    generation = IndexRegistry.get_generation()
+
+    IndexRegistry.notify_changed()
+    assert IndexRegistry.get_generation() == generation + 1
+
+    IndexRegistry.invalidate()
+    assert IndexRegistry.get_generation() == generation + 2
+
+
+def test_pinned_index_is_served_after_config_change(mock_load_index):
+    with patch.dict(os.environ, {"EMBEDDING_MODEL": "text-embedding-3-small"}):
+        index = IndexRegistry.get_index()
+        IndexRegistry.pin()
+    try:
+        with patch.dict(os.environ, {"EMBEDDING_MODEL": "text-embedding-3-large"}):
+            IndexRegistry.invalidate(keep_pinned=True)
+            assert IndexRegistry.get_index() is index
+
+            IndexRegistry.unpin()
+            assert IndexRegistry.get_index() is not index
+    finally:
+        IndexRegistry.unpin()
+
+
+def test_other_config_changes_drop_the_pinned_index(mock_load_index):
+    index = IndexRegistry.get_index()
+    IndexRegistry.pin()
+
+    with patch.dict(os.environ, {"CHROMA_COLLECTION": "other"}):
+        IndexRegistry.invalidate()
+        assert not IndexRegistry.is_pinned()
+        assert IndexRegistry.get_index() is not index
@@ -0,0 +1,98 @@
+import time
+from collections import deque
+from unittest.mock import patch
+
+import pytest
+
+from backend.models.file import FileStatus
+from backend.tasks.jobs import IndexingJobManager, IndexingJobStatus
+
+
+@pytest.fixture
+def job_manager():
+    IndexingJobManager.shutdown()
+    IndexingJobManager._jobs = {}
+    IndexingJobManager._queue = deque()
+    IndexingJobManager._running = []
+    IndexingJobManager._file_jobs = {}
+    yield IndexingJobManager
+    IndexingJobManager.shutdown()
+
+
+@pytest.fixture
+def no_workers(job_manager):
+    with patch.object(IndexingJobManager, "_ensure_workers"):
+        yield job_manager
+
+
+def _wait_until_finished(job, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not job.is_finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished
+
+
+def test_triggers_are_coalesced_into_queued_job(no_workers):
+    first = no_workers.submit(files_to_index=["a.txt"])
+    second = no_workers.submit(files_to_index=["b.txt"])
+    third = no_workers.submit(files_to_index=["a.txt"])
+
+    assert first.id == second.id == third.id
+    assert first.files_to_index == ["a.txt", "b.txt"]
+    assert no_workers.get_file_status("a.txt") == FileStatus.INDEXING
+
+
+def test_triggers_are_not_coalesced_into_a_rebuild(no_workers):
+    rebuild = no_workers.submit_rebuild()
+    job = no_workers.submit(files_to_index=["a.txt"], files_to_remove=["b.txt"])
+
+    assert job.id != rebuild.id
+    assert not job.rebuild
+    assert rebuild.files == set()
+    assert list(no_workers._queue) == [rebuild, job]
+    assert no_workers.submit(files_to_index=["c.txt"]).id == job.id
+
+
+def test_latest_trigger_wins_for_the_same_file(no_workers):
+    job = no_workers.submit(files_to_index=["a.txt"])
+    no_workers.submit(files_to_remove=["a.txt"])
+
+    assert job.files_to_index == []
+    assert job.files_to_remove == ["a.txt"]
+
+
+def test_jobs_touching_running_files_wait(no_workers):
+    running = no_workers.submit(files_to_index=["a.txt"])
+    assert no_workers._take_next_job() is running
+    no_workers._running.append(running)
+
+    blocked = no_workers.submit(files_to_index=["a.txt"])
+    assert blocked.id != running.id
+    assert no_workers._take_next_job() is None
+
+    no_workers._running.remove(running)
+    assert no_workers._take_next_job() is blocked
+
+
+def test_job_is_run_in_background(job_manager):
+    with patch(
+        "backend.tasks.jobs.index_files", return_value=["a.txt"]
+    ) as mock_index_files:
+        job = job_manager.submit(files_to_index=["a.txt"])
+        _wait_until_finished(job)
+
+    mock_index_files.assert_called_once()
+    assert job.status == IndexingJobStatus.COMPLETED
+    assert job.indexed_files == ["a.txt"]
+    assert job_manager.get_job(job.id) is job
+    assert job_manager.get_file_status("a.txt") == FileStatus.UPLOADED
+
+
+def test_failed_job(job_manager):
+    with patch("backend.tasks.jobs.index_files", side_effect=ValueError("Broken file")):
+        job = job_manager.submit(files_to_index=["a.txt"])
+        _wait_until_finished(job)
+
+    assert job.status == IndexingJobStatus.FAILED
+    assert job.error == "Broken file"
+    assert job_manager.get_file_status("a.txt") == FileStatus.FAILED
@@ -0,0 +1,152 @@
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+from backend.engine import collection_state
+from backend.engine.sparse_index import get_sparse_index
+from backend.engine.vectordb import get_vector_store
+from backend.tasks import indexing
+from backend.tasks.manifest import FileRecord, IngestionManifest, hash_file
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    return str(tmp_path / "storage" / "ingestion_manifest.json")
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    file_path = tmp_path / "example.txt"
+    file_path.write_text("Llamas are cute")
+    return str(file_path)
+
+
+def _record_for(file_path: str) -> FileRecord:
+    stat = os.stat(file_path)
+    return FileRecord(
+        hash=hash_file(file_path),
+        mtime=stat.st_mtime,
+        size=stat.st_size,
+        ref_doc_ids=["data/example.txt"],
+        node_ids=["node-1", "node-2"],
+    )
+
+
+def test_save_and_load(manifest_path, data_file):
+    manifest = IngestionManifest(manifest_path)
+    manifest.set("example.txt", _record_for(data_file))
+    manifest.save()
+
+    loaded = IngestionManifest(manifest_path)
+    assert loaded.get("example.txt") == manifest.get("example.txt")
+
+
+def test_remove(manifest_path, data_file):
+    manifest = IngestionManifest(manifest_path)
+    manifest.set("example.txt", _record_for(data_file))
+
+    record = manifest.remove("example.txt")
+
+    assert record.node_ids == ["node-1", "node-2"]
+    assert manifest.get("example.txt") is None
+    assert manifest.remove("example.txt") is None
+
+
+def test_unchanged_file(data_file):
+    record = _record_for(data_file)
+    assert IngestionManifest.is_unchanged(record, data_file)
+
+
+def test_touched_file_with_same_content_is_unchanged(data_file):
+    record = _record_for(data_file)
+    os.utime(data_file, (time.time() + 10, time.time() + 10))
+
+    assert IngestionManifest.is_unchanged(record, data_file)
+
+
+def test_modified_file_is_changed(data_file):
+    record = _record_for(data_file)
+    with open(data_file, "w") as f:
+        f.write("Llamas are very cute")
+
+    assert not IngestionManifest.is_unchanged(record, data_file)
+
+
+def test_new_file_is_changed(data_file):
+    assert not IngestionManifest.is_unchanged(None, data_file)
+
+
+def test_concurrent_manifests_keep_each_others_records(manifest_path, data_file):
+    first = IngestionManifest(manifest_path)
+    second = IngestionManifest(manifest_path)
+
+    first.set("first.txt", _record_for(data_file))
+    second.set("second.txt", _record_for(data_file))
+    first.save()
+    second.save()
+
+    loaded = IngestionManifest(manifest_path)
+    assert set(loaded.files) == {"first.txt", "second.txt"}
+
+
+class FailingEmbedding(MockEmbedding):
+    fail: bool = False
+
+    async def _aget_text_embeddings(self, texts):
+        if self.fail:
+            raise RuntimeError("The embedding service is down")
+        return await super()._aget_text_embeddings(texts)
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE_PROVIDER", "chroma")
+    monkeypatch.setenv("CHROMA_PATH", str(tmp_path / "chromadb"))
+    monkeypatch.setenv("CHROMA_COLLECTION", "default")
+    monkeypatch.setenv("STORAGE_DIR", str(tmp_path / "storage"))
+    monkeypatch.setattr(
+        collection_state, "COLLECTION_STATE_PATH", str(tmp_path / "collections.json")
+    )
+    monkeypatch.setattr(indexing, "DATA_DIR", str(tmp_path / "data"))
+    os.makedirs(indexing.DATA_DIR)
+    embed_model = FailingEmbedding(embed_dim=8)
+    with patch.object(Settings, "_embed_model", embed_model):
+        yield embed_model
+
+
+def _index_file(text: str):
+    with open(os.path.join(indexing.DATA_DIR, "example.txt"), "w") as f:
+        f.write(text)
+    indexing.index_files(["example.txt"])
+
+
+def _stored_texts():
+    nodes = get_vector_store().get_nodes(node_ids=None)
+    return sorted(node.get_content() for node in nodes)
+
+
+def test_changed_file_replaces_its_nodes(index_dir):
+    _index_file("Llamas are cute")
+    _index_file("Llamas are very cute")
+
+    assert _stored_texts() == ["Llamas are very cute"]
+    record = IngestionManifest().get("example.txt")
+    assert len(record.node_ids) == 1
+    assert get_sparse_index().missing_node_ids(record.node_ids) == []
+    assert get_sparse_index().count() == 1
+
+
+def test_changed_file_keeps_its_nodes_if_the_embedding_fails(index_dir):
+    _index_file("Llamas are cute")
+    record = IngestionManifest().get("example.txt")
+
+    index_dir.fail = True
+    with pytest.raises(RuntimeError):
+        _index_file("Llamas are very cute")
+
+    assert _stored_texts() == ["Llamas are cute"]
+    assert IngestionManifest().get("example.txt") == record
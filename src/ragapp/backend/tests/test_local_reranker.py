@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from llama_index.core import QueryBundle
+from llama_index.core.llms import MockLLM
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from backend.engine.context_chat_engine import ContextChatEngine
+from backend.engine.postprocessors import LocalReranker, get_reranker
+from backend.engine.postprocessors import local_reranker
+from backend.models.reranker_config import (
+    CohereRerankerConfig,
+    LocalRerankerConfig,
+    get_reranker_config,
+    get_reranker_config_class,
+)
+
+
+class FakeCrossEncoder:
+    """
+    Scores a text by the number of words it shares with the query.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.running = 0
+        self.max_running = 0
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def rerank(self, query, documents, batch_size=64):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.running -= 1
+        self.batch_sizes.append(batch_size)
+        words = set(query.split())
+        return [len(words & set(document.split())) for document in documents]
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = FakeCrossEncoder()
+    monkeypatch.setitem(local_reranker._encoders, "fake", encoder)
+    monkeypatch.setattr(local_reranker, "_executor", None)
+    yield encoder
+
+
+def _nodes(*texts):
+    return [NodeWithScore(node=TextNode(text=text), score=0.0) for text in texts]
+
+
+def test_nodes_are_ranked_by_the_cross_encoder(encoder):
+    reranker = LocalReranker(model="fake", top_n=2, batch_size=8)
+
+    nodes = reranker.postprocess_nodes(
+        _nodes("blue sky", "red apple", "blue apple sky"),
+        QueryBundle(query_str="blue sky apple"),
+    )
+
+    assert [node.text for node in nodes] == ["blue apple sky", "blue sky"]
+    assert [node.score for node in nodes] == [3.0, 2.0]
+    assert encoder.batch_sizes == [8]
+
+
+def test_concurrent_rerankings_are_bounded(encoder, monkeypatch):
+    monkeypatch.setattr(local_reranker, "LOCAL_RERANK_WORKERS", 2)
+    encoder.latency = 0.05
+    reranker = LocalReranker(model="fake")
+
+    def _rerank(_):
+        return reranker.postprocess_nodes(_nodes("a", "b"), QueryBundle(query_str="a"))
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(_rerank, range(6)))
+
+    assert encoder.max_running == 2
+
+
+class FixedRetriever(BaseRetriever):
+    def _retrieve(self, query_bundle: QueryBundle):
+        return _nodes("blue sky", "red apple", "blue apple sky")
+
+
+def test_chat_engine_reranks_without_blocking_the_event_loop(encoder):
+    encoder.latency = 0.2
+    engine = ContextChatEngine(
+        retriever=FixedRetriever(),
+        llm=MockLLM(),
+        memory=ChatMemoryBuffer.from_defaults(token_limit=1000),
+        node_postprocessors=[LocalReranker(model="fake", top_n=1)],
+    )
+
+    async def _run():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def _tick():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(_tick())
+        try:
+            nodes = await engine._aget_nodes("blue sky apple")
+        finally:
+            done.set()
+            await ticker
+        return nodes, ticks
+
+    nodes, ticks = asyncio.run(_run())
+
+    assert [node.text for node in nodes] == ["blue apple sky"]
+    # The loop kept running while the cross-encoder was scoring
+    assert ticks >= 5
+
+
+def test_local_provider(monkeypatch):
+    monkeypatch.setenv("RERANK_PROVIDER", "local")
+    monkeypatch.setenv("LOCAL_RERANK_MODEL", "BAAI/bge-reranker-base")
+    monkeypatch.setenv("TOP_K", "5")
+
+    reranker = get_reranker()
+
+    assert isinstance(reranker, LocalReranker)
+    assert reranker.model == "BAAI/bge-reranker-base"
+    assert reranker.top_n == 5
+
+
+def test_local_provider_config(monkeypatch):
+    monkeypatch.setenv("RERANK_PROVIDER", "local")
+    monkeypatch.setenv("LOCAL_RERANK_MODEL", "BAAI/bge-reranker-base")
+    monkeypatch.setenv("COHERE_API_KEY", "key")
+    monkeypatch.delenv("USE_RERANKER", raising=False)
+
+    config = get_reranker_config()
+
+    assert isinstance(config, LocalRerankerConfig)
+    assert config.to_api_response() == {
+        "use_reranker": None,
+        "rerank_provider": "local",
+        "local_rerank_model": "BAAI/bge-reranker-base",
+    }
+
+
+def test_cohere_config_ignores_the_local_fields():
+    config_class = get_reranker_config_class("cohere")
+
+    config = config_class(
+        rerank_provider="cohere",
+        cohere_api_key="key",
+        local_rerank_model="BAAI/bge-reranker-base",
+    )
+
+    assert config_class is CohereRerankerConfig
+    assert "local_rerank_model" not in config.to_api_response()
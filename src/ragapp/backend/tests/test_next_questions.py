@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from app.api.routers.events import EventCallbackHandler
+from app.api.routers.models import ChatData, Message
+from fastapi import BackgroundTasks
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+)
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+
+from backend.routers.chat.vercel_response import ChatEngineVercelStreamResponse
+from backend.services.suggestion import NextQuestionSuggestion
+
+
+class SuggestingLLM(MockLLM):
+    model: str = "large"
+    latency: float = 0.0
+    calls: int = 0
+
+    async def acomplete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return CompletionResponse(text=f"```\nWhat about {self.model}?\nAnd then?\n```")
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setenv("NEXT_QUESTION_PROMPT", "Suggest questions for {conversation}")
+    llm = SuggestingLLM()
+    monkeypatch.setattr(Settings, "_llm", llm)
+    NextQuestionSuggestion.clear()
+    yield llm
+    NextQuestionSuggestion.clear()
+
+
+def _suggest(question: str = "Hello?", response: str = "Hi!"):
+    return asyncio.run(
+        NextQuestionSuggestion.suggest_next_questions(
+            [ChatMessage(role="user", content=question)], response
+        )
+    )
+
+
+def test_suggestions_are_cached_per_question_and_answer(llm):
+    assert _suggest() == ["What about large?", "And then?"]
+    assert _suggest() == ["What about large?", "And then?"]
+    assert llm.calls == 1
+
+    _suggest(response="Something else")
+    assert llm.calls == 2
+
+
+def test_suggestions_use_the_configured_model(llm, monkeypatch):
+    monkeypatch.setenv("NEXT_QUESTION_MODEL", "small")
+
+    assert _suggest() == ["What about small?", "And then?"]
+    # The configured LLM isn't changed
+    assert llm.model == "large"
+
+
+def test_suggestions_time_out(llm, monkeypatch):
+    monkeypatch.setenv("NEXT_QUESTION_TIMEOUT", "0.05")
+    llm.latency = 5
+
+    assert _suggest() is None
+
+
+def test_no_suggestions_without_prompt(llm, monkeypatch):
+    monkeypatch.delenv("NEXT_QUESTION_PROMPT")
+
+    assert _suggest() is None
+    assert llm.calls == 0
+
+
+def test_text_is_sent_while_the_questions_are_suggested(llm):
+    llm.latency = 0.5
+
+    async def _llm_stream():
+        for i in range(20):
+            yield ChatResponse(
+                message=ChatMessage(role="assistant", content=""),
+                delta=f"token {i:03} ",
+            )
+
+    async def _astream_chat():
+        return StreamingAgentChatResponse(
+            achat_stream=_llm_stream(), is_writing_to_memory=False
+        )
+
+    async def _receive():
+        response = ChatEngineVercelStreamResponse(
+            request=None,
+            chat_data=ChatData(messages=[Message(role="user", content="Hello?")]),
+            event_handler=EventCallbackHandler(),
+            response=_astream_chat(),
+            background_tasks=BackgroundTasks(),
+        )
+        start = time.perf_counter()
+        frames = []
+        async for frame in response.body_iterator:
+            frames.append((time.perf_counter() - start, frame))
+            # A slow client
+            await asyncio.sleep(0.05)
+        return frames
+
+    frames = asyncio.run(_receive())
+
+    text_times = [at for at, frame in frames if frame.startswith(b"0:")]
+    question_time = next(at for at, frame in frames if b"suggested_questions" in frame)
+    assert len(text_times) > 3
+    # The suggestion started with the last token, not after the last frame was sent
+    assert text_times[-1] < question_time < text_times[-1] + llm.latency
@@ -0,0 +1,166 @@
+import asyncio
+from unittest.mock import patch
+
+from llama_index.core.agent.runner.planner import Plan, SubTask
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.llms import MockLLM
+from llama_index.core.workflow import (
+    Context,
+    StartEvent,
+    StopEvent,
+    Workflow,
+    step,
+)
+
+from backend.workflows.planner import StructuredPlannerAgent
+from backend.workflows.single import AgentRunEvent, AgentRunResult
+
+
+class MockFunctionCallingLLM(MockLLM):
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+
+class SlowExecutor(Workflow):
+    """
+    Executor recording the sub-tasks running at the same time.
+    """
+
+    def __init__(self, tracker: dict, latencies: dict):
+        super().__init__(timeout=10)
+        self.tracker = tracker
+        self.latencies = latencies
+
+    @step()
+    async def run_task(self, ctx: Context, ev: StartEvent) -> StopEvent:
+        tracker = self.tracker
+        tracker["running"] += 1
+        tracker["max_running"] = max(tracker["max_running"], tracker["running"])
+        tracker["started"].append(ev.input)
+        ctx.write_event_to_stream(AgentRunEvent(name=ev.input, msg="working"))
+        await asyncio.sleep(self.latencies.get(ev.input, 0.05))
+        tracker["running"] -= 1
+        tracker["finished"].append(ev.input)
+        if ev.streaming:
+            tracker["streamed"].append(ev.input)
+            return StopEvent(result=_stream(ev.input))
+        return StopEvent(
+            result=AgentRunResult(
+                response=ChatResponse(
+                    message=ChatMessage(role="assistant", content=ev.input)
+                ),
+                sources=[],
+            )
+        )
+
+
+async def _stream(text: str):
+    yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=text)
+
+
+def _sub_task(name: str, dependencies=()) -> SubTask:
+    return SubTask(
+        name=name, input=name, expected_output="", dependencies=list(dependencies)
+    )
+
+
+# research_a, research_b and research_c are independent, the report needs all of them
+PLAN = Plan(
+    sub_tasks=[
+        _sub_task("research_a"),
+        _sub_task("research_b"),
+        _sub_task("research_c"),
+        _sub_task("report", ["research_a", "research_b", "research_c"]),
+    ]
+)
+
+
+async def _run_planner(
+    max_parallel_sub_tasks: int,
+    plan: Plan = PLAN,
+    latencies: dict | None = None,
+    streaming: bool = False,
+):
+    tracker = {
+        "running": 0,
+        "max_running": 0,
+        "started": [],
+        "finished": [],
+        "streamed": [],
+    }
+    agent = StructuredPlannerAgent(
+        name="planner",
+        llm=MockFunctionCallingLLM(),
+        max_parallel_sub_tasks=max_parallel_sub_tasks,
+    )
+    with patch.object(
+        MockFunctionCallingLLM, "astructured_predict", return_value=plan
+    ), patch.object(
+        agent,
+        "_create_executor",
+        side_effect=lambda: SlowExecutor(tracker, latencies or {}),
+    ):
+        handler = agent.run(input="Write a report", streaming=streaming)
+        events = [event async for event in handler.stream_events()]
+        result = await handler
+    return tracker, events, result
+
+
+def test_independent_sub_tasks_run_in_parallel():
+    tracker, events, result = asyncio.run(_run_planner(max_parallel_sub_tasks=4))
+
+    assert tracker["max_running"] == 3
+    assert set(tracker["started"][:3]) == {"research_a", "research_b", "research_c"}
+    # The report waits for all its dependencies
+    assert tracker["started"][-1] == "report"
+    assert tracker["finished"][-1] == "report"
+    assert result.response.message.content == "report"
+    # The events of all sub-tasks are written to the planner's stream
+    names = [event.name for event in events if isinstance(event, AgentRunEvent)]
+    assert {"research_a", "research_b", "research_c", "report"} <= set(names)
+
+
+def test_max_parallel_sub_tasks():
+    tracker, _, result = asyncio.run(_run_planner(max_parallel_sub_tasks=2))
+
+    assert tracker["max_running"] == 2
+    assert len(tracker["finished"]) == 4
+    assert result.response.message.content == "report"
+
+
+def test_last_sub_task_is_streamed():
+    _, _, result = asyncio.run(_run_planner(max_parallel_sub_tasks=4, streaming=True))
+
+    chunks = asyncio.run(_collect(result))
+    assert [chunk.delta for chunk in chunks] == ["report"]
+
+
+def test_streamed_sub_task_finishing_first_is_the_answer():
+    # Two independent final sub-tasks, the one started last is streamed
+    plan = Plan(sub_tasks=[_sub_task("summary"), _sub_task("answer")])
+
+    tracker, _, result = asyncio.run(
+        _run_planner(
+            max_parallel_sub_tasks=4,
+            plan=plan,
+            latencies={"summary": 0.2, "answer": 0.01},
+            streaming=True,
+        )
+    )
+
+    assert tracker["finished"] == ["answer", "summary"]
+    assert tracker["streamed"] == ["answer"]
+    chunks = asyncio.run(_collect(result))
+    assert [chunk.delta for chunk in chunks] == ["answer"]
+
+
+async def _collect(generator):
+    return [chunk async for chunk in generator]
+
+
+def test_refine_plan_runs_sequentially():
+    agent = StructuredPlannerAgent(
+        name="planner", llm=MockFunctionCallingLLM(), refine_plan=True
+    )
+    assert agent.max_parallel_sub_tasks == 1
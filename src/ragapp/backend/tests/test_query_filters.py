@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+import pytest
+
+from backend.engine.index_registry import IndexRegistry
+from backend.engine.query_filters import generate_filters
+
+
+@pytest.fixture(autouse=True)
+def no_index_loading():
+    # Generating the filters must not load the index
+    with patch.object(IndexRegistry, "get_index", side_effect=AssertionError):
+        yield
+
+
+def test_vector_store_filters(monkeypatch):
+    monkeypatch.setenv("USE_LLAMA_CLOUD", "false")
+
+    filters = generate_filters(["doc_1"])
+
+    assert [f.key for f in filters.filters] == ["private", "doc_id"]
+    assert filters.condition == "or"
+
+
+def test_llama_cloud_filters(monkeypatch):
+    monkeypatch.setenv("USE_LLAMA_CLOUD", "true")
+
+    filters = generate_filters(["doc_1"])
+
+    assert [f.key for f in filters.filters] == ["private", "file_id"]
+    assert filters.filters[0].operator == "is_empty"
+
+
+def test_public_documents_only(monkeypatch):
+    monkeypatch.delenv("USE_LLAMA_CLOUD", raising=False)
+
+    filters = generate_filters([])
+
+    assert len(filters.filters) == 1
+    assert filters.filters[0].value == "true"
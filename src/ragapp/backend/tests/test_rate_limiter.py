@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import SQLModel, create_engine
+
+from backend.database import DB
+from backend.models.user_info import UserInfo
+from backend.services.rate_limiter import DatabaseRateLimiter, MemoryRateLimiter
+from backend.services.user_chat_service import UserChatService
+
+USER = UserInfo(user_id="test_user")
+TIME_FRAME = "2024-01-01"
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(DB, "_engine", engine)
+
+
+def _acquire_concurrently(limiter, requests: int, limit=None):
+    async def _run():
+        return await asyncio.gather(
+            *[limiter.acquire(USER, TIME_FRAME, limit) for _ in range(requests)]
+        )
+
+    return asyncio.run(_run())
+
+
+def test_memory_limiter_no_over_admission():
+    limiter = MemoryRateLimiter(flush_interval=60)
+
+    admitted = _acquire_concurrently(limiter, 50, limit=10)
+
+    assert sum(admitted) == 10
+    limiter.shutdown()
+    assert UserChatService.get_user_chat_request_count(USER, TIME_FRAME) == 10
+
+
+def test_memory_limiter_continues_from_persisted_count():
+    UserChatService.set_user_chat_request_counts({(USER.user_id, TIME_FRAME): 3})
+    limiter = MemoryRateLimiter(flush_interval=60)
+
+    admitted = _acquire_concurrently(limiter, 20, limit=10)
+
+    assert sum(admitted) == 7
+    limiter.shutdown()
+
+
+def test_memory_limiter_flushes_in_background():
+    limiter = MemoryRateLimiter(flush_interval=0.01)
+    _acquire_concurrently(limiter, 5)
+
+    for _ in range(100):
+        if UserChatService.get_user_chat_request_count(USER, TIME_FRAME) == 5:
+            break
+        asyncio.run(asyncio.sleep(0.01))
+    assert UserChatService.get_user_chat_request_count(USER, TIME_FRAME) == 5
+    limiter.shutdown()
+
+
+def test_database_limiter_no_over_admission():
+    # Concurrent increments from many threads, like requests of multiple workers
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        admitted = list(
+            executor.map(
+                lambda _: UserChatService.increment_user_chat_request_count(
+                    USER, TIME_FRAME, 10
+                ),
+                range(50),
+            )
+        )
+
+    assert sum(admitted) == 10
+    assert UserChatService.get_user_chat_request_count(USER, TIME_FRAME) == 10
+
+
+def test_database_limiter_without_limit():
+    admitted = _acquire_concurrently(DatabaseRateLimiter(), 20)
+
+    assert all(admitted)
+    assert UserChatService.get_user_chat_request_count(USER, TIME_FRAME) == 20
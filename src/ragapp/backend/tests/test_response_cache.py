@@ -0,0 +1,133 @@
+import asyncio
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.settings import Settings
+
+from backend.engine.response_cache import (
+    CachedCondensePlusContextChatEngine,
+    CachedResponse,
+    ResponseCache,
+)
+
+
+class KeywordEmbedding(BaseEmbedding):
+    """Embed a text by the keywords it contains, so similar questions get similar embeddings."""
+
+    keywords: List[str] = ["llama", "alpaca", "price"]
+
+    def _embed(self, text: str) -> List[float]:
+        return [float(keyword in text.lower()) + 0.01 for keyword in self.keywords]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class CountingRetriever(BaseRetriever):
+    calls: int = 0
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        self.calls += 1
+        return [NodeWithScore(node=TextNode(text="Llamas are cute", id_="n1"), score=1)]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ResponseCache.clear()
+    with patch.object(Settings, "_embed_model", KeywordEmbedding()):
+        yield
+    ResponseCache.clear()
+
+
+def _chat(retriever: CountingRetriever, question: str, scope=(0, None, 0)):
+    engine = CachedCondensePlusContextChatEngine(
+        retriever=retriever,
+        llm=MockLLM(max_tokens=5),
+        memory=ChatMemoryBuffer.from_defaults(token_limit=1000),
+        cache_scope=scope,
+    )
+
+    async def _run():
+        response = await engine.astream_chat(question, [])
+        answer = "".join([token async for token in response.async_response_gen()])
+        return answer, response.source_nodes
+
+    return asyncio.run(_run())
+
+
+def test_similar_question_is_answered_from_cache():
+    retriever = CountingRetriever()
+
+    first_answer, first_nodes = _chat(retriever, "Are llamas cute?")
+    second_answer, second_nodes = _chat(retriever, "are LLAMAS cute")
+
+    assert retriever.calls == 1
+    assert second_answer == first_answer
+    assert [n.node_id for n in second_nodes] == [n.node_id for n in first_nodes]
+
+
+def test_interrupted_answer_is_not_cached():
+    retriever = CountingRetriever()
+    engine = CachedCondensePlusContextChatEngine(
+        retriever=retriever,
+        llm=MockLLM(max_tokens=5),
+        memory=ChatMemoryBuffer.from_defaults(token_limit=1000),
+        cache_scope=(0, None, 0),
+    )
+
+    async def _run():
+        response = await engine.astream_chat("Are llamas cute?", [])
+        tokens = response.async_response_gen()
+        await tokens.__anext__()
+        # The client disconnected
+        await tokens.aclose()
+        await response.achat_stream.aclose()
+
+    asyncio.run(_run())
+    _chat(retriever, "Are llamas cute?")
+
+    assert retriever.calls == 2
+
+
+def test_different_question_is_not_answered_from_cache():
+    retriever = CountingRetriever()
+
+    _chat(retriever, "Are llamas cute?")
+    _chat(retriever, "What is the price of an alpaca?")
+
+    assert retriever.calls == 2
+
+
+def test_answers_are_scoped():
+    retriever = CountingRetriever()
+
+    _chat(retriever, "Are llamas cute?", scope=(0, None, 0))
+    # The index changed
+    _chat(retriever, "Are llamas cute?", scope=(1, None, 0))
+    # Other document filters
+    _chat(retriever, "Are llamas cute?", scope=(1, "doc-1", 0))
+
+    assert retriever.calls == 3
+
+
+def test_cache_size_is_bounded(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_MAX_SIZE", "2")
+    for i in range(5):
+        ResponseCache.add(
+            CachedResponse(scope=(i,), embedding=[1.0, 0.0], answer=str(i))
+        )
+
+    assert ResponseCache.lookup((0,), [1.0, 0.0]) is None
+    assert ResponseCache.lookup((4,), [1.0, 0.0]).answer == "4"
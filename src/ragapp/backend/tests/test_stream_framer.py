@@ -0,0 +1,86 @@
+import asyncio
+
+from backend.routers.chat.stream_framer import coalesce_text
+
+
+async def _tokens(tokens, delay: float = 0.0):
+    for token in tokens:
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+
+
+async def _coalesce(tokens, delay: float = 0.0, **kwargs):
+    return [text async for text in coalesce_text(_tokens(tokens, delay), **kwargs)]
+
+
+def test_tokens_are_joined_up_to_the_flush_size():
+    tokens = ["ab", "cd", "", "ef", "gh", "ij"]
+
+    chunks = asyncio.run(_coalesce(tokens, flush_size=4, flush_interval=10))
+
+    assert chunks == ["abcd", "efgh", "ij"]
+
+
+def test_slow_tokens_are_flushed_after_the_interval():
+    tokens = ["a", "b", "c"]
+
+    chunks = asyncio.run(
+        _coalesce(tokens, delay=0.05, flush_size=100, flush_interval=0.01)
+    )
+
+    assert chunks == ["a", "b", "c"]
+
+
+def test_empty_stream():
+    assert asyncio.run(_coalesce([])) == []
+
+
+def test_closing_the_stream_closes_the_tokens():
+    events = []
+
+    async def _endless_tokens():
+        try:
+            while True:
+                yield "token "
+                await asyncio.sleep(0.01)
+        finally:
+            events.append("closed")
+
+    async def _read_first_chunk():
+        chunks = coalesce_text(_endless_tokens(), flush_size=10, flush_interval=10)
+        first = await chunks.__anext__()
+        await chunks.aclose()
+        # The reader is finished and the token stream closed without waiting for the loop
+        return first, list(events), asyncio.all_tasks() - {asyncio.current_task()}
+
+    first, closed, pending = asyncio.run(_read_first_chunk())
+
+    assert first == "token token "
+    assert closed == ["closed"]
+    assert not pending
+
+
+def test_cancellation_while_closing_is_not_swallowed():
+    async def _slowly_closed_tokens():
+        yield "token"
+        try:
+            await asyncio.sleep(10)
+        finally:
+            # e.g. closing the HTTP response of the LLM
+            await asyncio.sleep(0.1)
+
+    async def _close_after_first_chunk():
+        chunks = coalesce_text(_slowly_closed_tokens(), flush_size=1)
+        await chunks.__anext__()
+        await chunks.aclose()
+
+    async def _run():
+        task = asyncio.ensure_future(_close_after_first_chunk())
+        await asyncio.sleep(0.05)
+        # Cancelled while waiting for the token stream to stop
+        task.cancel()
+        await asyncio.wait([task])
+        return task.cancelled()
+
+    assert asyncio.run(_run())
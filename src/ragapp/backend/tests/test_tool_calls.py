@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Any, List
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.llms import MockLLM
+from llama_index.core.tools import FunctionTool, ToolSelection
+
+from backend.workflows import single
+from backend.workflows.multi import AgentCallTool
+from backend.workflows.single import ContextAwareTool, FunctionCallingAgent
+
+
+class ParallelToolCallingLLM(MockLLM):
+    """
+    Calls all tools in the first response, then answers with the tool outputs.
+    """
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        if chat_history[-1].role == "tool":
+            tool_msgs = [msg for msg in chat_history if msg.role == "tool"]
+            return ChatResponse(
+                message=ChatMessage(
+                    role="assistant",
+                    content=",".join(msg.content for msg in tool_msgs),
+                )
+            )
+        tool_calls = [
+            ToolSelection(
+                tool_id=f"call_{i}",
+                tool_name=tool.metadata.name,
+                # Delegate the task to the called agents
+                tool_kwargs=(
+                    {"input": chat_history[-1].content}
+                    if isinstance(tool, ContextAwareTool)
+                    else {}
+                ),
+            )
+            for i, tool in enumerate(tools)
+        ]
+        return ChatResponse(
+            message=ChatMessage(
+                role="assistant",
+                content="",
+                additional_kwargs={"tool_calls": tool_calls},
+            )
+        )
+
+    def get_tool_calls_from_response(
+        self, response: ChatResponse, error_on_no_tool_call: bool = True, **kwargs: Any
+    ) -> List[ToolSelection]:
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+
+class SlowAnswerLLM(ParallelToolCallingLLM):
+    """
+    Answers after a while without calling any tools.
+    """
+
+    latency: float = 0.3
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        await asyncio.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content="report"))
+
+
+def _slow_tool(name: str, latency: float) -> FunctionTool:
+    async def _call() -> str:
+        await asyncio.sleep(latency)
+        return name
+
+    return FunctionTool.from_defaults(async_fn=_call, name=name, description=name)
+
+
+async def _run_agent(tools: List[FunctionTool]):
+    agent = FunctionCallingAgent(
+        name="agent", llm=ParallelToolCallingLLM(), tools=tools, write_events=False
+    )
+    start = time.perf_counter()
+    result = await agent.run(input="Call all tools")
+    return result, time.perf_counter() - start
+
+
+def test_tool_calls_run_concurrently():
+    # The slowest tool is called first, the results keep the order of the tool calls
+    latencies = {"slow": 0.4, "medium": 0.3, "fast": 0.2}
+    tools = [_slow_tool(name, latency) for name, latency in latencies.items()]
+
+    result, duration = asyncio.run(_run_agent(tools))
+
+    assert max(latencies.values()) <= duration < sum(latencies.values())
+    assert result.response.message.content == "slow,medium,fast"
+    assert [source.tool_name for source in result.sources] == ["slow", "medium", "fast"]
+
+
+def test_tool_call_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(single, "TOOL_CALL_CONCURRENCY", 2)
+    tools = [_slow_tool(f"tool_{i}", 0.2) for i in range(4)]
+
+    _, duration = asyncio.run(_run_agent(tools))
+
+    # Two rounds of two concurrent calls
+    assert 0.4 <= duration < 0.6
+
+
+def test_tool_call_timeout(monkeypatch):
+    monkeypatch.setattr(single, "TOOL_CALL_TIMEOUT", 0.1)
+    tools = [_slow_tool("hanging", 5), _slow_tool("fast", 0.01)]
+
+    result, duration = asyncio.run(_run_agent(tools))
+
+    assert duration < 1
+    assert result.response.message.content == "Tool hanging timed out after 0.1s,fast"
+    assert [source.tool_name for source in result.sources] == ["fast"]
+
+
+def test_tool_call_timeout_per_tool(monkeypatch):
+    monkeypatch.setattr(single, "TOOL_CALL_TIMEOUT", 0.1)
+    monkeypatch.setattr(single, "TOOL_CALL_TIMEOUTS", {"slow": 1})
+    tools = [_slow_tool("slow", 0.3), _slow_tool("hanging", 5)]
+
+    result, _ = asyncio.run(_run_agent(tools))
+
+    assert result.response.message.content == "slow,Tool hanging timed out after 0.1s"
+
+
+def test_agent_calls_are_not_timed_out(monkeypatch):
+    monkeypatch.setattr(single, "TOOL_CALL_TIMEOUT", 0.1)
+    researcher = FunctionCallingAgent(
+        name="researcher", llm=SlowAnswerLLM(), write_events=False
+    )
+
+    result, duration = asyncio.run(_run_agent([AgentCallTool(agent=researcher)]))
+
+    # The sub-agent is only bounded by the timeout of its workflow
+    assert duration >= 0.3
+    assert result.response.message.content == "report"
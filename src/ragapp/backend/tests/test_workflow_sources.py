@@ -0,0 +1,150 @@
+import asyncio
+import json
+from typing import Any, List
+from unittest.mock import AsyncMock, MagicMock
+
+from app.api.routers.models import ChatData, Message
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.base.response.schema import Response
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.tools import FunctionTool, ToolSelection
+from llama_index.core.workflow import Context, StartEvent, StopEvent, Workflow, step
+
+from backend.routers.chat.vercel_response import WorkflowVercelStreamResponse
+from backend.workflows.multi import AgentCallTool
+from backend.workflows.single import (
+    AgentRunEvent,
+    AgentRunResult,
+    FunctionCallingAgent,
+    SourceNodesEvent,
+)
+
+
+def _node(node_id: str) -> NodeWithScore:
+    return NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=1.0)
+
+
+class ToolCallingLLM(MockLLM):
+    """
+    Calls the first tool, then answers.
+    """
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        if chat_history[-1].role == "tool":
+            return ChatResponse(message=ChatMessage(role="assistant", content="answer"))
+        tool_call = ToolSelection(
+            tool_id="call", tool_name=tools[0].metadata.name, tool_kwargs={"input": "q"}
+        )
+        return ChatResponse(
+            message=ChatMessage(
+                role="assistant",
+                content="",
+                additional_kwargs={"tool_calls": [tool_call]},
+            )
+        )
+
+    def get_tool_calls_from_response(self, response: ChatResponse, **kwargs: Any):
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+
+def _retrieval_agent(name: str = "researcher") -> FunctionCallingAgent:
+    def query(input: str) -> Response:
+        return Response(response="context", source_nodes=[_node("a"), _node("b")])
+
+    return FunctionCallingAgent(
+        name=name,
+        llm=ToolCallingLLM(),
+        tools=[FunctionTool.from_defaults(fn=query, name="query_engine")],
+    )
+
+
+async def _events(workflow: Workflow):
+    handler = workflow.run(input="question")
+    events = [event async for event in handler.stream_events()]
+    await handler
+    return [event for event in events if isinstance(event, SourceNodesEvent)]
+
+
+def test_agent_sends_the_retrieved_nodes():
+    events = asyncio.run(_events(_retrieval_agent()))
+
+    assert len(events) == 1
+    assert events[0].name == "researcher"
+    assert [node.node_id for node in events[0].nodes] == ["a", "b"]
+
+
+def test_nodes_of_nested_agents_are_bubbled():
+    caller = FunctionCallingAgent(
+        name="caller",
+        llm=ToolCallingLLM(),
+        tools=[AgentCallTool(agent=_retrieval_agent())],
+    )
+
+    events = asyncio.run(_events(caller))
+
+    assert [event.name for event in events] == ["researcher"]
+
+
+class FakeWorkflow(Workflow):
+    """
+    Retrieves the same nodes twice before answering.
+    """
+
+    @step()
+    async def answer(self, ctx: Context, ev: StartEvent) -> StopEvent:
+        ctx.write_event_to_stream(AgentRunEvent(name="agent", msg="Searching"))
+        ctx.write_event_to_stream(
+            SourceNodesEvent(name="agent", nodes=[_node("a"), _node("b")])
+        )
+        ctx.write_event_to_stream(
+            SourceNodesEvent(name="agent", nodes=[_node("b"), _node("c")])
+        )
+        await asyncio.sleep(0.05)
+        return StopEvent(
+            result=AgentRunResult(
+                response=ChatResponse(
+                    message=ChatMessage(role="assistant", content="answer")
+                ),
+                sources=[],
+            )
+        )
+
+
+async def _stream_response() -> List[bytes]:
+    workflow = FakeWorkflow()
+    handler = workflow.run(input="question", streaming=True)
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(return_value=False)
+    response = WorkflowVercelStreamResponse(
+        request=request,
+        chat_data=ChatData(messages=[Message(role="user", content="question")]),
+        event_handler=handler,
+        events=workflow.stream_events(),
+    )
+    frames = [frame async for frame in response.body_iterator]
+    # The connection isn't polled per frame
+    request.is_disconnected.assert_not_awaited()
+    return frames
+
+
+def test_sources_are_streamed_once_before_the_answer():
+    frames = asyncio.run(_stream_response())
+
+    data_frames = [
+        json.loads(frame[2:])[0] for frame in frames if frame.startswith(b"8:")
+    ]
+    sources = [frame for frame in data_frames if frame["type"] == "sources"]
+    node_ids = [node["id"] for frame in sources for node in frame["data"]["nodes"]]
+    assert node_ids == ["a", "b", "c"]
+    # The sources are sent before the answer is generated
+    last_source = max(i for i, frame in enumerate(frames) if b'"sources"' in frame)
+    assert last_source < frames.index(
+        WorkflowVercelStreamResponse.convert_text("answer")
+    )
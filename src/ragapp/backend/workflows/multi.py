@@ -1,22 +1,26 @@
 # Copied from: https://github.com/run-llama/create-llama/blob/c5559d8e593426e080d847b158e0b49d770473e2/templates/components/multiagent/python/app/workflows/multi.py
-from typing import Any, List
+import asyncio
+from typing import Any, List, Optional
 
 from llama_index.core.tools.types import ToolMetadata, ToolOutput
 from llama_index.core.tools.utils import create_schema_from_function
 from llama_index.core.workflow import Context, Workflow
-from llama_index.core.workflow.events import StopEvent
 
 from backend.workflows.planner import StructuredPlannerAgent
+from backend.workflows.routing import AgentRouter
 from backend.workflows.single import (
     AgentRunResult,
     ContextAwareTool,
     FunctionCallingAgent,
+    bubble_events,
 )
 
 
 class AgentCallTool(ContextAwareTool):
     def __init__(self, agent: Workflow) -> None:
         self.agent = agent
+        # Sub-tasks running in parallel can delegate to the same agent, which has a single memory
+        self._lock = asyncio.Lock()
         name = f"call_{agent.name}"
 
         async def schema_call(input: str) -> str:
@@ -39,12 +43,10 @@ class AgentCallTool(ContextAwareTool):
 
     # overload the acall function with the ctx argument as it's needed for bubbling the events
     async def acall(self, ctx: Context, input: str) -> ToolOutput:
-        handler = self.agent.run(input=input)
-        # bubble all events while running the agent to the calling agent
-        async for ev in handler.stream_events():
-            if type(ev) is not StopEvent:
-                ctx.write_event_to_stream(ev)
-        ret: AgentRunResult = await handler
+        async with self._lock:
+            handler = self.agent.run(input=input)
+            # bubble all events while running the agent to the calling agent
+            ret: AgentRunResult = await bubble_events(ctx, handler)
         response = ret.response.message.content
         return ToolOutput(
             content=str(response),
@@ -63,6 +65,7 @@ class AgentOrchestrator(StructuredPlannerAgent):
         **kwargs: Any,
     ) -> None:
         agents = agents or []
+        self.agents = agents
         tools = [AgentCallTool(agent=agent) for agent in agents]
         super().__init__(
             *args,
@@ -72,3 +75,7 @@ class AgentOrchestrator(StructuredPlannerAgent):
         )
         # call add_workflows so agents will get detected by llama agents automatically
         self.add_workflows(**{agent.name: agent for agent in agents})
+
+    async def route(self, task: str) -> Optional[Workflow]:
+        # Dispatch the task directly to an agent if it's clearly the only one needed
+        return await AgentRouter.route(task, self.agents)
@@ -1,9 +1,12 @@
 import re
-from typing import List, Optional
+import threading
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
 
 from app.engine.tools import ToolFactory
 from llama_index.core.chat_engine.types import ChatMessage
 from llama_index.core.tools.query_engine import QueryEngineTool, ToolMetadata
+from llama_index.core.tools.types import BaseTool
 from pydantic import BaseModel
 
 from backend.controllers.agents import AgentManager
@@ -26,32 +29,96 @@ def get_tool(tool_name: str, config: dict, query_engine=None):
     return tools[0]
 
 
-def get_agents(
-    chat_history: Optional[List[ChatMessage]] = None, query_engine=None
-) -> List[FunctionCallingAgent]:
-    agent_manager = AgentManager()
-    agents_config = agent_manager.get_agents()
-    agents = []
-    for agent_config in agents_config:
+@dataclass
+class ToolSpec:
+    name: str
+    config: Any
+    # The loaded tool if it can be shared across requests
+    tool: Optional[BaseTool] = None
+
+
+@dataclass
+class AgentSpec:
+    name: str
+    description: str
+    system_prompt: str
+    tools: List[ToolSpec] = field(default_factory=list)
+
+
+class AgentCache:
+    """
+    Cache the agent configs with their rendered system prompts and loaded tools across requests,
+    until the agent config changes (see `AgentManager.version`).
+    The query engine tool, bound to the filters and callbacks of a request,
+    and the tools keeping a session (e.g. the code interpreter sandbox) are created per request.
+    """
+
+    _lock = threading.Lock()
+    _version: Optional[int] = None
+    _specs: List[AgentSpec] = []
+
+    @classmethod
+    def get_specs(cls) -> List[AgentSpec]:
+        agent_manager = AgentManager()
+        version = agent_manager.version
+        if cls._version != version:
+            with cls._lock:
+                if cls._version != version:
+                    cls._specs = _load_agent_specs(agent_manager)
+                    cls._version = version
+        return cls._specs
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._version = None
+            cls._specs = []
+
+
+def _load_agent_specs(agent_manager: AgentManager) -> List[AgentSpec]:
+    specs = []
+    for agent_config in agent_manager.get_agents():
         agent_tools_config = agent_manager.get_agent_tools(agent_config.agent_id)
-        tools = [
-            get_tool(tool_name, tool_config, query_engine)
-            for tool_name, tool_config in agent_tools_config
-            if tool_config.enabled
-        ]
-        system_prompt = agent_config.get_system_prompt()
+        tools = []
+        for tool_name, tool_config in agent_tools_config:
+            if not tool_config.enabled:
+                continue
+            tool = None
+            if tool_name != "QueryEngine" and getattr(tool_config, "shareable", True):
+                tool = get_tool(tool_name, tool_config)
+            tools.append(ToolSpec(name=tool_name, config=tool_config, tool=tool))
         # The orchestrator uses "role" to select the right agent for a task
         # construct a "description" from the user defined role and goal for better orchestration
         description = f"{agent_config.role}\n and its goals are {agent_config.goal}"
         # OpenAI only allows agent names to match the pattern '^[a-zA-Z0-9_-]+$'."
         # Remove special characters from the agent name
         agent_name = re.sub(r"[^a-zA-Z0-9_-]", "", agent_config.name)
+        specs.append(
+            AgentSpec(
+                name=agent_name,
+                description=description,
+                system_prompt=agent_config.get_system_prompt(),
+                tools=tools,
+            )
+        )
+    return specs
+
 
+def get_agents(
+    chat_history: Optional[List[ChatMessage]] = None, query_engine=None
+) -> List[FunctionCallingAgent]:
+    agents = []
+    for spec in AgentCache.get_specs():
+        tools = [
+            tool.tool or get_tool(tool.name, tool.config, query_engine)
+            for tool in spec.tools
+        ]
+        # Only the chat memory is created per request
         agents.append(
             FunctionCallingAgent(
-                name=agent_name,
-                description=description,
-                system_prompt=system_prompt,
+                name=spec.name,
+                description=spec.description,
+                system_prompt=spec.system_prompt,
                 tools=tools,
                 chat_history=chat_history,
                 verbose=True,
@@ -64,4 +131,9 @@ def create_orchestrator(
     chat_history: Optional[List[ChatMessage]] = None, query_engine=None
 ):
     agents = get_agents(chat_history, query_engine)
-    return AgentOrchestrator(agents=agents, refine_plan=False)
+    return AgentOrchestrator(
+        agents=agents,
+        refine_plan=False,
+        # Reuse the plans created for the same agents
+        plan_cache_scope=str(AgentManager().version),
+    )
@@ -1,4 +1,5 @@
 # Copied from: https://github.com/run-llama/create-llama/blob/c5559d8e593426e080d847b158e0b49d770473e2/templates/components/multiagent/python/app/workflows/planner.py
+import os
 import uuid
 from enum import Enum
 from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
@@ -25,7 +26,16 @@ from llama_index.core.workflow import (
     step,
 )
 
-from backend.workflows.single import AgentRunEvent, AgentRunResult, FunctionCallingAgent
+from backend.workflows.routing import PlanCache
+from backend.workflows.single import (
+    AgentRunEvent,
+    AgentRunResult,
+    FunctionCallingAgent,
+    bubble_events,
+)
+
+# Maximum number of independent sub-tasks of a plan that are executed at the same time
+PLANNER_MAX_PARALLEL_SUB_TASKS = int(os.getenv("PLANNER_MAX_PARALLEL_SUB_TASKS", "4"))
 
 INITIAL_PLANNER_PROMPT = """\
 Think step-by-step. Given a conversation, set of tools and a user request. Your responsibility is to create a plan to complete the task.
@@ -46,6 +56,7 @@ class ExecutePlanEvent(Event):
 
 class SubTaskEvent(Event):
     sub_task: SubTask
+    streaming: bool = False
 
 
 class SubTaskResultEvent(Event):
@@ -78,30 +89,43 @@ class StructuredPlannerAgent(Workflow):
         timeout: float = 360.0,
         refine_plan: bool = False,
         chat_history: Optional[List[ChatMessage]] = None,
+        max_parallel_sub_tasks: int = PLANNER_MAX_PARALLEL_SUB_TASKS,
+        plan_cache_scope: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(*args, timeout=timeout, **kwargs)
         self.name = name
         self.refine_plan = refine_plan
         self.chat_history = chat_history
+        # Refining the plan needs the result of each sub-task before choosing the next one
+        self.max_parallel_sub_tasks = (
+            1
+            if refine_plan
+            else min(max_parallel_sub_tasks, PLANNER_MAX_PARALLEL_SUB_TASKS)
+        )
 
+        self.llm = llm
         self.tools = tools or []
         self.planner = Planner(
             llm=llm,
             tools=self.tools,
             initial_plan_prompt=INITIAL_PLANNER_PROMPT,
             verbose=self._verbose,
+            cache_scope=plan_cache_scope,
         )
+        self.executor = self._create_executor()
+        self.add_workflows(executor=self.executor)
+
+    def _create_executor(self) -> FunctionCallingAgent:
         # The executor is keeping the memory of all tool calls and decides to call the right tool for the task
-        self.executor = FunctionCallingAgent(
+        return FunctionCallingAgent(
             name="executor",
-            llm=llm,
+            llm=self.llm,
             tools=self.tools,
             write_events=False,
             # it's important to instruct to just return the tool call, otherwise the executor will interpret and change the result
             system_prompt="You are an expert in completing given tasks by calling the right tool for the task. Just return the result of the tool call. Don't add any information yourself",
         )
-        self.add_workflows(executor=self.executor)
 
     @step()
     async def create_plan(
@@ -111,6 +135,11 @@ class StructuredPlannerAgent(Workflow):
         ctx.data["streaming"] = getattr(ev, "streaming", False)
         ctx.data["task"] = ev.input
 
+        # Skip planning if a single workflow can complete the task
+        workflow = await self.route(ev.input)
+        if workflow is not None:
+            return await self.run_directly(ctx, workflow, ev.input)
+
         plan_id, plan = await self.planner.create_plan(
             input=ev.input, chat_history=self.chat_history
         )
@@ -124,55 +153,87 @@ class StructuredPlannerAgent(Workflow):
             print("=== Executing plan ===\n")
         return ExecutePlanEvent()
 
-    @step()
-    async def execute_plan(self, ctx: Context, ev: ExecutePlanEvent) -> SubTaskEvent:
-        upcoming_sub_tasks = self.planner.state.get_next_sub_tasks(
-            ctx.data["act_plan_id"]
-        )
+    async def route(self, task: str) -> Optional[Workflow]:
+        """
+        The workflow to complete the task without a plan, if any.
+        """
+        return None
 
-        if upcoming_sub_tasks:
-            # Execute only the first sub-task
-            # otherwise the executor will get over-lapping messages
-            # alternatively, we could use one executor for all sub tasks
-            next_sub_task = upcoming_sub_tasks[0]
-            return SubTaskEvent(sub_task=next_sub_task)
+    async def run_directly(
+        self, ctx: Context, workflow: Workflow, task: str
+    ) -> StopEvent:
+        handler = workflow.run(input=task, streaming=ctx.data["streaming"])
+        # bubble all events while running the workflow to the planner
+        return StopEvent(result=await bubble_events(ctx, handler))
 
+    @step(num_workers=1)
+    async def execute_plan(self, ctx: Context, ev: ExecutePlanEvent) -> SubTaskEvent:
+        # Start the sub-tasks whose dependencies are completed, up to the parallelism limit
+        running = ctx.data.setdefault("running_sub_tasks", set())
+        for sub_task in self.planner.state.get_next_sub_tasks(ctx.data["act_plan_id"]):
+            if len(running) >= self.max_parallel_sub_tasks:
+                break
+            if sub_task.name not in running:
+                running.add(sub_task.name)
+                ctx.send_event(
+                    SubTaskEvent(
+                        sub_task=sub_task,
+                        streaming=self._is_final_sub_task(ctx, sub_task),
+                    )
+                )
         return None
 
-    @step()
+    def _is_final_sub_task(self, ctx: Context, sub_task: SubTask) -> bool:
+        """
+        Stream the answer of the sub-task which started last and which no other sub-task depends on.
+        """
+        # TODO: streaming only works without plan refining
+        if not ctx.data["streaming"] or self.refine_plan:
+            return False
+        if ctx.data.get("streamed_sub_task") is not None:
+            return False
+        remaining = self.planner.state.get_remaining_subtasks(ctx.data["act_plan_id"])
+        if any(task.name not in ctx.data["running_sub_tasks"] for task in remaining):
+            return False
+        if any(sub_task.name in task.dependencies for task in remaining):
+            return False
+        ctx.data["streamed_sub_task"] = sub_task.name
+        return True
+
+    @step(num_workers=PLANNER_MAX_PARALLEL_SUB_TASKS)
     async def execute_sub_task(
         self, ctx: Context, ev: SubTaskEvent
     ) -> SubTaskResultEvent:
         if self._verbose:
             print(f"=== Executing sub task: {ev.sub_task.name} ===")
-        is_last_tasks = self.get_remaining_subtasks(ctx) == 1
-        # TODO: streaming only works without plan refining
-        streaming = is_last_tasks and ctx.data["streaming"] and not self.refine_plan
-        handler = self.executor.run(
+        # Each sub-task gets its own executor, so the messages of parallel sub-tasks don't overlap
+        executor = self._create_executor()
+        handler = executor.run(
             input=ev.sub_task.input,
-            streaming=streaming,
+            streaming=ev.streaming,
         )
         # bubble all events while running the executor to the planner
-        async for event in handler.stream_events():
-            # Don't write the StopEvent from sub task to the stream
-            if type(event) is not StopEvent:
-                ctx.write_event_to_stream(event)
-        result: AgentRunResult = await handler
+        result: AgentRunResult = await bubble_events(ctx, handler)
         if self._verbose:
             print("=== Done executing sub task ===\n")
         self.planner.state.add_completed_sub_task(ctx.data["act_plan_id"], ev.sub_task)
+        ctx.data["running_sub_tasks"].discard(ev.sub_task.name)
         return SubTaskResultEvent(sub_task=ev.sub_task, result=result)
 
-    @step()
+    @step(num_workers=1)
     async def gather_results(
         self, ctx: Context, ev: SubTaskResultEvent
     ) -> ExecutePlanEvent | StopEvent:
         result = ev
+        # The streamed answer can finish before other sub-tasks, keep it for the response
+        if not isinstance(result.result, AgentRunResult):
+            ctx.data["streamed_result"] = result.result
 
-        upcoming_sub_tasks = self.get_upcoming_sub_tasks(ctx)
         # if no more tasks to do, stop workflow and send result of last step
-        if upcoming_sub_tasks == 0:
-            return StopEvent(result=result.result)
+        if self.get_remaining_subtasks(ctx) == 0 or (
+            not ctx.data["running_sub_tasks"] and self.get_upcoming_sub_tasks(ctx) == 0
+        ):
+            return StopEvent(result=ctx.data.get("streamed_result", result.result))
 
         if self.refine_plan:
             # store the result for refining the plan
@@ -215,6 +276,7 @@ class Planner:
         initial_plan_prompt: Union[str, PromptTemplate] = DEFAULT_INITIAL_PLAN_PROMPT,
         plan_refine_prompt: Union[str, PromptTemplate] = DEFAULT_PLAN_REFINE_PROMPT,
         verbose: bool = True,
+        cache_scope: Optional[str] = None,
     ) -> None:
         if llm is None:
             llm = Settings.llm
@@ -224,6 +286,8 @@ class Planner:
         self.tools = tools or []
         self.state = PlannerAgentState()
         self.verbose = verbose
+        # Plans are only cached with a scope, e.g. the version of the agents
+        self.cache_scope = cache_scope
 
         if isinstance(initial_plan_prompt, str):
             initial_plan_prompt = PromptTemplate(initial_plan_prompt)
@@ -241,24 +305,38 @@ class Planner:
         for tool in tools:
             tools_str += tool.metadata.name + ": " + tool.metadata.description + "\n"
 
-        try:
-            plan = await self.llm.astructured_predict(
-                Plan,
-                self.initial_plan_prompt,
-                tools_str=tools_str,
-                task=input,
-                chat_history=chat_history,
-            )
-        except (ValueError, ValidationError):
-            if self.verbose:
-                print("No complex plan predicted. Defaulting to a single task plan.")
-            plan = Plan(
-                sub_tasks=[
-                    SubTask(
-                        name="default", input=input, expected_output="", dependencies=[]
+        cache_key = None
+        plan = None
+        if self.cache_scope is not None and PlanCache.is_enabled():
+            cache_key = PlanCache.get_key(input, self.cache_scope, chat_history)
+            plan = PlanCache.get(cache_key)
+
+        if plan is None:
+            try:
+                plan = await self.llm.astructured_predict(
+                    Plan,
+                    self.initial_plan_prompt,
+                    tools_str=tools_str,
+                    task=input,
+                    chat_history=chat_history,
+                )
+                if cache_key is not None:
+                    PlanCache.add(cache_key, plan)
+            except (ValueError, ValidationError):
+                if self.verbose:
+                    print(
+                        "No complex plan predicted. Defaulting to a single task plan."
                     )
-                ]
-            )
+                plan = Plan(
+                    sub_tasks=[
+                        SubTask(
+                            name="default",
+                            input=input,
+                            expected_output="",
+                            dependencies=[],
+                        )
+                    ]
+                )
 
         if self.verbose:
             print("=== Initial plan ===")
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from llama_index.core.agent.runner.planner import Plan
+from llama_index.core.base.embeddings.base import Embedding, similarity
+from llama_index.core.chat_engine.types import ChatMessage
+from llama_index.core.settings import Settings
+
+from backend.services.metrics import MetricsService
+from backend.workflows.single import FunctionCallingAgent
+
+logger = logging.getLogger("uvicorn")
+
+
+class AgentRouter:
+    """
+    Dispatch a task directly to one agent, without creating a plan,
+    if the task is clearly more similar to the description (role and goal) of that agent
+    than to the descriptions of the other agents.
+    """
+
+    _lock = threading.Lock()
+    # The embeddings of the agent descriptions, by description
+    _embeddings: Dict[str, Embedding] = {}
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return os.getenv("USE_AGENT_ROUTING", "false").lower() == "true"
+
+    @classmethod
+    async def route(
+        cls, task: str, agents: List[FunctionCallingAgent]
+    ) -> Optional[FunctionCallingAgent]:
+        if not cls.is_enabled() or not agents:
+            return None
+        threshold = float(os.getenv("AGENT_ROUTING_THRESHOLD", "0.5"))
+        # Minimum difference to the second best agent, so tasks for several agents are planned
+        margin = float(os.getenv("AGENT_ROUTING_MARGIN", "0.1"))
+
+        embedding = await Settings.embed_model.aget_query_embedding(task)
+        descriptions = await cls._get_embeddings(
+            [agent.description or agent.name for agent in agents]
+        )
+        scores = sorted(
+            (
+                (similarity(embedding, description), i)
+                for i, description in enumerate(descriptions)
+            ),
+            reverse=True,
+        )
+        best_score, best = scores[0]
+        second_score = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score >= threshold and best_score - second_score >= margin:
+            MetricsService.increment("agent_routing", "direct")
+            logger.info(f"Routing the task directly to the agent {agents[best].name}")
+            return agents[best]
+        MetricsService.increment("agent_routing", "planned")
+        return None
+
+    @classmethod
+    async def _get_embeddings(cls, descriptions: List[str]) -> List[Embedding]:
+        with cls._lock:
+            missing = [text for text in descriptions if text not in cls._embeddings]
+        if missing:
+            embeddings = await Settings.embed_model.aget_text_embedding_batch(missing)
+            with cls._lock:
+                cls._embeddings.update(zip(missing, embeddings))
+        with cls._lock:
+            return [cls._embeddings[text] for text in descriptions]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._embeddings = {}
+
+
+class PlanCache:
+    """
+    In-memory cache of the plans created for a task, so repeated tasks don't wait for the planner.
+    A plan is only reused for the same agents (see `AgentManager.version`) and conversation,
+    as the sub-tasks are written with the context of the conversation.
+    """
+
+    _lock = threading.Lock()
+    _cache: Optional[TTLCache] = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return os.getenv("USE_PLAN_CACHE", "true").lower() == "true"
+
+    @staticmethod
+    def get_key(
+        task: str, scope: str, chat_history: Optional[List[ChatMessage]] = None
+    ) -> Tuple:
+        # Ignore the case, whitespace and trailing punctuation of the task
+        normalized_task = re.sub(r"\s+", " ", task).strip().rstrip("?!.").lower()
+        history = hashlib.sha256(
+            "\n".join(
+                f"{message.role}: {message.content}" for message in chat_history or []
+            ).encode()
+        ).hexdigest()
+        return scope, normalized_task, history
+
+    @classmethod
+    def get(cls, key: Tuple) -> Optional[Plan]:
+        with cls._lock:
+            plan = cls._get_cache().get(key)
+        MetricsService.increment("plan_cache", "hits" if plan else "misses")
+        return plan.model_copy(deep=True) if plan else None
+
+    @classmethod
+    def add(cls, key: Tuple, plan: Plan):
+        with cls._lock:
+            cls._get_cache()[key] = plan.model_copy(deep=True)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache = None
+
+    @classmethod
+    def _get_cache(cls) -> TTLCache:
+        if cls._cache is None:
+            cls._cache = TTLCache(
+                maxsize=int(os.getenv("PLAN_CACHE_MAX_SIZE", "1000")),
+                ttl=int(os.getenv("PLAN_CACHE_TTL", "3600")),
+            )
+        return cls._cache
@@ -1,10 +1,13 @@
 # Copied from: https://github.com/run-llama/create-llama/blob/c5559d8e593426e080d847b158e0b49d770473e2/templates/components/multiagent/python/app/workflows/single.py
+import asyncio
+import os
 from abc import abstractmethod
-from typing import Any, AsyncGenerator, List, Optional
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 from llama_index.core.llms import ChatMessage, ChatResponse
 from llama_index.core.llms.function_calling import FunctionCallingLLM
 from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.schema import NodeWithScore
 from llama_index.core.settings import Settings
 from llama_index.core.tools import FunctionTool, ToolOutput, ToolSelection
 from llama_index.core.tools.types import BaseTool
@@ -16,8 +19,30 @@ from llama_index.core.workflow import (
     Workflow,
     step,
 )
+from llama_index.core.workflow.handler import WorkflowHandler
 from pydantic import BaseModel
 
+from backend.services.metrics import MetricsService
+
+# Maximum number of tool calls of one LLM response that are executed at the same time
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+# Seconds a tool call may take before it's reported as failed to the LLM
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "60"))
+
+
+def _parse_tool_timeouts(value: str) -> Dict[str, float]:
+    # e.g. "query_engine=120,duckduckgo_search=30"
+    timeouts = {}
+    for item in value.split(","):
+        if item.strip():
+            name, seconds = item.split("=", 1)
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+# The timeouts of single tools by their name, overriding TOOL_CALL_TIMEOUT
+TOOL_CALL_TIMEOUTS = _parse_tool_timeouts(os.getenv("TOOL_CALL_TIMEOUTS", ""))
+
 
 class InputEvent(Event):
     input: list[ChatMessage]
@@ -40,17 +65,68 @@ class AgentRunEvent(Event):
         self._msg = value
 
 
+class SourceNodesEvent(Event):
+    """
+    The source nodes retrieved by a tool call of an agent, e.g. by the query engine tool.
+    """
+
+    name: str
+    nodes: list[NodeWithScore]
+
+
 class AgentRunResult(BaseModel):
     response: ChatResponse
     sources: list[ToolOutput]
 
 
 class ContextAwareTool(FunctionTool):
+    # E.g. delegating to an agent, whose run is bounded by the timeout of its workflow
+    call_timeout: Optional[float] = None
+
     @abstractmethod
     async def acall(self, ctx: Context, input: Any) -> ToolOutput:
         pass
 
 
+def get_tool_call_timeout(tool: BaseTool) -> Optional[float]:
+    """
+    The seconds a call of the tool may take, None for no timeout.
+    """
+    if isinstance(tool, ContextAwareTool):
+        return tool.call_timeout
+    return TOOL_CALL_TIMEOUTS.get(tool.metadata.get_name(), TOOL_CALL_TIMEOUT)
+
+
+def cancel_workflow_run(handler: WorkflowHandler):
+    """
+    Cancel a workflow run whose result isn't needed anymore, e.g. when the client disconnected.
+    Doesn't wait for the steps to be cancelled, so it can be called from a cancelled task.
+    """
+    if handler.done():
+        return
+    MetricsService.increment("cancellation", "workflow_runs")
+    # The run ends with a WorkflowCancelledByUser error, mark it as retrieved
+    handler.add_done_callback(lambda run: run.cancelled() or run.exception())
+    asyncio.ensure_future(handler.cancel_run())
+
+
+async def bubble_events(ctx: Context, handler: WorkflowHandler) -> Any:
+    """
+    Write the events of a nested workflow run to the stream of the calling workflow and return its result.
+    The nested run is cancelled with the calling step.
+    """
+    try:
+        async for event in handler.stream_events():
+            if type(event) is not StopEvent:
+                ctx.write_event_to_stream(event)
+        return await asyncio.shield(handler)
+    except asyncio.CancelledError:
+        cancel_workflow_run(handler)
+        # Wait for the steps of the nested run (and the runs nested in them) to be cancelled
+        await asyncio.wait([handler])
+        raise
+
+
 class FunctionCallingAgent(Workflow):
     def __init__(
         self,
@@ -151,21 +227,27 @@ class FunctionCallingAgent(Workflow):
 
             full_response = None
             yielded_indicator = False
-            async for chunk in response_stream:
-                if "tool_calls" not in chunk.message.additional_kwargs:
-                    # Yield a boolean to indicate whether the response is a tool call
-                    if not yielded_indicator:
-                        yield False
+            try:
+                async for chunk in response_stream:
+                    if "tool_calls" not in chunk.message.additional_kwargs:
+                        # Yield a boolean to indicate whether the response is a tool call
+                        if not yielded_indicator:
+                            yield False
+                            yielded_indicator = True
+
+                        # if not a tool call, yield the chunks!
+                        yield chunk
+                    elif not yielded_indicator:
+                        # Yield the indicator for a tool call
+                        yield True
                         yielded_indicator = True
 
-                    # if not a tool call, yield the chunks!
-                    yield chunk
-                elif not yielded_indicator:
-                    # Yield the indicator for a tool call
-                    yield True
-                    yielded_indicator = True
-
-                full_response = chunk
+                    full_response = chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # The response isn't read anymore, close the LLM stream to stop the generation
+                MetricsService.increment("cancellation", "llm_streams")
+                await response_stream.aclose()
+                raise
 
             # Write the full response to memory
             self.memory.put(full_response.message)
@@ -194,50 +276,68 @@ class FunctionCallingAgent(Workflow):
     async def handle_tool_calls(self, ctx: Context, ev: ToolCallEvent) -> InputEvent:
         tool_calls = ev.tool_calls
         tools_by_name = {tool.metadata.get_name(): tool for tool in self.tools}
+        semaphore = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
 
-        tool_msgs = []
-
-        # call tools -- safely!
-        for tool_call in tool_calls:
+        async def call_tool(
+            tool_call: ToolSelection,
+        ) -> Tuple[ChatMessage, Optional[ToolOutput]]:
             tool = tools_by_name.get(tool_call.tool_name)
             additional_kwargs = {
                 "tool_call_id": tool_call.tool_id,
-                "name": tool.metadata.get_name(),
+                "name": tool_call.tool_name,
             }
             if not tool:
-                tool_msgs.append(
+                return (
                     ChatMessage(
                         role="tool",
                         content=f"Tool {tool_call.tool_name} does not exist",
                         additional_kwargs=additional_kwargs,
-                    )
+                    ),
+                    None,
                 )
-                continue
 
+            timeout = get_tool_call_timeout(tool)
             try:
-                if isinstance(tool, ContextAwareTool):
-                    # inject context for calling an context aware tool
-                    tool_output = await tool.acall(ctx=ctx, **tool_call.tool_kwargs)
-                else:
-                    tool_output = await tool.acall(**tool_call.tool_kwargs)
-                self.sources.append(tool_output)
-                tool_msgs.append(
+                async with semaphore:
+                    if isinstance(tool, ContextAwareTool):
+                        # inject context for calling an context aware tool
+                        call = tool.acall(ctx=ctx, **tool_call.tool_kwargs)
+                    else:
+                        call = tool.acall(**tool_call.tool_kwargs)
+                    tool_output = await asyncio.wait_for(call, timeout)
+                # Send the retrieved nodes right away, before the answer is generated
+                source_nodes = getattr(tool_output.raw_output, "source_nodes", None)
+                if source_nodes:
+                    ctx.write_event_to_stream(
+                        SourceNodesEvent(name=self.name, nodes=source_nodes)
+                    )
+                return (
                     ChatMessage(
                         role="tool",
                         content=tool_output.content,
                         additional_kwargs=additional_kwargs,
-                    )
+                    ),
+                    tool_output,
                 )
+            except asyncio.TimeoutError:
+                content = f"Tool {tool_call.tool_name} timed out after {timeout}s"
             except Exception as e:
-                tool_msgs.append(
-                    ChatMessage(
-                        role="tool",
-                        content=f"Encountered error in tool call: {e}",
-                        additional_kwargs=additional_kwargs,
-                    )
-                )
+                content = f"Encountered error in tool call: {e}"
+            return (
+                ChatMessage(
+                    role="tool", content=content, additional_kwargs=additional_kwargs
+                ),
+                None,
+            )
 
-        for msg in tool_msgs:
+        # call tools concurrently -- safely! The results keep the order of the tool calls
+        results = await asyncio.gather(
+            *(call_tool(tool_call) for tool_call in tool_calls)
+        )
+
+        for msg, tool_output in results:
+            if tool_output is not None:
+                self.sources.append(tool_output)
             self.memory.put(msg)
 
         chat_history = self.memory.get()
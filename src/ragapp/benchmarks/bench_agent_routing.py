@@ -0,0 +1,252 @@
+"""
+Measure the time to first token and the number of LLM calls of the multi-agent chat.
+
+Runs a conversation set of single-agent and multi-agent questions (each asked twice)
+against an orchestrator with two agents, using a mocked function calling LLM with a fixed latency
+per call, a mocked tool latency and a keyword embedding model. Compares planning every question
+(the previous behavior), the plan cache and the plan cache with the agent routing fast path:
+
+    python -m benchmarks.bench_agent_routing --llm-latency 0.2 --tool-latency 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, List
+
+from llama_index.core.agent.runner.planner import Plan, SubTask
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+from llama_index.core.tools import FunctionTool, ToolSelection
+
+from benchmarks.utils import print_report, summarize
+
+AGENTS = {
+    "weather": "Meteorologist\n and its goals are to report the weather forecast",
+    "coder": "Software engineer\n and its goals are to write python code",
+}
+QUESTIONS = [
+    "What's the weather forecast for Berlin?",
+    "Will it rain tomorrow according to the forecast?",
+    "Write python code to sort a list",
+    "Fix this python code for me",
+    "Write python code that fetches the weather forecast",
+]
+
+
+class KeywordEmbedding(MockEmbedding):
+    """
+    Embeds a text by counting the words of the agent descriptions it contains.
+    """
+
+    def _embed(self, text: str) -> List[float]:
+        return [
+            float(text.lower().count(keyword))
+            for keyword in ("weather", "forecast", "rain", "python", "code")
+        ]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class SlowFunctionCallingLLM(MockLLM):
+    """
+    Calls the tool matching the task once, then answers with the tool output.
+    """
+
+    latency: float = 0.2
+    calls: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    async def astructured_predict(self, *args: Any, task: str, **kwargs: Any) -> Plan:
+        await self._wait()
+        agents = [name for name in AGENTS if _matches(name, task)] or list(AGENTS)
+        return Plan(
+            sub_tasks=[
+                SubTask(
+                    name=f"{name}_task",
+                    input=task,
+                    expected_output="",
+                    dependencies=[f"{other}_task" for other in agents[:i]],
+                )
+                for i, name in enumerate(agents)
+            ]
+        )
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        await self._wait()
+        return self._respond(tools, chat_history)
+
+    async def astream_chat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ):
+        await self._wait()
+        response = self._respond(tools, chat_history)
+
+        async def gen():
+            if response.message.additional_kwargs.get("tool_calls"):
+                yield response
+                return
+            content = ""
+            for token in response.message.content.split(" "):
+                content += token + " "
+                yield ChatResponse(
+                    message=ChatMessage(role="assistant", content=content),
+                    delta=token + " ",
+                )
+
+        return gen()
+
+    def get_tool_calls_from_response(
+        self, response: ChatResponse, error_on_no_tool_call: bool = True, **kwargs: Any
+    ) -> List[ToolSelection]:
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+    async def _wait(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    def _respond(self, tools: List[Any], chat_history: List[ChatMessage]):
+        last_message = chat_history[-1]
+        if last_message.role == "tool":
+            return ChatResponse(
+                message=ChatMessage(
+                    role="assistant", content=f"The answer is: {last_message.content}"
+                )
+            )
+        task = last_message.content
+        tool = next(
+            (tool for tool in tools if _matches(tool.metadata.name, task)), tools[0]
+        )
+        tool_call = ToolSelection(
+            tool_id="call", tool_name=tool.metadata.name, tool_kwargs={"input": task}
+        )
+        return ChatResponse(
+            message=ChatMessage(
+                role="assistant",
+                content="",
+                additional_kwargs={"tool_calls": [tool_call]},
+            )
+        )
+
+
+def _matches(name: str, task: str) -> bool:
+    keywords = {"weather": ("weather", "rain"), "coder": ("python", "code")}
+    return any(
+        keyword in task.lower()
+        for agent, words in keywords.items()
+        if agent in name
+        for keyword in words
+    )
+
+
+def _create_agents(llm, tool_latency: float):
+    from backend.workflows.single import FunctionCallingAgent
+
+    def _create_tool(name: str):
+        async def _call(input: str) -> str:
+            await asyncio.sleep(tool_latency)
+            return f"{name} result"
+
+        return FunctionTool.from_defaults(
+            async_fn=_call, name=f"{name}_tool", description=name
+        )
+
+    return [
+        FunctionCallingAgent(
+            name=name, description=description, llm=llm, tools=[_create_tool(name)]
+        )
+        for name, description in AGENTS.items()
+    ]
+
+
+async def _ask(question: str, llm, tool_latency: float):
+    from backend.workflows.multi import AgentOrchestrator
+
+    orchestrator = AgentOrchestrator(
+        agents=_create_agents(llm, tool_latency),
+        llm=llm,
+        plan_cache_scope="1",
+        verbose=False,
+    )
+    calls = llm.calls
+    start = time.perf_counter()
+    handler = orchestrator.run(input=question, streaming=True)
+    async for _ in handler.stream_events():
+        pass
+    result = await handler
+    ttft = None
+    async for chunk in result:
+        if ttft is None and chunk.delta:
+            ttft = (time.perf_counter() - start) * 1000
+    return ttft, llm.calls - calls
+
+
+def run(llm_latency: float, tool_latency: float):
+    from backend.workflows.routing import AgentRouter, PlanCache
+
+    Settings.embed_model = KeywordEmbedding(embed_dim=5)
+    # MockLLM doesn't pass its fields to the constructor
+    llm = SlowFunctionCallingLLM()
+    llm.latency = llm_latency
+
+    async def _run_all():
+        results = {}
+        for name, plan_cache, routing in (
+            ("plan every question", "false", "false"),
+            ("plan cache", "true", "false"),
+            ("plan cache + routing", "true", "true"),
+        ):
+            os.environ["USE_PLAN_CACHE"] = plan_cache
+            os.environ["USE_AGENT_ROUTING"] = routing
+            PlanCache.clear()
+            AgentRouter.clear()
+            results[name] = [
+                await _ask(question, llm, tool_latency)
+                for question in QUESTIONS + QUESTIONS
+            ]
+        return results
+
+    results = asyncio.run(_run_all())
+    print_report(
+        f"Time to first token of {len(QUESTIONS) * 2} questions "
+        f"(LLM latency {llm_latency}s, tool latency {tool_latency}s)",
+        {name: summarize([ttft for ttft, _ in runs]) for name, runs in results.items()},
+    )
+    print_report(
+        "LLM calls per question",
+        {
+            name: summarize([calls for _, calls in runs])
+            for name, runs in results.items()
+        },
+        unit="",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.1)
+    args = parser.parse_args()
+    run(args.llm_latency, args.tool_latency)
+
+
+if __name__ == "__main__":
+    main()
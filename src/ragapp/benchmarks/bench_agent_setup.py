@@ -0,0 +1,110 @@
+"""
+Measure the agent setup time of a chat request with and without the agent cache.
+
+Creates N agents with all tools enabled in a temporary agent config, loading each tool
+with a fixed latency (e.g. fetching a remote OpenAPI spec), then times `get_agents`
+with a cold cache (every request after a config change) and a warm cache:
+
+    python -m benchmarks.bench_agent_setup --agents 5 --requests 20 --tool-latency 0.05
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+import yaml
+from llama_index.core.base.llms.types import LLMMetadata
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+from llama_index.core.tools import FunctionTool
+
+from benchmarks.utils import print_report, summarize
+
+
+class MockFunctionCallingLLM(MockLLM):
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+
+def run(agents: int, requests: int, tool_latency: float):
+    from backend.controllers import agents as agents_module
+    from backend.controllers.agents import AgentManager
+    from backend.workflows.orchestrator import AgentCache, get_agents
+
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    config_file = os.path.join(work_dir, "agents.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump({}, f)
+    agents_module.AGENT_CONFIG_FILE = config_file
+    # The tool configs with an API key (e.g. the code generator) write it to the env file and the environment
+    env_patches = [
+        patch(
+            "backend.models.tools.code_generator.ENV_FILE_PATH",
+            os.path.join(work_dir, ".env"),
+        ),
+        patch.dict(os.environ),
+    ]
+    for env_patch in env_patches:
+        env_patch.start()
+    AgentManager._instance = None
+    agent_manager = AgentManager()
+    tool_names = list(agent_manager.available_tools)
+    for i in range(agents):
+        agent_manager.create_agent(
+            {
+                "name": f"agent_{i}",
+                "role": "Assistant",
+                "goal": "To help answer questions.",
+                "tools": {
+                    tool_name: {"enabled": True, "config": {"api_key": "test"}}
+                    for tool_name in tool_names
+                },
+            }
+        )
+    Settings.llm = MockFunctionCallingLLM()
+
+    def _load_tools(tool_type, config_id, config):
+        time.sleep(tool_latency)
+        return [FunctionTool.from_defaults(fn=lambda: config_id, name=config_id)]
+
+    rows = {}
+    try:
+        with patch(
+            "backend.workflows.orchestrator.ToolFactory.load_tools", _load_tools
+        ):
+            for name, clear_cache in {"cold cache": True, "warm cache": False}.items():
+                latencies = []
+                for _ in range(requests):
+                    if clear_cache:
+                        AgentCache.clear()
+                    start = time.perf_counter()
+                    get_agents(query_engine=MagicMock())
+                    latencies.append((time.perf_counter() - start) * 1000)
+                rows[name] = summarize(latencies)
+    finally:
+        for env_patch in reversed(env_patches):
+            env_patch.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(
+        f"{agents} agents with {len(tool_names)} tools enabled, "
+        f"{tool_latency * 1000:.0f}ms per tool load",
+        rows,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.agents, args.requests, args.tool_latency)
+
+
+if __name__ == "__main__":
+    main()
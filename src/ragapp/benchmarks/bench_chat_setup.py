@@ -0,0 +1,70 @@
+"""
+Measure the index loading of the chat setup: generating the document filters and getting the index.
+
+Simulates an index whose construction takes a fixed latency (e.g. the LlamaCloud round-trips
+resolving the project and pipeline ids) and compares the original setup, constructing the index
+for the filters and again for the chat engine, with resolving the filter dialect from the config
+and getting the index from the registry:
+
+    python -m benchmarks.bench_chat_setup --latency 0.3 --requests 20
+"""
+
+import argparse
+import os
+import time
+from unittest.mock import MagicMock
+
+from benchmarks.utils import print_report, summarize
+
+
+def run(latency: float, requests: int):
+    from backend.engine.index_registry import IndexRegistry
+    from backend.engine.query_filters import generate_filters
+
+    os.environ["USE_LLAMA_CLOUD"] = "true"
+    loads = 0
+
+    def _load_index():
+        nonlocal loads
+        loads += 1
+        time.sleep(latency)
+        return MagicMock()
+
+    IndexRegistry._load_index = staticmethod(_load_index)
+
+    def _original_setup():
+        # The index type check of the filters, then the index of the chat engine
+        _load_index()
+        generate_filters(["doc_1"])
+        _load_index()
+
+    def _current_setup():
+        generate_filters(["doc_1"])
+        IndexRegistry.get_index()
+
+    rows = {}
+    for name, setup in {"original": _original_setup, "current": _current_setup}.items():
+        latencies = []
+        loads = 0
+        IndexRegistry.invalidate()
+        for _ in range(requests):
+            start = time.perf_counter()
+            setup()
+            latencies.append((time.perf_counter() - start) * 1000)
+        rows[f"{name} ({loads} index constructions)"] = summarize(latencies)
+
+    print_report(
+        f"{requests} chat setups, {latency * 1000:.0f}ms per index construction", rows
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    run(args.latency, args.requests)
+
+
+if __name__ == "__main__":
+    main()
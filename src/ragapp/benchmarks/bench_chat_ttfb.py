@@ -0,0 +1,66 @@
+"""
+Measure the time-to-first-byte (TTFB) of the chat endpoint of a running RAGapp.
+
+Run it against the app before and after a change and compare the percentiles:
+
+    python -m benchmarks.bench_chat_ttfb --url http://localhost:8000 --requests 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.utils import print_report, summarize
+
+
+async def _send_chat_request(client: httpx.AsyncClient, url: str, question: str):
+    payload = {"messages": [{"role": "user", "content": question}]}
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", f"{url}/api/chat", json=payload) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return ttfb * 1000, total * 1000
+
+
+async def run(url: str, requests: int, concurrency: int, question: str):
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfbs, totals, errors = [], [], 0
+
+    async with httpx.AsyncClient(timeout=None) as client:
+
+        async def _worker():
+            nonlocal errors
+            async with semaphore:
+                try:
+                    ttfb, total = await _send_chat_request(client, url, question)
+                    ttfbs.append(ttfb)
+                    totals.append(total)
+                except httpx.HTTPError:
+                    errors += 1
+
+        await asyncio.gather(*[_worker() for _ in range(requests)])
+
+    print_report(
+        f"{requests} chat requests, concurrency {concurrency}, {errors} errors",
+        {"ttfb": summarize(ttfbs), "total": summarize(totals)},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--question", default="What is in the knowledge base?")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.question))
+
+
+if __name__ == "__main__":
+    main()
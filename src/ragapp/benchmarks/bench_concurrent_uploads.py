@@ -0,0 +1,105 @@
+"""
+Measure the peak memory and wall time of concurrent uploads of large files.
+
+Uploads N generated files of the given size concurrently through `FileHandler.upload_file`
+into a temporary data folder, once with the streaming upload and once buffering each
+file in memory (the previous behaviour). The peak memory is traced with tracemalloc:
+
+    python -m benchmarks.bench_concurrent_uploads --files 8 --size-mb 256
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+from starlette.datastructures import UploadFile
+
+WRITE_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _write_source_file(path: str, size: int):
+    chunk = os.urandom(WRITE_CHUNK_SIZE)
+    with open(path, "wb") as f:
+        for _ in range(size // WRITE_CHUNK_SIZE):
+            f.write(chunk)
+        f.write(chunk[: size % WRITE_CHUNK_SIZE])
+
+
+async def _buffered_upload(file: UploadFile, file_name: str, *args):
+    # The previous upload path
+    os.makedirs("data", exist_ok=True)
+    with open(f"data/{file_name}", "wb") as f:
+        f.write(await file.read())
+
+
+async def _upload_all(upload, source_path: str, files: int):
+    handles = [open(source_path, "rb") for _ in range(files)]
+    try:
+        await asyncio.gather(
+            *[
+                upload(
+                    UploadFile(file=handle, filename=f"upload_{i}.bin"),
+                    f"upload_{i}.bin",
+                    str(i),
+                    str(files),
+                )
+                for i, handle in enumerate(handles)
+            ]
+        )
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def _measure(name: str, upload, source_path: str, files: int):
+    shutil.rmtree("data", ignore_errors=True)
+    tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(_upload_all(upload, source_path, files))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name}: {elapsed:.2f}s, peak memory {peak / 1024 / 1024:.1f} MB")
+
+
+def run(files: int, size_mb: int):
+    from backend.controllers import files as files_controller
+    from backend.controllers.files import FileHandler
+
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    cwd = os.getcwd()
+    os.environ["STORAGE_DIR"] = os.path.join(work_dir, "storage")
+    files_controller.MAX_UPLOAD_FILE_SIZE_MB = size_mb + 1
+    try:
+        os.chdir(work_dir)
+        source_path = os.path.join(work_dir, "source.bin")
+        _write_source_file(source_path, size_mb * 1024 * 1024)
+
+        print(f"\nUploading {files} files of {size_mb} MB concurrently")
+        with patch.object(FileHandler, "validate_file_extension"), patch.object(
+            files_controller.IndexingJobManager,
+            "submit",
+            return_value=MagicMock(id="benchmark"),
+        ):
+            _measure("streaming upload", FileHandler.upload_file, source_path, files)
+            _measure("buffered upload", _buffered_upload, source_path, files)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=128)
+    args = parser.parse_args()
+    run(args.files, args.size_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Load test the database access of the chat requests.
+
+Sends concurrent requests to a stub chat endpoint guarded by the chat request limit,
+counting each request in a temporary SQLite database (or DB_URI if set),
+and samples the open file descriptors of the process during the run:
+
+    python -m benchmarks.bench_db_load --requests 2000 --concurrency 200 --backend database
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+import jwt
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import StreamingResponse
+
+from benchmarks.utils import print_report, summarize
+
+
+def _count_open_fds() -> int:
+    return len(os.listdir(f"/proc/{os.getpid()}/fd"))
+
+
+def _create_app() -> FastAPI:
+    from backend.middlewares.rate_limit import request_limit_middleware
+
+    router = APIRouter()
+
+    @router.post("/chat")
+    async def chat():
+        async def _stream():
+            for token in ["Hello", " ", "world"]:
+                yield f"0:{token}\n"
+
+        return StreamingResponse(_stream())
+
+    app = FastAPI()
+    app.include_router(
+        router, prefix="/api", dependencies=[Depends(request_limit_middleware)]
+    )
+    return app
+
+
+async def _run(app: FastAPI, requests: int, concurrency: int, users: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, fds, errors = [], [], 0
+    tokens = [
+        jwt.encode({"preferred_username": f"user_{i}"}, "secret", algorithm="HS256")
+        for i in range(users)
+    ]
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+
+        async def _worker(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/chat",
+                    cookies={"Authorization": f"Bearer {tokens[i % users]}"},
+                )
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                if i % 50 == 0:
+                    fds.append(_count_open_fds())
+
+        start = time.perf_counter()
+        await asyncio.gather(*[_worker(i) for i in range(requests)])
+        duration = time.perf_counter() - start
+    return duration, latencies, fds, errors
+
+
+def run(requests: int, concurrency: int, users: int, backend: str):
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.setdefault(
+        "DB_URI", f"sqlite:///{os.path.join(work_dir, 'ragapp_db.sqlite')}"
+    )
+    os.environ.update(
+        {
+            "CHAT_REQUEST_LIMIT_THRESHOLD": str(requests + 1),
+            "CHAT_REQUEST_LIMIT_BACKEND": backend,
+        }
+    )
+    from backend.database import DB
+    from backend.services.rate_limiter import shutdown_rate_limiter
+
+    try:
+        app = _create_app()
+        fds_before = _count_open_fds()
+        duration, latencies, fds, errors = asyncio.run(
+            _run(app, requests, concurrency, users)
+        )
+        shutdown_rate_limiter()
+        fds_after = _count_open_fds()
+        pool = DB.get_engine().pool
+        print_report(
+            f"{requests} chat requests, concurrency {concurrency}, {backend} limiter: "
+            f"{requests / duration:.0f} req/s, {errors} errors",
+            {"latency": summarize(latencies)},
+        )
+        print(
+            f"  open fds: before={fds_before}, during max={max(fds)}, after={fds_after}"
+        )
+        print(f"  pool: {pool.status()}")
+        asyncio.run(DB.dispose())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--backend", choices=["memory", "database"], default="database")
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.users, args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure the re-index time with a cold and a warm embedding cache.
+
+Ingests N generated files into a temporary Chroma collection using a mock embedding model
+with a fixed latency per request, then rebuilds the index from scratch
+(as `update_model_config` does when the model provider changes) with and without the cache:
+
+    python -m benchmarks.bench_embedding_cache --files 100 --latency 0.2
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+from backend.services.metrics import MetricsService
+
+
+class SlowEmbedding(MockEmbedding):
+    latency: float = 0.1
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super()._get_text_embeddings(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+
+def _write_files(data_dir: str, count: int, paragraphs: int):
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(data_dir, f"doc_{i}.txt"), "w") as f:
+            for p in range(paragraphs):
+                f.write(f"Document {i} paragraph {p}. " * 20 + "\n\n")
+
+
+def _rebuild(indexing, collection: str):
+    # A new collection and an empty storage dir, so every file is indexed again
+    shutil.rmtree(os.environ["STORAGE_DIR"], ignore_errors=True)
+    os.environ["CHROMA_COLLECTION"] = collection
+    start = time.perf_counter()
+    indexing.index_all()
+    return time.perf_counter() - start
+
+
+def run(files: int, paragraphs: int, latency: float):
+    from backend.engine.embedding_cache import CachedEmbedding, EmbeddingCache
+    from backend.tasks import indexing
+
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.update(
+        {
+            "VECTOR_STORE_PROVIDER": "chroma",
+            "CHROMA_PATH": os.path.join(work_dir, "chromadb"),
+            "STORAGE_DIR": os.path.join(work_dir, "storage"),
+        }
+    )
+    indexing.DATA_DIR = os.path.join(work_dir, "data")
+    embed_model = SlowEmbedding(embed_dim=8, latency=latency)
+
+    try:
+        _write_files(indexing.DATA_DIR, files, paragraphs)
+        print(f"\nRe-indexing {files} files, {latency * 1000:.0f}ms per embedding call")
+
+        Settings.embed_model = embed_model
+        print(f"  without cache: {_rebuild(indexing, 'uncached'):.2f}s")
+
+        cache = EmbeddingCache(path=os.path.join(work_dir, "cache", "embeddings.db"))
+        Settings.embed_model = CachedEmbedding(embed_model=embed_model, cache=cache)
+        print(f"  cold cache: {_rebuild(indexing, 'cold'):.2f}s")
+        MetricsService.reset()
+        print(f"  warm cache: {_rebuild(indexing, 'warm'):.2f}s")
+        counters = MetricsService.get_counters("embedding_cache")
+        print(
+            f"  warm cache hits={int(counters.get('hits', 0))}, misses={int(counters.get('misses', 0))}"
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    run(args.files, args.paragraphs, args.latency)
+
+
+if __name__ == "__main__":
+    main()
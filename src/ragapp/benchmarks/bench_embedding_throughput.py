@@ -0,0 +1,132 @@
+"""
+Measure the embedding throughput (nodes/sec) of the ingestion pipeline at different concurrency settings.
+
+Starts a local fake OpenAI-compatible embedding server, which answers each request after a
+fixed latency plus a per-text delay and rate limits (HTTP 429) above a number of parallel requests.
+The nodes are embedded with `BatchedEmbedding` using the OpenAI embedding model pointing to the server:
+
+    python -m benchmarks.bench_embedding_throughput --nodes 2000 --concurrency 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from llama_index.core.schema import TextNode
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from backend.tasks.embedding import BatchedEmbedding
+
+EMBEDDING_DIM = 8
+
+
+def _create_server_app(latency: float, per_text_latency: float, max_parallel: int):
+    app = FastAPI()
+    app.state.in_flight = 0
+    app.state.rate_limited = 0
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if app.state.in_flight >= max_parallel:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "0.1"},
+                content={"error": {"message": "Rate limit exceeded"}},
+            )
+        app.state.in_flight += 1
+        try:
+            await asyncio.sleep(latency + per_text_latency * len(inputs))
+        finally:
+            app.state.in_flight -= 1
+        return {
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [0.1] * EMBEDDING_DIM}
+                for i in range(len(inputs))
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+def _start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def run(
+    nodes: int,
+    concurrency_levels: list[int],
+    batch_size: int,
+    latency: float,
+    per_text_latency: float,
+    max_parallel: int,
+    port: int,
+):
+    app = _create_server_app(latency, per_text_latency, max_parallel)
+    server = _start_server(app, port)
+    try:
+        print(
+            f"\nEmbedding {nodes} nodes, batch size {batch_size}, "
+            f"server latency {latency * 1000:.0f}ms + {per_text_latency * 1000:.1f}ms/text, "
+            f"rate limit above {max_parallel} parallel requests"
+        )
+        for concurrency in concurrency_levels:
+            embed_model = OpenAIEmbedding(
+                api_key="fake",
+                api_base=f"http://127.0.0.1:{port}/v1",
+                embed_batch_size=batch_size,
+            )
+            transform = BatchedEmbedding(
+                embed_model=embed_model, concurrency=concurrency, initial_backoff=0.1
+            )
+            app.state.rate_limited = 0
+            batch = [TextNode(text=f"Node {i} " * 50) for i in range(nodes)]
+            start = time.perf_counter()
+            transform(batch)
+            elapsed = time.perf_counter() - start
+            print(
+                f"  concurrency {concurrency}: {nodes / elapsed:.0f} nodes/sec "
+                f"({elapsed:.2f}s, {app.state.rate_limited} rate limited requests)"
+            )
+    finally:
+        server.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--per-text-latency", type=float, default=0.001)
+    parser.add_argument("--max-parallel", type=int, default=6)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    run(
+        args.nodes,
+        args.concurrency,
+        args.batch_size,
+        args.latency,
+        args.per_text_latency,
+        args.max_parallel,
+        args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
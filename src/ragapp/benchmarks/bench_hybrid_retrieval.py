@@ -0,0 +1,226 @@
+"""
+Measure the recall@k and the latency of the dense, the sparse (BM25) and the hybrid retrieval.
+
+Generates a fixture corpus of part descriptions, with a part number and a category and
+an application shared by several parts, and queries it by part number ("What is the pressure of XK-2041?")
+and by topic ("Which valve is used for irrigation?"). By default the texts are embedded by their words
+without the identifiers, like the vocabulary of an embedding model; pass a fastembed model to use it instead
+(downloaded on the first run):
+
+    python -m benchmarks.bench_hybrid_retrieval --documents 2000 --queries 200 --top-k 3
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+
+from benchmarks.utils import print_report, summarize
+
+CATEGORIES = ["pump", "valve", "filter", "sensor", "gasket", "motor", "hose", "seal"]
+APPLICATIONS = [
+    "irrigation",
+    "brewing",
+    "mining",
+    "heating",
+    "cooling",
+    "dairy",
+    "marine",
+    "laboratory",
+]
+MATERIALS = ["steel", "brass", "plastic", "bronze", "aluminium"]
+
+
+class WordEmbedding(BaseEmbedding):
+    """
+    Hashes the words of a text into a normalized vector, words with digits are skipped
+    like the identifiers missing from the vocabulary of an embedding model.
+    """
+
+    dimensions: int = 256
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"[a-z]+(?![\w-])", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _corpus(count: int, rng: random.Random) -> Tuple[List[TextNode], Dict]:
+    nodes = []
+    parts = {}
+    part_numbers: Set[str] = set()
+    while len(part_numbers) < count:
+        part_numbers.add(
+            f"{rng.choice('ABCDEFGHKLMPRSTVX')}{rng.choice('ABCDEFGHKLMPRSTVX')}-{rng.randint(100, 9999)}"
+        )
+    for i, part_number in enumerate(sorted(part_numbers)):
+        category = rng.choice(CATEGORIES)
+        application = rng.choice(APPLICATIONS)
+        text = (
+            f"The {rng.choice(MATERIALS)} {category} {part_number} is designed for {application}. "
+            f"Its maximum pressure is {rng.randint(2, 40)} bar and it weighs {rng.randint(1, 90)} kg. "
+            f"Replace the {category} every {rng.randint(6, 48)} months of use in {application}."
+        )
+        nodes.append(
+            TextNode(
+                id_=f"node-{i}",
+                text=text,
+                metadata={"private": "false", "file_name": f"part_{i}.txt"},
+                relationships={
+                    NodeRelationship.SOURCE: RelatedNodeInfo(
+                        node_id=f"data/part_{i}.txt"
+                    )
+                },
+            )
+        )
+        parts[part_number] = (f"node-{i}", category, application)
+    return nodes, parts
+
+
+def _queries(parts: Dict, count: int, rng: random.Random):
+    by_topic: Dict[Tuple[str, str], Set[str]] = {}
+    for node_id, category, application in parts.values():
+        by_topic.setdefault((category, application), set()).add(node_id)
+    part_numbers = sorted(parts)
+    queries = []
+    for i in range(count):
+        if i % 2 == 0:
+            part_number = rng.choice(part_numbers)
+            queries.append(
+                (
+                    "part number",
+                    f"What is the maximum pressure of {part_number}?",
+                    {parts[part_number][0]},
+                )
+            )
+        else:
+            category, application = rng.choice(sorted(by_topic))
+            queries.append(
+                (
+                    "topic",
+                    f"Which {category} can I use for {application}?",
+                    by_topic[(category, application)],
+                )
+            )
+    return queries
+
+
+def _recall(retrieved: List[str], relevant: Set[str], top_k: int) -> float:
+    return len(relevant.intersection(retrieved)) / min(len(relevant), top_k)
+
+
+def run(documents: int, queries: int, top_k: int, model: Optional[str], seed: int):
+    from backend.engine.hybrid_retriever import (
+        HYBRID_CANDIDATES_FACTOR,
+        HybridRetriever,
+    )
+    from backend.engine.query_filters import generate_filters
+    from backend.engine.sparse_index import SparseIndex
+
+    os.environ["USE_LLAMA_CLOUD"] = "false"
+    rng = random.Random(seed)
+    nodes, parts = _corpus(documents, rng)
+    data = _queries(parts, queries, rng)
+    filters = generate_filters([])
+
+    if model:
+        from llama_index.embeddings.fastembed import FastEmbedEmbedding
+
+        embed_model = FastEmbedEmbedding(model_name=model)
+    else:
+        embed_model = WordEmbedding()
+
+    start = time.perf_counter()
+    index = VectorStoreIndex(nodes, embed_model=embed_model)
+    embed_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix="ragapp-bench-") as work_dir:
+        sparse_index = SparseIndex(os.path.join(work_dir, "sparse_index.db"))
+        start = time.perf_counter()
+        # Add the nodes in batches, like the ingestion of the files
+        for batch_start in range(0, len(nodes), 100):
+            sparse_index.add_nodes(nodes[batch_start : batch_start + 100])
+        sparse_time = time.perf_counter() - start
+        print(
+            f"Indexed {len(nodes)} nodes: dense {embed_time:.2f}s, sparse {sparse_time:.2f}s"
+        )
+
+        dense_retriever = index.as_retriever(filters=filters, similarity_top_k=top_k)
+        retrievers = {
+            "dense": dense_retriever.retrieve,
+            "sparse": lambda query: sparse_index.search(query, top_k, filters),
+            "hybrid": HybridRetriever(
+                vector_retriever=index.as_retriever(
+                    filters=filters,
+                    similarity_top_k=top_k * HYBRID_CANDIDATES_FACTOR,
+                ),
+                sparse_index=sparse_index,
+                similarity_top_k=top_k,
+                filters=filters,
+            ).retrieve,
+        }
+
+        recalls: Dict[str, Dict[str, float]] = {}
+        latencies: Dict[str, List[float]] = {}
+        for name, retrieve in retrievers.items():
+            by_kind: Dict[str, List[float]] = {}
+            latencies[name] = []
+            for kind, query, relevant in data:
+                start = time.perf_counter()
+                retrieved = [node.node.node_id for node in retrieve(query)]
+                latencies[name].append((time.perf_counter() - start) * 1000)
+                by_kind.setdefault(kind, []).append(_recall(retrieved, relevant, top_k))
+            recalls[name] = {
+                kind: sum(values) / len(values) for kind, values in by_kind.items()
+            }
+        sparse_index.close()
+
+    print_report(
+        f"Recall@{top_k} of {queries} queries on {documents} documents",
+        recalls,
+        unit="",
+    )
+    print_report(
+        f"Retrieval latency (top {top_k})",
+        {name: summarize(values) for name, values in latencies.items()},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="A fastembed model, e.g. BAAI/bge-small-en-v1.5, instead of the word embedding",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.documents, args.queries, args.top_k, args.model, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure the embedding calls and wall time of the incremental indexing.
+
+Ingests N generated files into a temporary Chroma collection, then re-ingests:
+without changes, after modifying one file and as a full rebuild (the previous behaviour).
+A counting mock embedding model is used, so no provider is needed:
+
+    python -m benchmarks.bench_incremental_indexing --files 200
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+
+class CountingEmbedding(MockEmbedding):
+    calls: int = 0
+    texts: int = 0
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return super()._get_text_embeddings(texts)
+
+    def reset(self):
+        self.calls = 0
+        self.texts = 0
+
+
+def _write_files(data_dir: str, count: int, paragraphs: int):
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(data_dir, f"doc_{i}.txt"), "w") as f:
+            for p in range(paragraphs):
+                f.write(f"Document {i} paragraph {p}. " * 20 + "\n\n")
+
+
+def _measure(name: str, embed_model: CountingEmbedding, fn):
+    embed_model.reset()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {name}: {elapsed:.2f}s, {embed_model.calls} embedding calls, {embed_model.texts} texts embedded"
+    )
+
+
+def run(files: int, paragraphs: int):
+    from backend.tasks import indexing
+
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.update(
+        {
+            "VECTOR_STORE_PROVIDER": "chroma",
+            "CHROMA_PATH": os.path.join(work_dir, "chromadb"),
+            "CHROMA_COLLECTION": "benchmark",
+            "STORAGE_DIR": os.path.join(work_dir, "storage"),
+        }
+    )
+    indexing.DATA_DIR = os.path.join(work_dir, "data")
+    embed_model = CountingEmbedding(embed_dim=8)
+    Settings.embed_model = embed_model
+
+    try:
+        _write_files(indexing.DATA_DIR, files, paragraphs)
+        print(f"\nIndexing {files} files")
+        _measure("initial ingestion", embed_model, indexing.index_all)
+        _measure("re-ingestion without changes", embed_model, indexing.index_all)
+
+        with open(os.path.join(indexing.DATA_DIR, "doc_0.txt"), "a") as f:
+            f.write("An updated paragraph.\n")
+        _measure(
+            "re-ingestion after touching one file", embed_model, indexing.index_all
+        )
+
+        def _full_rebuild():
+            shutil.rmtree(os.environ["STORAGE_DIR"])
+            indexing.index_all()
+
+        _measure("full rebuild", embed_model, _full_rebuild)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    args = parser.parse_args()
+    run(args.files, args.paragraphs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure the per-request latency of getting the index and retrieving from it,
+with the index loaded for every request (the previous behavior) and with the cached index of the IndexRegistry.
+
+Ingests N generated files into a temporary Chroma collection using a mock embedding model,
+then runs the requests one after another, like the retrieval of a chat request:
+
+    python -m benchmarks.bench_index_load --files 50 --requests 200
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, List
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+from benchmarks.bench_index_swap import _write_files
+from benchmarks.utils import print_report, summarize
+
+
+def _measure(get_index: Callable, requests: int) -> List[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        # Each request has its own callback manager, like the chat requests
+        index = get_index(CallbackManager())
+        index.as_retriever().retrieve("paragraph")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(files: int, paragraphs: int, requests: int):
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.update(
+        {
+            "VECTOR_STORE_PROVIDER": "chroma",
+            "CHROMA_PATH": os.path.join(work_dir, "chromadb"),
+            "CHROMA_COLLECTION": "default",
+            "STORAGE_DIR": os.path.join(work_dir, "storage"),
+            "COLLECTION_STATE_PATH": os.path.join(work_dir, "collections.json"),
+        }
+    )
+    from backend.engine.index_registry import IndexRegistry
+    from backend.engine.vectordb import get_vector_store
+    from backend.tasks import indexing
+
+    indexing.DATA_DIR = os.path.join(work_dir, "data")
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+
+    def _load_index(callback_manager: CallbackManager = None):
+        # Like app.engine.index.get_index: open the vector store client and create the index
+        return VectorStoreIndex.from_vector_store(
+            get_vector_store(), callback_manager=callback_manager
+        )
+
+    IndexRegistry._load_index = staticmethod(_load_index)
+
+    try:
+        _write_files(indexing.DATA_DIR, files, paragraphs)
+        indexing.index_all()
+        IndexRegistry.invalidate()
+        # Warm up the imports of the vector store
+        _measure(_load_index, 5)
+
+        results = {
+            "load per request": _measure(_load_index, requests),
+            "index registry": _measure(
+                lambda callback_manager: IndexRegistry.get_index(
+                    callback_manager=callback_manager
+                ),
+                requests,
+            ),
+        }
+        print_report(
+            f"{requests} requests on {files} files",
+            {name: summarize(latencies) for name, latencies in results.items()},
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    run(args.files, args.paragraphs, args.requests)
+
+
+if __name__ == "__main__":
+    main()
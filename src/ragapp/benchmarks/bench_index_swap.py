@@ -0,0 +1,155 @@
+"""
+Measure the errors seen by concurrent chat clients while the index is rebuilt.
+
+Ingests N generated files into a temporary Chroma collection using a mock embedding model
+with a fixed latency per request, then rebuilds the index while retrieval clients query it,
+once by deleting the live collection first (the previous behavior)
+and once into a new collection which is swapped in when it's ready:
+
+    python -m benchmarks.bench_index_swap --files 50 --clients 4 --latency 0.05
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, List
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+from benchmarks.utils import print_report, summarize
+
+
+class SlowEmbedding(MockEmbedding):
+    latency: float = 0.05
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super()._get_text_embeddings(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+
+def _write_files(data_dir: str, count: int, paragraphs: int):
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(data_dir, f"doc_{i}.txt"), "w") as f:
+            for p in range(paragraphs):
+                f.write(f"Document {i} paragraph {p}. " * 20 + "\n\n")
+
+
+def _run_clients(rebuild: Callable[[], None], clients: int):
+    from backend.engine.index_registry import IndexRegistry
+
+    stop = threading.Event()
+    latencies, errors = [], []
+
+    def _client():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                nodes = IndexRegistry.get_index().as_retriever().retrieve("paragraph")
+                # An empty retrieval means the chat answers without any context
+                if not nodes:
+                    raise ValueError("No nodes retrieved")
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=_client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    try:
+        rebuild()
+    finally:
+        duration = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return duration, latencies, errors
+
+
+def _delete_first(indexing):
+    # Drop the live collection before re-indexing into it, like the previous reset of the index
+    from backend.engine.collection_state import CollectionManager
+    from backend.engine.index_registry import IndexRegistry
+
+    collection = CollectionManager.get_active_collection()
+    indexing._delete_collection_data(collection)
+    IndexRegistry.invalidate()
+    indexing.index_all()
+
+
+def _rebuild_into_new_collection():
+    # Like a model config update: the pinned index is served until the rebuild job switches the collection
+    from backend.engine.index_registry import IndexRegistry
+    from backend.tasks.jobs import IndexingJobManager
+
+    IndexRegistry.pin()
+    job = IndexingJobManager.submit_rebuild()
+    while not job.is_finished:
+        time.sleep(0.01)
+    if job.error:
+        raise RuntimeError(f"Rebuild failed: {job.error}")
+
+
+def run(files: int, paragraphs: int, clients: int, latency: float):
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.update(
+        {
+            "VECTOR_STORE_PROVIDER": "chroma",
+            "CHROMA_PATH": os.path.join(work_dir, "chromadb"),
+            "CHROMA_COLLECTION": "default",
+            "STORAGE_DIR": os.path.join(work_dir, "storage"),
+            "COLLECTION_STATE_PATH": os.path.join(work_dir, "collections.json"),
+        }
+    )
+    from backend.engine.index_registry import IndexRegistry
+    from backend.engine.vectordb import get_vector_store
+    from backend.tasks import indexing
+
+    indexing.DATA_DIR = os.path.join(work_dir, "data")
+    Settings.embed_model = SlowEmbedding(embed_dim=8, latency=latency)
+    # Load the index straight from the vector store, without the app's engine
+    IndexRegistry._load_index = staticmethod(
+        lambda: VectorStoreIndex.from_vector_store(get_vector_store())
+    )
+
+    try:
+        _write_files(indexing.DATA_DIR, files, paragraphs)
+        indexing.index_all()
+        print(f"\nRebuilding {files} files with {clients} concurrent retrieval clients")
+
+        results = {
+            "delete first": _run_clients(lambda: _delete_first(indexing), clients),
+            "blue/green": _run_clients(_rebuild_into_new_collection, clients),
+        }
+        for name, (duration, latencies, errors) in results.items():
+            total = len(latencies) + len(errors)
+            error_rate = len(errors) / total * 100 if total else 0.0
+            print_report(
+                f"{name}: rebuilt in {duration:.2f}s, {len(errors)}/{total} requests failed ({error_rate:.1f}%)",
+                {"retrieval": summarize(latencies)},
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.files, args.paragraphs, args.clients, args.latency)
+
+
+if __name__ == "__main__":
+    main()
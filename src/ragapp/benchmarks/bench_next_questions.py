@@ -0,0 +1,112 @@
+"""
+Measure how long the chat stream is kept open by the next question suggestions.
+
+Streams N answers (a fraction of them repeated questions) and suggests the next questions
+after each answer with a mocked LLM, once with the chat model for every answer (the previous behavior)
+and once with a cheaper model, a timeout and the suggestion cache:
+
+    python -m benchmarks.bench_next_questions --requests 20 --repeated 0.3 --answer-time 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+from llama_index.core.base.llms.types import ChatMessage, CompletionResponse
+from llama_index.core.llms import MockLLM
+from llama_index.core.settings import Settings
+
+from benchmarks.utils import print_report, summarize
+
+
+class SlowLLM(MockLLM):
+    model: str = "chat"
+    # Seconds per completion of each model
+    latencies: Dict[str, float] = {}
+
+    async def acomplete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(self.latencies[self.model])
+        return CompletionResponse(text="```\nWhy?\nHow?\nWhen?\n```")
+
+
+async def _stream(question: str, answer_time: float) -> float:
+    from backend.services.suggestion import NextQuestionSuggestion
+
+    start = time.perf_counter()
+    # The answer is streamed, then the next questions are suggested before the stream is closed
+    await asyncio.sleep(answer_time)
+    await NextQuestionSuggestion.suggest_next_questions(
+        [ChatMessage(role="user", content=question)], f"Answer to {question}"
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def run(
+    requests: int,
+    repeated: float,
+    answer_time: float,
+    chat_latency: float,
+    cheap_latency: float,
+    timeout: float,
+):
+    from backend.services.suggestion import NextQuestionSuggestion
+
+    llm = SlowLLM()
+    # MockLLM doesn't pass its fields to the constructor
+    llm.latencies = {"chat": chat_latency, "cheap": cheap_latency}
+    Settings.llm = llm
+    os.environ["NEXT_QUESTION_PROMPT"] = "Suggest the next questions: {conversation}"
+    unique = max(1, round(requests * (1 - repeated)))
+    questions = [f"Question {i % unique}" for i in range(requests)]
+
+    async def _run(model: str, cached: bool):
+        if model == "cheap":
+            os.environ["NEXT_QUESTION_MODEL"] = model
+        else:
+            os.environ.pop("NEXT_QUESTION_MODEL", None)
+        NextQuestionSuggestion.clear()
+        durations = []
+        for question in questions:
+            if not cached:
+                NextQuestionSuggestion.clear()
+            durations.append(await _stream(question, answer_time))
+        return durations
+
+    os.environ["NEXT_QUESTION_TIMEOUT"] = "600"
+    before = asyncio.run(_run("chat", cached=False))
+    os.environ["NEXT_QUESTION_TIMEOUT"] = str(timeout)
+    after = asyncio.run(_run("cheap", cached=True))
+    print_report(
+        f"Stream duration of {requests} answers ({repeated:.0%} repeated, "
+        f"answer {answer_time}s, chat model {chat_latency}s, cheap model {cheap_latency}s, "
+        f"timeout {timeout}s)",
+        {
+            "chat model": summarize(before),
+            "cheap model + cache + timeout": summarize(after),
+        },
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--repeated", type=float, default=0.3)
+    parser.add_argument("--answer-time", type=float, default=1.0)
+    parser.add_argument("--chat-latency", type=float, default=2.0)
+    parser.add_argument("--cheap-latency", type=float, default=0.6)
+    parser.add_argument("--timeout", type=float, default=1.5)
+    args = parser.parse_args()
+    run(
+        args.requests,
+        args.repeated,
+        args.answer_time,
+        args.chat_latency,
+        args.cheap_latency,
+        args.timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Measure the time the planner needs to complete a plan with independent sub-tasks.
+
+Runs a plan of N independent research sub-tasks followed by a report depending on all of them.
+Each sub-task is executed by a function calling agent whose mocked LLM waits a fixed latency
+per call and calls a tool which waits a fixed latency, once executing one sub-task at a time
+(the previous behavior) and once executing the independent sub-tasks in parallel:
+
+    python -m benchmarks.bench_planner --sub-tasks 4 --runs 5 --llm-latency 0.2 --tool-latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, List
+
+from llama_index.core.agent.runner.planner import Plan, SubTask
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata
+from llama_index.core.llms import MockLLM
+from llama_index.core.tools import FunctionTool, ToolSelection
+
+from benchmarks.utils import print_report, summarize
+
+
+class SlowFunctionCallingLLM(MockLLM):
+    """
+    Calls the first tool once per task, then answers with the tool output.
+    """
+
+    latency: float = 0.2
+    plan: Plan | None = None
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True)
+
+    async def astructured_predict(self, *args: Any, **kwargs: Any) -> Plan:
+        await asyncio.sleep(self.latency)
+        return self.plan
+
+    async def achat_with_tools(
+        self, tools: List[Any], chat_history: List[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        await asyncio.sleep(self.latency)
+        last_message = chat_history[-1]
+        if last_message.role == "tool":
+            return ChatResponse(
+                message=ChatMessage(role="assistant", content=last_message.content)
+            )
+        tool_call = ToolSelection(
+            tool_id="call", tool_name=tools[0].metadata.name, tool_kwargs={}
+        )
+        return ChatResponse(
+            message=ChatMessage(
+                role="assistant",
+                content="",
+                additional_kwargs={"tool_calls": [tool_call]},
+            )
+        )
+
+    def get_tool_calls_from_response(
+        self, response: ChatResponse, error_on_no_tool_call: bool = True, **kwargs: Any
+    ) -> List[ToolSelection]:
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+
+def _create_plan(sub_tasks: int) -> Plan:
+    research = [
+        SubTask(
+            name=f"research_{i}",
+            input=f"Research topic {i}",
+            expected_output="",
+            dependencies=[],
+        )
+        for i in range(sub_tasks)
+    ]
+    report = SubTask(
+        name="report",
+        input="Write the report",
+        expected_output="",
+        dependencies=[task.name for task in research],
+    )
+    return Plan(sub_tasks=[*research, report])
+
+
+async def _run_plan(max_parallel_sub_tasks: int, llm, tool) -> float:
+    from backend.workflows.planner import StructuredPlannerAgent
+
+    agent = StructuredPlannerAgent(
+        name="planner",
+        llm=llm,
+        tools=[tool],
+        max_parallel_sub_tasks=max_parallel_sub_tasks,
+    )
+    start = time.perf_counter()
+    handler = agent.run(input="Write a report about all topics")
+    async for _ in handler.stream_events():
+        pass
+    await handler
+    return (time.perf_counter() - start) * 1000
+
+
+def run(sub_tasks: int, runs: int, llm_latency: float, tool_latency: float):
+    # The number of workers of the planner steps is read on import
+    os.environ["PLANNER_MAX_PARALLEL_SUB_TASKS"] = str(sub_tasks)
+
+    async def _search() -> str:
+        await asyncio.sleep(tool_latency)
+        return "Search results"
+
+    # MockLLM doesn't pass its fields to the constructor
+    llm = SlowFunctionCallingLLM()
+    llm.latency = llm_latency
+    llm.plan = _create_plan(sub_tasks)
+    tool = FunctionTool.from_defaults(
+        async_fn=_search, name="search", description="Search the web"
+    )
+
+    async def _run_all():
+        return {
+            name: [await _run_plan(parallel, llm, tool) for _ in range(runs)]
+            for name, parallel in (
+                ("sequential", 1),
+                (f"parallel ({sub_tasks})", sub_tasks),
+            )
+        }
+
+    results = asyncio.run(_run_all())
+    print_report(
+        f"Plan of {sub_tasks} independent sub-tasks and a report, {runs} runs "
+        f"(LLM latency {llm_latency}s, tool latency {tool_latency}s)",
+        {name: summarize(durations) for name, durations in results.items()},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sub-tasks", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.5)
+    args = parser.parse_args()
+    run(args.sub_tasks, args.runs, args.llm_latency, args.tool_latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Measure the overhead of the chat request limit per request.
+
+Calls the `request_limit_middleware` dependency concurrently with a temporary SQLite database,
+once per limiter backend, and the previous synchronous read-then-write of the count for comparison:
+
+    python -m benchmarks.bench_rate_limit --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import jwt
+from starlette.requests import Request
+
+from benchmarks.utils import print_report, summarize
+
+
+def _make_request(user_id: str) -> Request:
+    token = jwt.encode({"preferred_username": user_id}, "secret", algorithm="HS256")
+    cookie = f"Authorization=Bearer {token}".encode()
+    return Request({"type": "http", "headers": [(b"cookie", cookie)]})
+
+
+async def _sync_read_then_write(request: Request):
+    # The previous implementation: a blocking SELECT then UPDATE on the event loop
+    from backend.middlewares.rate_limit import _get_time_frame
+    from backend.models.user_info import UserInfo
+    from backend.services.user_chat_service import UserChatService
+
+    user = UserInfo.from_request(request)
+    time_frame = _get_time_frame()
+    count = UserChatService.get_user_chat_request_count(user, time_frame)
+    UserChatService.set_user_chat_request_counts(
+        {(user.user_id, time_frame): count + 1}
+    )
+
+
+async def _run_backend(middleware, requests: int, concurrency: int, users: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _worker(i: int):
+        request = _make_request(f"user_{i % users}")
+        async with semaphore:
+            start = time.perf_counter()
+            await middleware(request)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_worker(i) for i in range(requests)])
+    return time.perf_counter() - start, latencies
+
+
+def run(requests: int, concurrency: int, users: int):
+    work_dir = tempfile.mkdtemp(prefix="ragapp-bench-")
+    os.environ.update(
+        {
+            "DB_URI": f"sqlite:///{os.path.join(work_dir, 'ragapp_db.sqlite')}",
+            # High enough to admit every request
+            "CHAT_REQUEST_LIMIT_THRESHOLD": str(requests + 1),
+        }
+    )
+    from backend.middlewares import rate_limit
+    from backend.services import rate_limiter
+
+    backends = {
+        "sync read+write": _sync_read_then_write,
+        "memory": rate_limiter.MemoryRateLimiter,
+        "database": rate_limiter.DatabaseRateLimiter,
+    }
+    try:
+        rows = {}
+        for name, backend in backends.items():
+            if isinstance(backend, type):
+                limiter = backend()
+                rate_limiter._limiter = limiter
+                middleware = rate_limit.request_limit_middleware
+            else:
+                limiter, middleware = None, backend
+            duration, latencies = asyncio.run(
+                _run_backend(middleware, requests, concurrency, users)
+            )
+            if limiter is not None:
+                limiter.shutdown()
+            rows[f"{name} ({requests / duration:.0f} req/s)"] = summarize(latencies)
+        print_report(
+            f"{requests} requests, concurrency {concurrency}, {users} users", rows
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.users)
+
+
+if __name__ == "__main__":
+    main()
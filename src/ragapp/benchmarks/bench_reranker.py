@@ -0,0 +1,153 @@
+"""
+Measure the latency and the throughput of the local reranker against the Cohere reranker.
+
+Reranks N queries of `--candidates` retrieved nodes, one at a time and then from `--concurrency`
+threads, with the Cohere reranker sending its requests to a local stand-in of the Cohere API
+(answering after a fixed latency, like the round trip and the inference of the service)
+and with the local cross-encoder (downloaded on the first run):
+
+    python -m benchmarks.bench_reranker --queries 50 --candidates 20 --cohere-latency 0.15
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from llama_index.core import QueryBundle
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from benchmarks.utils import print_report, summarize
+
+TOPICS = ["weather", "python", "finance", "travel", "cooking"]
+
+
+def _serve_cohere(latency: float) -> ThreadingHTTPServer:
+    class CohereHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            documents = body["documents"]
+            results = [
+                {"index": i, "relevance_score": 1 / (i + 1)}
+                for i in range(min(body.get("top_n") or len(documents), len(documents)))
+            ]
+            payload = json.dumps({"id": "bench", "results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CohereHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _queries(count: int, candidates: int):
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        nodes = [
+            NodeWithScore(
+                node=TextNode(
+                    text=f"Paragraph {j} about {TOPICS[j % len(TOPICS)]}. " * 20
+                ),
+                score=0.0,
+            )
+            for j in range(candidates)
+        ]
+        yield QueryBundle(query_str=f"Tell me about {topic} number {i}"), nodes
+
+
+def _measure(reranker, queries: List, concurrency: int):
+    def _rerank(query):
+        start = time.perf_counter()
+        reranker.postprocess_nodes(query[1], query[0])
+        return (time.perf_counter() - start) * 1000
+
+    latencies = [_rerank(query) for query in queries]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_rerank, queries))
+    throughput = len(queries) / (time.perf_counter() - start)
+    return latencies, throughput
+
+
+def run(
+    queries: int, candidates: int, concurrency: int, cohere_latency: float, model: str
+):
+    from cohere import Client
+
+    from backend.engine.postprocessors.local_reranker import LocalReranker
+    from backend.engine.postprocessors.reranker import get_cohere_reranker
+    from backend.services.http_clients import HttpClientRegistry
+
+    server = _serve_cohere(cohere_latency)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    os.environ["COHERE_API_KEY"] = "bench"
+    data = list(_queries(queries, candidates))
+
+    results = {}
+    try:
+        cohere = get_cohere_reranker()
+        # Send the requests to the stand-in, with the pooled client like the app
+        cohere._client = Client(
+            api_key="bench",
+            base_url=base_url,
+            httpx_client=HttpClientRegistry.get_client("cohere", base_url),
+        )
+        results["cohere (stand-in)"] = _measure(cohere, data, concurrency)
+        local = LocalReranker(model=model)
+        try:
+            # Warm up, the model is loaded (and downloaded) on its first use
+            local.score("warm up", ["warm up"])
+        except Exception as e:
+            print(f"Could not load the local reranker model {model}: {e}")
+        else:
+            results[f"local ({model})"] = _measure(local, data, concurrency)
+    finally:
+        server.shutdown()
+
+    print_report(
+        f"Rerank latency of {queries} queries with {candidates} candidates "
+        f"(Cohere stand-in {cohere_latency}s)",
+        {name: summarize(latencies) for name, (latencies, _) in results.items()},
+    )
+    print_report(
+        f"Rerank throughput with {concurrency} threads",
+        {
+            name: {"queries per second": throughput}
+            for name, (_, throughput) in results.items()
+        },
+        unit="",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cohere-latency", type=float, default=0.15)
+    parser.add_argument("--model", default="Xenova/ms-marco-MiniLM-L-6-v2")
+    args = parser.parse_args()
+    run(
+        args.queries,
+        args.candidates,
+        args.concurrency,
+        args.cohere_latency,
+        args.model,
+    )
+
+
+if __name__ == "__main__":
+    main()
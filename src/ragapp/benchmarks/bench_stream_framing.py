@@ -0,0 +1,118 @@
+"""
+Measure the bytes on the wire and the CPU time of encoding a chat answer as Vercel text frames.
+
+Sends an answer of N characters through a streaming response writing to a local socket,
+once as a complete workflow result (previously sent one frame per character)
+and once as a stream of LLM tokens (previously one frame per token),
+with and without coalescing the text into larger frames:
+
+    python -m benchmarks.bench_stream_framing --chars 4000 --token-size 4 --responses 200
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import AsyncIterator, Callable
+
+from fastapi.responses import StreamingResponse
+
+from backend.routers.chat.stream_framer import coalesce_text
+
+
+def convert_text(token: str) -> str:
+    # Same encoding as BaseVercelStreamResponse.convert_text
+    return f"0:{json.dumps(token)}\n"
+
+
+async def _tokens(answer: str, token_size: int) -> AsyncIterator[str]:
+    for i in range(0, len(answer), token_size):
+        yield answer[i : i + token_size]
+
+
+async def _per_char(answer: str, token_size: int) -> AsyncIterator[str]:
+    for token in answer:
+        yield convert_text(token)
+
+
+async def _complete(answer: str, token_size: int) -> AsyncIterator[str]:
+    yield convert_text(answer)
+
+
+async def _per_token(answer: str, token_size: int) -> AsyncIterator[str]:
+    async for token in _tokens(answer, token_size):
+        yield convert_text(token)
+
+
+async def _coalesced(answer: str, token_size: int) -> AsyncIterator[str]:
+    async for text in coalesce_text(_tokens(answer, token_size)):
+        yield convert_text(text)
+
+
+def _measure(frames: Callable, answer: str, token_size: int, responses: int):
+    reader, writer = socket.socketpair()
+    received = {"bytes": 0}
+
+    def _drain():
+        while data := reader.recv(65536):
+            received["bytes"] += len(data)
+
+    drain_thread = threading.Thread(target=_drain, daemon=True)
+    drain_thread.start()
+    sent = {"frames": 0}
+
+    async def _send(message: dict):
+        body = message.get("body", b"")
+        if body:
+            sent["frames"] += 1
+            writer.sendall(body)
+
+    async def _receive():
+        # The client stays connected until the response is complete
+        await asyncio.Event().wait()
+
+    async def _run():
+        for _ in range(responses):
+            response = StreamingResponse(content=frames(answer, token_size))
+            await response({"type": "http"}, _receive, _send)
+
+    start = time.process_time()
+    asyncio.run(_run())
+    cpu = (time.process_time() - start) * 1000 / responses
+    writer.close()
+    drain_thread.join()
+    reader.close()
+    return sent["frames"] / responses, received["bytes"] / responses, cpu
+
+
+def run(chars: int, token_size: int, responses: int):
+    answer = ('Lorem ipsum dolor sit amet, "consectetur" adipiscing elit.\n' * chars)[
+        :chars
+    ]
+    print(
+        f"\nSending an answer of {chars} characters ({token_size} characters per token), "
+        f"mean of {responses} responses"
+    )
+    for name, encode in (
+        ("workflow result, frame per character", _per_char),
+        ("workflow result, one frame", _complete),
+        ("token stream, frame per token", _per_token),
+        ("token stream, coalesced frames", _coalesced),
+    ):
+        frames, size, cpu = _measure(encode, answer, token_size, responses)
+        print(f"  {name}: frames={frames:.0f}, bytes={size:.0f}, cpu={cpu:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chars", type=int, default=4000)
+    parser.add_argument("--token-size", type=int, default=4)
+    parser.add_argument("--responses", type=int, default=200)
+    args = parser.parse_args()
+    run(args.chars, args.token_size, args.responses)
+
+
+if __name__ == "__main__":
+    main()
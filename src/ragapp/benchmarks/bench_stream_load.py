@@ -0,0 +1,160 @@
+"""
+Load test the chat stream responses with a local fake LLM.
+
+Starts a single uvicorn worker serving chat engine stream responses whose fake LLM emits
+N tokens at a fixed rate, then opens increasing numbers of concurrent streams and reports
+the CPU time of the worker per stream and the highest number of concurrent streams
+which are still served at the rate of the LLM. Compares polling the connection after every frame
+(the previous behavior) with the disconnect listener of the response:
+
+    python -m benchmarks.bench_stream_load --tokens 200 --rate 50 --levels 50,100,200,400
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.utils import percentile, print_report, summarize
+
+
+def _serve(port: int, tokens: int, rate: float):
+    import uvicorn
+    from app.api.routers.events import EventCallbackHandler
+    from app.api.routers.models import ChatData, Message
+    from fastapi import BackgroundTasks, FastAPI, Request
+
+    from backend.routers.chat.vercel_response import ChatEngineVercelStreamResponse
+
+    class FakeResponse:
+        source_nodes = []
+
+        async def async_response_gen(self):
+            # Emit the tokens at a fixed rate, however late the stream is scheduled
+            start = time.perf_counter()
+            for i in range(tokens):
+                await asyncio.sleep(start + (i + 1) / rate - time.perf_counter())
+                yield f"token{i} "
+
+    class PollingResponse(ChatEngineVercelStreamResponse):
+        async def content_generator(self, stream):
+            # Poll the connection after every frame, like before
+            async with stream.stream() as streamer:
+                async for output in streamer:
+                    yield output
+                    if await self.request.is_disconnected():
+                        break
+
+    async def _response():
+        return FakeResponse()
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream(request: Request, background_tasks: BackgroundTasks, poll: bool):
+        response_class = PollingResponse if poll else ChatEngineVercelStreamResponse
+        return response_class(
+            request=request,
+            event_handler=EventCallbackHandler(),
+            chat_data=ChatData(messages=[Message(role="user", content="Hello")]),
+            response=_response(),
+            background_tasks=background_tasks,
+        )
+
+    @app.get("/cpu")
+    async def cpu():
+        return {"cpu": time.process_time()}
+
+    uvicorn.run(app, port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run_level(base_url: str, streams: int, poll: bool):
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=600
+    ) as client:
+        cpu_before = (await client.get("/cpu")).json()["cpu"]
+
+        async def _stream() -> float:
+            start = time.perf_counter()
+            try:
+                async with client.stream("GET", "/stream", params={"poll": poll}) as r:
+                    async for _ in r.aiter_bytes():
+                        pass
+            except httpx.TransportError:
+                # The worker dropped the connection
+                return float("inf")
+            return time.perf_counter() - start
+
+        durations = await asyncio.gather(*(_stream() for _ in range(streams)))
+        cpu_after = (await client.get("/cpu")).json()["cpu"]
+    return (cpu_after - cpu_before) * 1000 / streams, list(durations)
+
+
+def run(tokens: int, rate: float, levels: List[int], tolerance: float):
+    port = _free_port()
+    server = multiprocessing.Process(
+        target=_serve, args=(port, tokens, rate), daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/cpu")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    expected = tokens / rate
+    try:
+        for name, poll in (("poll per frame", True), ("disconnect listener", False)):
+            cpu_rows, duration_rows = {}, {}
+            max_streams = 0
+            for streams in levels:
+                cpu, durations = asyncio.run(_run_level(base_url, streams, poll))
+                cpu_rows[f"{streams} streams"] = {"cpu per stream": cpu}
+                duration_rows[f"{streams} streams"] = summarize(
+                    [d for d in durations if d != float("inf")]
+                )
+                # The worker keeps up if the streams are not much slower than the LLM
+                if percentile(durations, 99) <= expected * (1 + tolerance):
+                    max_streams = streams
+            print_report(
+                f"{name}: {tokens} tokens at {rate} tokens/s, "
+                f"keeps up with {max_streams} concurrent streams",
+                cpu_rows,
+            )
+            print_report(f"{name}: stream durations", duration_rows, unit="s")
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--levels", default="50,100,200,400")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Fraction a stream may take longer than the LLM",
+    )
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+    run(args.tokens, args.rate, levels, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import statistics
+from typing import Dict, List
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of the values, `p` is between 0 and 100.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else float("nan"),
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else float("nan"),
+    }
+
+
+def print_report(title: str, rows: Dict[str, Dict[str, float]], unit: str = "ms"):
+    print(f"\n{title}")
+    for name, stats in rows.items():
+        values = ", ".join(
+            f"{key}={int(value)}" if key == "count" else f"{key}={value:.2f}{unit}"
+            for key, value in stats.items()
+        )
+        print(f"  {name}: {values}")
@@ -6,6 +6,7 @@ load_dotenv(dotenv_path=ENV_FILE_PATH, verbose=False, override=False)
 # flake8: noqa
 import logging
 import os
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Depends
@@ -13,21 +14,49 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
-from create_llama.backend.app.settings import init_settings
 from create_llama.backend.app.api.routers.upload import file_upload_router
 from create_llama.backend.app.api.routers.chat_config import config_router
 from create_llama.backend.app.api.routers.sandbox import sandbox_router
+from backend.database import DB
+from backend.engine.postprocessors import warm_up_reranker
+from backend.engine.settings import init_settings
+from backend.engine.vectordb import close_clients as close_vector_store_clients
 from backend.models.model_config import ModelConfig
 from backend.routers.chat.index import chat_router
 from backend.routers.management import management_router
 from backend.middlewares.rate_limit import request_limit_middleware
+from backend.services.http_clients import HttpClientRegistry
+from backend.services.loop_monitor import EventLoopMonitor
+from backend.services.offload import run_blocking
+from backend.services.rate_limiter import shutdown_rate_limiter
+from backend.tasks.jobs import IndexingJobManager
+from backend.tasks.parsing import DocumentParser
 
 
 init_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor = EventLoopMonitor()
+    await loop_monitor.start()
+    await run_blocking(warm_up_reranker)
+    yield
+    await loop_monitor.stop()
+    # Let the running indexing jobs finish
+    IndexingJobManager.shutdown()
+    DocumentParser.shutdown()
+    # Persist the in-memory chat request counts
+    shutdown_rate_limiter()
+    await DB.dispose()
+    await HttpClientRegistry.aclose()
+    await close_vector_store_clients()
+
+
 app = FastAPI(
     title="RAGapp",
     root_path=os.getenv("BASE_URL", ""),
+    lifespan=lifespan,
 )
 
 environment = os.getenv("ENVIRONMENT")
@@ -3,10 +3,11 @@ import os
 
 from app.engine.llamacloud_index import IndexConfig as LlamaCloudIndexConfig
 from app.engine.llamacloud_index import get_index as get_llama_cloud_index
-from app.engine.vectordb import get_vector_store
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.indices import VectorStoreIndex
 
+from backend.engine.vectordb import get_vector_store
+
 logger = logging.getLogger("uvicorn")
 
 